@@ -0,0 +1,83 @@
+"""Measure the time to import debt_crisis.config and to collect the pytask tasks.
+
+Usage:
+    python benchmarks/benchmark_import_time.py [baseline revision] [repeat]
+
+With a git revision (e.g. the commit before a change) the same measurements are
+made in a temporary worktree of that revision for comparison.
+
+"""
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+TOP_LEVEL_DIR = Path(__file__).parent.parent.resolve()
+
+COMMANDS = {
+    "import debt_crisis.config": [sys.executable, "-c", "import debt_crisis.config"],
+    "pytask collect": [sys.executable, "-m", "pytask", "collect"],
+}
+
+
+def median_seconds(command, project_directory, repeat):
+    environment = dict(os.environ)
+    environment["PYTHONPATH"] = os.pathsep.join(
+        [str(project_directory / "src"), environment.get("PYTHONPATH", "")]
+    )
+
+    durations = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        subprocess.run(
+            command,
+            cwd=project_directory,
+            env=environment,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            check=False,
+        )
+        durations.append(time.perf_counter() - start_time)
+
+    return statistics.median(durations)
+
+
+def measure(project_directory, repeat):
+    return {
+        name: median_seconds(command, project_directory, repeat)
+        for name, command in COMMANDS.items()
+    }
+
+
+if __name__ == "__main__":
+    baseline_revision = sys.argv[1] if len(sys.argv) > 1 else None
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    results = {"current": measure(TOP_LEVEL_DIR, repeat)}
+
+    if baseline_revision is not None:
+        with tempfile.TemporaryDirectory() as temporary_directory:
+            worktree = Path(temporary_directory) / "baseline"
+            subprocess.run(
+                ["git", "worktree", "add", "--detach", worktree, baseline_revision],
+                cwd=TOP_LEVEL_DIR,
+                check=True,
+                stdout=subprocess.DEVNULL,
+            )
+            try:
+                results[baseline_revision] = measure(worktree, repeat)
+            finally:
+                subprocess.run(
+                    ["git", "worktree", "remove", "--force", worktree],
+                    cwd=TOP_LEVEL_DIR,
+                    check=True,
+                )
+
+    for name in COMMANDS:
+        timings = ", ".join(
+            f"{label}: {result[name]:.2f} s" for label, result in results.items()
+        )
+        print(f"{name:28s} {timings}")
@@ -0,0 +1,63 @@
+"""Measure the throughput of the LLM scoring client against the local stub server.
+
+Usage:
+    python benchmarks/benchmark_llm_scoring_client.py [number of snippets] [latency in seconds]
+
+Every request to the stub server takes the given latency, so the throughput should
+grow with the concurrency until the rate limit (if any) is reached.
+
+"""
+import asyncio
+import sys
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+
+from debt_crisis.gpt_sentiment_index.llm_scoring_client import (
+    JsonLinesScoringBackend,
+    JsonLinesStubServer,
+    StubScoringBackend,
+    score_snippets,
+)
+
+
+def create_snippets(number_of_snippets):
+    return pd.DataFrame(
+        {
+            "Snippet_ID": range(1, number_of_snippets + 1),
+            "Snippet": "the recovery of greek bonds after the debt crisis " * 16,
+            "Country": "greece",
+        }
+    )
+
+
+async def measure(snippet_data, latency_seconds, max_concurrency, output_directory):
+    async with JsonLinesStubServer(StubScoringBackend(latency_seconds)) as server:
+        return await score_snippets(
+            snippet_data,
+            JsonLinesScoringBackend(server.host, server.port),
+            Path(output_directory) / f"output_{max_concurrency}.csv",
+            batch_size=20,
+            max_concurrency=max_concurrency,
+        )
+
+
+if __name__ == "__main__":
+    number_of_snippets = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    latency_seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 0.2
+
+    snippet_data = create_snippets(number_of_snippets)
+    print(f"{number_of_snippets} snippets, {latency_seconds} s latency per request")
+
+    with tempfile.TemporaryDirectory() as output_directory:
+        for max_concurrency in [1, 4, 16]:
+            summary = asyncio.run(
+                measure(
+                    snippet_data, latency_seconds, max_concurrency, output_directory
+                )
+            )
+            print(
+                f"max_concurrency {max_concurrency:>2}: "
+                f"{summary['Snippets_per_Second']:8.1f} snippets per second"
+            )
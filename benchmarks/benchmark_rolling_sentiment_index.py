@@ -0,0 +1,61 @@
+"""Compare the loop and the cumulative sums engine of
+calculate_loughlan_mcdonald_sentiment_index on synthetic transcript scores.
+
+Usage:
+    python benchmarks/benchmark_rolling_sentiment_index.py [number of transcripts] [number of countries]
+
+The loop engine slices the data once per day and country, so with the defaults
+(27 countries, 2003 to 2023) it takes a few minutes.
+
+"""
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from debt_crisis.sentiment_index.clean_sentiment_data import (
+    calculate_loughlan_mcdonald_sentiment_index,
+)
+
+
+def create_transcript_scores(number_of_transcripts, countries, seed=0):
+    rng = np.random.default_rng(seed)
+    scores = pd.DataFrame(
+        {
+            "Date": pd.to_datetime("2002-01-01")
+            + pd.to_timedelta(rng.integers(0, 7700, number_of_transcripts), unit="D"),
+        }
+    )
+    for country in countries:
+        scores[f"Sentiment_Index_McDonald_{country}"] = rng.integers(
+            -30, 30, number_of_transcripts
+        )
+
+    return scores.sort_values("Date").reset_index(drop=True)
+
+
+def seconds(rolling_engine, scores, countries):
+    start_time = time.perf_counter()
+    sentiment_index = calculate_loughlan_mcdonald_sentiment_index(
+        scores.copy(), countries, rolling_engine=rolling_engine
+    )
+    return time.perf_counter() - start_time, sentiment_index
+
+
+if __name__ == "__main__":
+    number_of_transcripts = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    number_of_countries = int(sys.argv[2]) if len(sys.argv) > 2 else 27
+
+    countries = [f"Country{number}" for number in range(number_of_countries)]
+    scores = create_transcript_scores(number_of_transcripts, countries)
+    print(f"{number_of_transcripts} transcripts, {number_of_countries} countries")
+
+    fast_seconds, fast_index = seconds("cumulative_sums", scores, countries)
+    print(f"cumulative_sums: {fast_seconds:8.3f} s")
+
+    loop_seconds, loop_index = seconds("loop", scores, countries)
+    print(f"loop:            {loop_seconds:8.3f} s")
+
+    pd.testing.assert_frame_equal(fast_index, loop_index)
+    print(f"Identical output, speed-up {loop_seconds / fast_seconds:,.0f}x")
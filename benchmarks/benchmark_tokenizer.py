@@ -0,0 +1,69 @@
+"""Compare the tokens per second of the full spaCy pipeline with the tokenizer-only
+mode of tokenize_text_and_remove_non_alphabetic_characters_and_stop_words.
+
+Usage:
+    python benchmarks/benchmark_tokenizer.py [transcript directory] [number of files]
+
+Without a directory the benchmark uses a synthetic transcript of a few hundred KB.
+
+"""
+import sys
+import time
+
+import pandas as pd
+
+from debt_crisis.config import SRC, get_nlp_model
+from debt_crisis.sentiment_index.clean_sentiment_data import (
+    normalise_transcript_text,
+    tokenize_text_and_remove_non_alphabetic_characters_and_stop_words,
+)
+
+from benchmark_transcript_normaliser import load_transcripts
+
+NLP_MODEL = get_nlp_model()
+
+SETTINGS = [
+    {"tokenizer_only": False, "batch_size": None, "n_process": 1},
+    {"tokenizer_only": True, "batch_size": None, "n_process": 1},
+    {"tokenizer_only": True, "batch_size": 16, "n_process": 1},
+    {"tokenizer_only": True, "batch_size": 16, "n_process": 4},
+]
+
+
+def tokens_per_second(column, **settings):
+    start_time = time.perf_counter()
+    tokenized_texts = tokenize_text_and_remove_non_alphabetic_characters_and_stop_words(
+        column, NLP_MODEL, **settings
+    )
+    elapsed_seconds = time.perf_counter() - start_time
+
+    number_of_tokens = sum(len(doc) for doc in NLP_MODEL.tokenizer.pipe(column))
+
+    return number_of_tokens / elapsed_seconds, tokenized_texts
+
+
+if __name__ == "__main__":
+    transcript_directory = (
+        sys.argv[1]
+        if len(sys.argv) > 1
+        else SRC / "data" / "transcripts" / "raw" / "Eikon 2002 - 2022"
+    )
+    number_of_files = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+    column = pd.Series(
+        [
+            normalise_transcript_text(transcript)
+            for transcript in load_transcripts(transcript_directory, number_of_files)
+        ]
+    )
+    print(f"{len(column)} transcripts, pipeline {NLP_MODEL.pipe_names}")
+
+    reference_output = None
+    for settings in SETTINGS:
+        rate, tokenized_texts = tokens_per_second(column, **settings)
+
+        if reference_output is None:
+            reference_output = tokenized_texts
+        assert tokenized_texts.equals(reference_output), settings
+
+        print(f"{settings}: {rate:12,.0f} tokens/s")
@@ -0,0 +1,80 @@
+"""Compare preprocess_transcript_text with the fused normalise_transcript_text.
+
+Usage:
+    python benchmarks/benchmark_transcript_normaliser.py [transcript directory] [number of files]
+
+Without a directory the benchmark uses a synthetic transcript of a few hundred KB.
+
+"""
+import random
+import sys
+import timeit
+from pathlib import Path
+
+from debt_crisis.config import SRC
+from debt_crisis.sentiment_index.clean_sentiment_data import (
+    extract_data_from_file,
+    normalise_transcript_text,
+    preprocess_transcript_text,
+)
+
+SYNTHETIC_BLOCK = """
+================================================================================
+Presentation
+--------------------------------------------------------------------------------
+Operator   [1]
+--------------------------------------------------------------------------------
+ Good morning, ladies and gentlemen. * Revenues in Greece rose by 12% \\ in 2010.
+ The outlook for Portugal and  Spain remains   uncertain.
+
+"""
+
+
+def load_transcripts(transcript_directory, number_of_files):
+    transcript_files = sorted(Path(transcript_directory).rglob("*.txt"))
+
+    if not transcript_files:
+        return [SYNTHETIC_BLOCK * 1500]
+
+    sample = random.Random(42).sample(
+        transcript_files, min(number_of_files, len(transcript_files))
+    )
+
+    return [extract_data_from_file(file_path)["Transcript"] for file_path in sample]
+
+
+def time_per_transcript(function, transcripts, repeat=5):
+    total_seconds = min(
+        timeit.repeat(
+            lambda: [function(transcript) for transcript in transcripts],
+            number=1,
+            repeat=repeat,
+        )
+    )
+
+    return total_seconds / len(transcripts)
+
+
+if __name__ == "__main__":
+    transcript_directory = (
+        sys.argv[1]
+        if len(sys.argv) > 1
+        else SRC / "data" / "transcripts" / "raw" / "Eikon 2002 - 2022"
+    )
+    number_of_files = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+    transcripts = load_transcripts(transcript_directory, number_of_files)
+
+    for transcript in transcripts:
+        assert normalise_transcript_text(transcript) == preprocess_transcript_text(
+            transcript
+        )
+
+    sequential = time_per_transcript(preprocess_transcript_text, transcripts)
+    fused = time_per_transcript(normalise_transcript_text, transcripts)
+    average_kb = sum(map(len, transcripts)) / len(transcripts) / 1e3
+
+    print(f"{len(transcripts)} transcripts, {average_kb:.0f} KB on average")
+    print(f"preprocess_transcript_text: {sequential * 1e3:8.2f} ms per transcript")
+    print(f"normalise_transcript_text:  {fused * 1e3:8.2f} ms per transcript")
+    print(f"Speedup: {sequential / fused:.2f}x")
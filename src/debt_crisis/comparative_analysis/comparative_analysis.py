@@ -1,7 +1,7 @@
 import pandas as pd
 
 from debt_crisis.gpt_sentiment_index.gpt_index_analysis import (
-    calculate_gpt_sentiment_index,
+    calculate_gpt_sentiment_index_for_all_countries,
 )
 
 
@@ -26,16 +26,7 @@ def create_dataframe_with_all_results_for_analysis(
 
     # Create full GPT data
 
-    all_countries = gpt_data["Country"].unique()
-    full_gpt_index = pd.DataFrame()
-
-    for country in all_countries:
-        gpt_data_country = gpt_data[gpt_data["Country"] == country]
-        gpt_index_country = calculate_gpt_sentiment_index(gpt_data_country, country)
-        gpt_index_country["Country"] = country  # Add the country name as a column
-        full_gpt_index = pd.concat(
-            [full_gpt_index, gpt_index_country], ignore_index=True
-        )
+    full_gpt_index = calculate_gpt_sentiment_index_for_all_countries(gpt_data)
 
     # Merge Everything
 
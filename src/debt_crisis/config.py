@@ -1,7 +1,8 @@
 """All the general configuration of the project."""
+import functools
+import os
 from pathlib import Path
 
-import spacy
 import random
 
 # -------------Configurations----------------#
@@ -10,12 +11,64 @@ EVENT_STUDY_TIME_PERIOD = ["2008Q1", "2014Q1"]
 
 NO_LONG_RUNNING_TASKS = False
 
+# Number of processes for the parallel parts of the transcript pipeline (1 = serial)
+N_WORKERS = max(1, (os.cpu_count() or 1) - 1)
+
+# Build df_transcripts_clean_step_1_parquet by streaming the raw files in chunks
+# instead of building df_transcripts_raw_parquet and the step 1 dataset in memory
+STREAM_TRANSCRIPT_PREPROCESSING = False
+TRANSCRIPT_CHUNK_SIZE = 2000
+
+# Cache preprocessed transcripts on disk (see TRANSCRIPT_CACHE_DIRECTORY below)
+USE_TRANSCRIPT_CACHE = True
+TRANSCRIPT_CACHE_MAX_BYTES = 5 * 10**9
+
 CONFIGURATION_SETTINGS = {
     "sentiment_index_calculation_method": "negative_and_positive",  # "negative_and_positive" or "negative"
     "words_in_environment": 20,
     "event_study_time_period": ["2008Q1", "2014Q1"],
 }
 
+# Robustness check of words_in_environment: step 2 is computed for all window sizes
+# in one pass and written once per window size, as df_transcripts_clean_step_2_sweep
+RUN_WORDS_IN_ENVIRONMENT_SWEEP = False
+WORDS_IN_ENVIRONMENT_SWEEP = [5, 10, 20, 40, 80]
+
+# Trailing windows and exponential decay half-lives (in days) of the sentiment
+# indices that are calculated side by side for model selection
+SENTIMENT_INDEX_DAY_WINDOWS = [30, 60, 90, 180]
+SENTIMENT_INDEX_HALF_LIVES = [30, 90]
+
+# Update the daily sentiment indices with the new transcripts and predictions only,
+# keeping the state of the last update. An end date of None continues the indices
+# up to the day of the update; the resolved date is an input of the update tasks, so
+# pytask runs them again on the next day.
+UPDATE_SENTIMENT_INDICES_INCREMENTALLY = False
+SENTIMENT_INDEX_START_DATE = "2003-01-01"
+SENTIMENT_INDEX_END_DATE = None
+
+# Encode the preprocessed transcripts once as vocabulary IDs, the words_in_environment
+# sweep then scores the encoded corpus with NumPy
+ENCODE_TRANSCRIPT_CORPUS = False
+
+# Keep an index of the country mentions, so that the country scorers and the snippet
+# extraction only visit transcripts that mention a country
+USE_COUNTRY_MENTION_INDEX = False
+
+# Merge the overlapping snippets of the same transcript and country before they are
+# sent to the LLM
+MERGE_OVERLAPPING_SNIPPETS = False
+
+# Score the cleaned snippets with the asynchronous LLM scoring client
+SCORE_SNIPPETS_WITH_LLM = False
+# "host:port" of the scoring service, or "stub" to score with an offline word list
+# for testing. None stops the scoring task with an error.
+LLM_SCORING_BACKEND = None
+LLM_SCORING_BATCH_SIZE = 20
+LLM_SCORING_MAX_CONCURRENCY = 4
+LLM_SCORING_REQUESTS_PER_SECOND = 2
+LLM_SCORING_MAX_RETRIES = 3
+
 EVENT_STUDY_MODEL_LIST = [
     "Q('10y_Maturity_Bond_Yield') ~ Q('Public_Debt_as_%_of_GDP')+ GDP_in_Current_Prices_Growth + Moody_Rating_PD + "
     "VIX_Daily_Close_Quarterly_Mean + Q('10y_Maturity_Bond_Yield_US') + C(Country) +",
@@ -45,6 +98,14 @@ TOP_LEVEL_DIR = SRC.joinpath("..", "..").resolve()
 TEST_DIR = SRC.joinpath("..", "..", "tests").resolve()
 PAPER_DIR = SRC.joinpath("..", "..", "paper").resolve()
 
+TRANSCRIPT_CACHE_DIRECTORY = BLD / "cache" / "preprocessed_transcripts"
+
+# Metadata files of the transcript datasets, see write_transcript_dataset
+TRANSCRIPTS_RAW_PATH = BLD / "data" / "df_transcripts_raw_parquet" / "_common_metadata"
+TRANSCRIPTS_CLEAN_STEP_1_PATH = (
+    BLD / "data" / "df_transcripts_clean_step_1_parquet" / "_common_metadata"
+)
+
 
 __all__ = ["BLD", "SRC", "TEST_DIR", "GROUPS"]
 
@@ -154,7 +215,28 @@ EUROPEAN_COUNTRIES_IN_QUARTERLY_MACROECONOMIC_VARIABLES = [
     "sweden",
 ]
 
-NLP_MODEL = spacy.load("en_core_web_sm")
+SPACY_MODEL_NAME = "en_core_web_sm"
+
+
+@functools.lru_cache(maxsize=None)
+def get_nlp_model(model_name=SPACY_MODEL_NAME):
+    """Load a spaCy model on first use and return the same instance afterwards.
+
+    spaCy is only imported here, so importing the config does not load it.
+
+    """
+    import spacy
+
+    return spacy.load(model_name)
+
+
+def __getattr__(name):
+    # NLP_MODEL is loaded when it is first accessed, not when the config is imported
+    if name == "NLP_MODEL":
+        return get_nlp_model()
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 VARIABLES_IN_GLOBAL_FISCAL_RAW_DATA = [
     "ggdy",
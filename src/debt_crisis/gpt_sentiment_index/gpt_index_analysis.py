@@ -4,6 +4,17 @@ import numpy as np
 from datetime import timedelta
 import seaborn as sns
 
+from debt_crisis.gpt_sentiment_index.gpt_sentiment_index import create_snippet_keys
+from debt_crisis.sentiment_index.incremental_sentiment_index import (
+    prepare_sentiment_index_state,
+    update_sentiment_index_state,
+)
+from debt_crisis.sentiment_index.rolling_sentiment_index import (
+    calculate_grouped_multi_window_means,
+    calculate_grouped_rolling_window_means,
+    convert_window_means_to_long_format,
+)
+
 
 def clean_llm_output_data(
     llm_output_data: pd.DataFrame,
@@ -22,12 +33,22 @@ def clean_llm_output_data(
 
     """
 
-    # Add Transcript_ID
+    # Add Transcript_ID. The output of the scoring client is matched by the stable
+    # Snippet_Key, because its Snippet_IDs can be from an earlier extraction
+    if "Snippet_Key" in llm_output_data.columns:
+        llm_output_data = llm_output_data.drop(columns="Snippet_ID")
+        training_data = training_data.assign(
+            Snippet_Key=create_snippet_keys(training_data)
+        )
+        merge_column = "Snippet_Key"
+    else:
+        merge_column = "Snippet_ID"
+
     full_data = llm_output_data.merge(
         training_data,
         how="left",
-        left_on="Snippet_ID",
-        right_on="Snippet_ID",
+        left_on=merge_column,
+        right_on=merge_column,
         validate="one_to_one",
     )
 
@@ -62,16 +83,183 @@ def clean_llm_output_data(
     return full_data
 
 
+def calculate_gpt_sentiment_index_for_all_countries(
+    preprocessed_data, day_window=90, countries=None
+):
+    """This function calculates the GPT sentiment index of all countries in one pass.
+    The predictions are sorted by country and date once, and the trailing mean of
+    every country is calculated with cumulative sums instead of one mask per day.
+
+    Args:
+        preprocessed_data (pd.DataFrame): Dataframe with the data from gpt, with the
+            columns Date, Country and Prediction
+        day_window (int): Number of days to consider for the sentiment index
+        countries (list): Countries to calculate. None uses all countries in the data
+            in the order of their first appearance.
+
+    Returns:
+        pd.DataFrame: Dataframe with the sentiment index in long format
+        columns: Date (pd.DateTime): Date of sentiment index
+                Country (str): Country of the sentiment index
+                Sentiment_GPT (float): Sentiment index for the country and date
+
+    """
+
+    # Create date range from January 2003 to January 2023
+    date_range = pd.date_range(start="1/1/2003", end="1/1/2023")
+
+    countries, window_means = calculate_grouped_rolling_window_means(
+        pd.to_datetime(preprocessed_data["Date"]),
+        preprocessed_data["Prediction"],
+        preprocessed_data["Country"],
+        date_range,
+        day_window,
+        group_names=countries,
+    )
+
+    return pd.DataFrame(
+        {
+            "Date": np.tile(date_range, len(countries)),
+            "Country": np.repeat(countries, len(date_range)),
+            "Sentiment_GPT": window_means.T.ravel(),
+        }
+    )
+
+
+def calculate_gpt_sentiment_index_for_multiple_windows(
+    preprocessed_data, day_windows=(90,), half_lives=(), countries=None
+):
+    """This function calculates the GPT sentiment index of all countries for several
+    trailing windows and exponential decay half-lives in one pass over the sorted
+    predictions.
+
+    Args:
+        preprocessed_data (pd.DataFrame): Dataframe with the data from gpt, with the
+            columns Date, Country and Prediction
+        day_windows (list): Numbers of days of the trailing windows
+        half_lives (list): Half-lives in days of the exponentially decayed indices
+        countries (list): Countries to calculate. None uses all countries in the data
+            in the order of their first appearance.
+
+    Returns:
+        pd.DataFrame: Dataframe with the sentiment indices in long format
+        columns: Date (pd.DateTime): Date of sentiment index
+                Country (str): Country of the sentiment index
+                Weighting (str): "trailing_mean" or "exponential_decay"
+                Window_Days (int): Length of the window or half-life in days
+                Sentiment_GPT (float): Sentiment index
+
+    """
+
+    # Create date range from January 2003 to January 2023
+    date_range = pd.date_range(start="1/1/2003", end="1/1/2023")
+
+    countries, window_means = calculate_grouped_multi_window_means(
+        pd.to_datetime(preprocessed_data["Date"]),
+        preprocessed_data["Prediction"],
+        preprocessed_data["Country"],
+        date_range,
+        day_windows,
+        half_lives,
+        group_names=countries,
+    )
+
+    return convert_window_means_to_long_format(
+        window_means, date_range, countries, "Sentiment_GPT"
+    )
+
+
+def update_gpt_sentiment_index(
+    preprocessed_data,
+    state=None,
+    countries=None,
+    day_window=None,
+    start_date=None,
+    end_date=None,
+):
+    """This function adds new GPT predictions to the state of the sentiment index and
+    calculates the index again only for the days whose window contains a new
+    prediction and for the days after the last end date.
+
+    The predictions are identified by the Snippet_Key of create_snippet_keys, not by
+    the positional Snippet_ID, so the state stays valid when the snippets are
+    extracted again. Predictions that are already in the state are skipped, and
+    revised predictions of a known snippet replace the old ones.
+
+    Args:
+        preprocessed_data (pd.DataFrame): Dataframe with the new (or all) data from
+            gpt, with the columns Transcript_ID, Snippet, Date, Country and Prediction
+        state (dict): State of the index of the last update, see
+            incremental_sentiment_index.py. None starts a new index.
+        countries (list): Countries of the index. None uses the countries of the
+            state, or all countries in the data in the order of their first
+            appearance for a new index. Predictions of other countries are ignored.
+        day_window (int): Number of days to consider for the sentiment index. None
+            uses the window of the state or 90 days for a new index.
+        start_date (str): First date of the index. None uses the start date of the
+            state or 2003-01-01 for a new index.
+        end_date (str): Last date of the index. None continues the index up to today.
+
+    Returns:
+        dict: The updated state. get_gpt_sentiment_index_from_state gives the index
+            in the format of calculate_gpt_sentiment_index_for_all_countries.
+
+    Raises:
+        ValueError: If the countries, day_window or start_date differ from the state
+
+    """
+    if state is None and countries is None:
+        countries = list(pd.unique(preprocessed_data["Country"]))
+    state = prepare_sentiment_index_state(state, countries, day_window, start_date)
+
+    # One column per country, with the prediction in the column of its country
+    country_dummies = (
+        pd.get_dummies(preprocessed_data["Country"])
+        .reindex(columns=state["Columns"], fill_value=False)
+        .to_numpy(dtype=np.float64)
+    )
+
+    return update_sentiment_index_state(
+        state,
+        pd.to_datetime(preprocessed_data["Date"]),
+        country_dummies * preprocessed_data["Prediction"].to_numpy()[:, np.newaxis],
+        country_dummies,
+        create_snippet_keys(preprocessed_data),
+        end_date,
+    )
+
+
+def get_gpt_sentiment_index_from_state(state):
+    """Return the index of a state in long format with the columns Date, Country and
+    Sentiment_GPT."""
+    index = state["Index"]
+
+    return pd.DataFrame(
+        {
+            "Date": np.tile(index.index, len(state["Columns"])),
+            "Country": np.repeat(state["Columns"], len(index)),
+            "Sentiment_GPT": index.to_numpy().T.ravel(),
+        }
+    )
+
+
 def calculate_gpt_sentiment_index(
-    preprocessed_data, country_under_study, day_window=90
+    preprocessed_data,
+    country_under_study,
+    day_window=90,
+    rolling_engine="cumulative_sums",
 ):
     """This function calculates the sentiment index taking as input the preprocessed
     data generated by earlier functions in this script.
 
+    The "cumulative_sums" engine uses calculate_gpt_sentiment_index_for_all_countries
+    and gives the same index as the "loop" engine, which masks the data once per day.
+
     Args:
         preprocessed_data (pd.DataFrame): Dataframe with the data from gpt
         countries_under_study (list): List of countries to consider
         day_window (int): Number of days to consider for the sentiment index
+        rolling_engine (str): "cumulative_sums" or "loop"
 
     Returns:
         pd.DataFrame: Dataframe with the sentiment index
@@ -79,6 +267,13 @@ def calculate_gpt_sentiment_index(
                 Sentiment_Index_country (int): Sentiment index for the country (there is one of such columns for every country under study.)
 
     """
+    if rolling_engine == "cumulative_sums":
+        # All rows belong to the country under study, as in the loop
+        return calculate_gpt_sentiment_index_for_all_countries(
+            preprocessed_data.assign(Country=country_under_study),
+            day_window,
+            countries=[country_under_study],
+        )
 
     # Ensure 'Date' column in preprocessed_data is of datetime type
     preprocessed_data["Date"] = pd.to_datetime(preprocessed_data["Date"])
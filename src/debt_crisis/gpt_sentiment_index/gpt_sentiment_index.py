@@ -0,0 +1,531 @@
+from debt_crisis.sentiment_index.clean_sentiment_data import (
+    get_country_appearance_index_from_transcript_text,
+)
+from debt_crisis.sentiment_index.corpus_encoding import WORD_REGEX
+
+import bisect
+import functools
+import hashlib
+import pandas as pd
+import random
+import re
+import matplotlib.pyplot as plt
+import seaborn as sns
+
+SNIPPET_COLUMNS = ["Keyword", "Transcript_ID", "Snippet"]
+MERGED_SNIPPET_COLUMNS = SNIPPET_COLUMNS + ["Country", "Source_Offsets"]
+
+
+def create_set_with_all_country_words(country_names_file):
+    # Flatten the DataFrame to a single list
+    country_words = country_names_file.values.flatten()
+
+    # Remove NaN values
+    country_words = [word for word in country_words if pd.notna(word)]
+
+    # Create a set of unique words
+    country_words_set = set(country_words)
+
+    return country_words_set
+
+
+def create_snippet_keys(snippet_data):
+    """This function creates an ID for every snippet that does not depend on the
+    position of the snippet in the dataset, unlike the Snippet_ID. The key is a hash
+    of the Transcript_ID, the Country and the text of the snippet, followed by the
+    number of the occurrence if the same snippet appears several times.
+
+    Args:
+        snippet_data (pd.DataFrame): Snippets with the columns Transcript_ID, Country
+            and Snippet
+
+    Returns:
+        pd.Series: Snippet_Key of every snippet, with the index of snippet_data
+
+    """
+    hashes = pd.Series(
+        [
+            hashlib.sha256(
+                f"{transcript_id}|{country}|{snippet}".encode("utf-8")
+            ).hexdigest()[:32]
+            for transcript_id, country, snippet in zip(
+                snippet_data["Transcript_ID"],
+                snippet_data["Country"],
+                snippet_data["Snippet"],
+            )
+        ],
+        index=snippet_data.index,
+    )
+    occurrences = hashes.groupby(hashes).cumcount()
+
+    return (hashes + "-" + occurrences.astype(str)).rename("Snippet_Key")
+
+
+def compile_keyword_pattern(keywords):
+    """This function compiles all keywords into one regular expression, so that a
+    text is scanned once for all of them.
+
+    The alternatives are sorted from the longest to the shortest keyword, so that
+    of two keywords starting at the same character the longest one matches, e.g.
+    "czech republic" before "czech". The words of a multi-word keyword may be
+    separated by any whitespace.
+
+    Args:
+        keywords (iterable): Keywords, e.g. the set with all country words
+
+    Returns:
+        re.Pattern: The compiled pattern
+
+    """
+    sorted_keywords = sorted(
+        {str(keyword) for keyword in keywords},
+        key=lambda keyword: (-len(keyword), keyword),
+    )
+    alternatives = [
+        r"\s+".join(re.escape(word) for word in keyword.split())
+        for keyword in sorted_keywords
+    ]
+
+    return re.compile(r"\b(?:" + "|".join(alternatives) + r")\b")
+
+
+@functools.lru_cache(maxsize=16)
+def _get_keyword_pattern(keywords):
+    return compile_keyword_pattern(keywords)
+
+
+def find_keyword_offsets(text, keywords):
+    """This function finds every keyword in the text in one scan. The keyword
+    pattern is compiled once per set of keywords and re-used for all texts.
+
+    Args:
+        text (str): The text in which we want to find the keywords
+        keywords (set): A set of keywords
+
+    Returns:
+        list: (keyword, char offset) of every match, in the order of the text
+
+    """
+    if not keywords:
+        return []
+
+    keyword_pattern = _get_keyword_pattern(frozenset(keywords))
+
+    return [
+        (" ".join(match.group().split()), match.start())
+        for match in keyword_pattern.finditer(text)
+    ]
+
+
+def get_a_text_snippet_if_there_is_country_mentioned(
+    full_data, country_words_set, context=50
+):
+    row = full_data.sample(1)
+    transcript_id = row["Transcript_ID"].values[0]
+
+    # Get the 'Transcript'
+    transcript = row["Preprocessed_Transcript_Step_1"].values[0]
+
+    keyword_offsets = find_keyword_offsets(transcript, country_words_set)
+
+    if keyword_offsets:
+        # Randomly pick a word
+        word = random.choice(sorted({keyword for keyword, _ in keyword_offsets}))
+
+        # Split the 'Transcript' into words
+        word_matches = list(re.finditer(r"\S+", transcript))
+
+        # Find the index of the word at its first occurrence
+        offset = next(offset for keyword, offset in keyword_offsets if keyword == word)
+        index = (
+            bisect.bisect_right([match.start() for match in word_matches], offset) - 1
+        )
+
+        # Get the 40 preceding and succeeding words
+        start = max(0, index - context)
+        end = min(len(word_matches), index + context)
+        snippet = [match.group() for match in word_matches[start:end]]
+
+        # Create a single-row DataFrame
+        result = pd.DataFrame(
+            {
+                "Keyword": [word],
+                "Transcript_ID": [transcript_id],
+                "Snippet": [snippet],
+            }
+        )
+
+        return result
+
+    else:
+        return None
+
+
+def extract_gpt_training_dataset_from_preprocessed_transcripts(
+    transcript_row, country_names_set, context=400
+):
+    """This function is written to be applied on every row of the dataframe preprocessed
+    transcripts step 1. It extracts a new dataframe with the complete data we want to
+    parse to a large language model.
+
+    To extract the snippets of many transcripts, use extract_gpt_training_dataset,
+    which creates one dataframe for all transcripts.
+
+    Args:
+        transcript (str): The preprocessed transcript
+        country_names_set (set): A set with all country names
+
+    Returns:
+        pd.DataFrame:
+            columns: Keyword ('str'): The keyword based on which the snippet was chosen
+                    Transcript_ID ('str'): The transcript ID
+                    Snippet ('str'): The transcript snippet
+
+    """
+    snippet_buffers = {column: [] for column in SNIPPET_COLUMNS}
+
+    _append_transcript_snippets(
+        snippet_buffers,
+        transcript_row["Transcript_ID"],
+        transcript_row["Preprocessed_Transcript_Step_1"],
+        country_names_set,
+        context,
+    )
+
+    return pd.DataFrame(snippet_buffers)
+
+
+def extract_gpt_training_dataset(
+    transcripts_data,
+    country_names_set,
+    context=400,
+    output_path=None,
+    merge_overlapping_snippets=False,
+    mapping_country_names_to_country=None,
+):
+    """This function extracts the snippets around every country word of all
+    transcripts. The snippets are appended to one list per column and the
+    dataframe is created once at the end, so the runtime is linear in the size of
+    the corpus and the memory use scales with the number of snippets.
+
+    With merge_overlapping_snippets, the windows of the mentions of the same country
+    in a transcript that overlap or touch are merged into one snippet, so that a
+    paragraph that mentions a country several times is sent to the LLM once. The
+    number of saved LLM calls and tokens is printed.
+
+    Args:
+        transcripts_data (pd.DataFrame): Dataframe with the columns Transcript_ID and
+            Preprocessed_Transcript_Step_1
+        country_names_set (set): A set with all country names
+        context (int): Number of characters before and after the country word
+        output_path (str or pathlib.Path): If given, the snippets are also written to
+            this Parquet file
+        merge_overlapping_snippets (bool): Merge the overlapping windows of the same
+            transcript and country
+        mapping_country_names_to_country (dict): Country of every country word, used
+            to merge the windows of e.g. "greece" and "greek". Words that are not in
+            the mapping are their own country.
+
+    Returns:
+        pd.DataFrame:
+            columns: Keyword ('str'): The keyword based on which the snippet was chosen
+                    (the first keyword of a merged snippet)
+                    Transcript_ID ('str'): The transcript ID
+                    Snippet ('str'): The transcript snippet
+                    Country ('str'): Only with merge_overlapping_snippets, the country
+                    of the keywords
+                    Source_Offsets (list): Only with merge_overlapping_snippets, the
+                    char offsets of the keywords in the snippet
+
+    """
+    country_names_set = frozenset(country_names_set)
+
+    return _extract_snippets_of_transcripts(
+        transcripts_data,
+        [country_names_set] * len(transcripts_data),
+        context,
+        output_path,
+        merge_overlapping_snippets,
+        mapping_country_names_to_country,
+    )
+
+
+def _extract_snippets_of_transcripts(
+    transcripts_data,
+    keywords_of_transcripts,
+    context,
+    output_path,
+    merge_overlapping_snippets,
+    mapping_country_names_to_country,
+):
+    """Extract the snippets of all transcripts, searching every transcript for its
+    own set of keywords. Transcripts with an empty set are skipped."""
+    if merge_overlapping_snippets:
+        snippet_buffers = {column: [] for column in MERGED_SNIPPET_COLUMNS}
+        hit_counts = {"hits": 0, "characters": 0}
+    else:
+        snippet_buffers = {column: [] for column in SNIPPET_COLUMNS}
+
+    for transcript_id, transcript_string, keywords in zip(
+        transcripts_data["Transcript_ID"],
+        transcripts_data["Preprocessed_Transcript_Step_1"],
+        keywords_of_transcripts,
+    ):
+        if not keywords:
+            continue
+
+        if merge_overlapping_snippets:
+            _append_merged_transcript_snippets(
+                snippet_buffers,
+                hit_counts,
+                transcript_id,
+                transcript_string,
+                keywords,
+                context,
+                mapping_country_names_to_country or {},
+            )
+        else:
+            _append_transcript_snippets(
+                snippet_buffers,
+                transcript_id,
+                transcript_string,
+                keywords,
+                context,
+            )
+
+    output = pd.DataFrame(snippet_buffers)
+
+    if output_path is not None:
+        output.to_parquet(output_path, index=False)
+
+    print(f"Extracted {len(output)} snippets from {len(transcripts_data)} transcripts")
+
+    if merge_overlapping_snippets:
+        report_snippet_merge_savings(
+            hit_counts["hits"], hit_counts["characters"], output["Snippet"]
+        )
+
+    return output
+
+
+def report_snippet_merge_savings(
+    number_of_hits, hit_characters, merged_snippets, characters_per_token=4
+):
+    """This function prints how many LLM calls and tokens the merged snippets save
+    compared to one snippet per keyword hit. The tokens are estimated from the
+    number of characters.
+
+    Args:
+        number_of_hits (int): Number of keyword hits, i.e. unmerged snippets
+        hit_characters (int): Number of characters of the unmerged snippets
+        merged_snippets (pd.Series): The merged snippets
+        characters_per_token (float): Average number of characters per token
+
+    Returns:
+        dict: Saved_Calls and Saved_Tokens
+
+    """
+    merged_characters = int(merged_snippets.str.len().sum())
+    saved_calls = number_of_hits - len(merged_snippets)
+    saved_tokens = round((hit_characters - merged_characters) / characters_per_token)
+
+    print(
+        f"Merged {number_of_hits} keyword hits into {len(merged_snippets)} snippets: "
+        f"{saved_calls} fewer LLM calls "
+        f"({100 * saved_calls / max(number_of_hits, 1):.1f} %) and about "
+        f"{saved_tokens:,} fewer snippet tokens "
+        f"({100 * (hit_characters - merged_characters) / max(hit_characters, 1):.1f} %)"
+    )
+
+    return {"Saved_Calls": saved_calls, "Saved_Tokens": saved_tokens}
+
+
+def _append_merged_transcript_snippets(
+    snippet_buffers,
+    hit_counts,
+    transcript_id,
+    transcript_string,
+    country_names_set,
+    context,
+    mapping_country_names_to_country,
+):
+    """Append the merged snippets of one transcript to the snippet buffers, in the
+    order of the transcript, and count the unmerged hits and their characters."""
+    open_windows = {}
+    closed_windows = []
+
+    for word, index in find_keyword_offsets(transcript_string, country_names_set):
+        country = mapping_country_names_to_country.get(word, word)
+        start = max(0, index - context)
+        end = min(len(transcript_string), index + context)
+
+        hit_counts["hits"] += 1
+        hit_counts["characters"] += end - start
+
+        # The hits come in text order, so a window can only overlap the last
+        # window of its country
+        window = open_windows.get(country)
+        if window is not None and start <= window["end"]:
+            window["end"] = max(window["end"], end)
+            window["offsets"].append(index)
+        else:
+            if window is not None:
+                closed_windows.append(window)
+            open_windows[country] = {
+                "keyword": word,
+                "country": country,
+                "start": start,
+                "end": end,
+                "offsets": [index],
+            }
+
+    closed_windows.extend(open_windows.values())
+
+    for window in sorted(closed_windows, key=lambda window: window["start"]):
+        snippet_buffers["Keyword"].append(window["keyword"])
+        snippet_buffers["Transcript_ID"].append(transcript_id)
+        snippet_buffers["Snippet"].append(
+            transcript_string[window["start"] : window["end"]]
+        )
+        snippet_buffers["Country"].append(window["country"])
+        snippet_buffers["Source_Offsets"].append(window["offsets"])
+
+
+def _append_transcript_snippets(
+    snippet_buffers, transcript_id, transcript_string, country_names_set, context
+):
+    """Append the snippets around every country word of one transcript to the
+    snippet buffers, in the order of the transcript."""
+    for word, index in find_keyword_offsets(transcript_string, country_names_set):
+        start = max(0, index - context)
+        end = min(len(transcript_string), index + context)
+
+        snippet_buffers["Keyword"].append(word)
+        snippet_buffers["Transcript_ID"].append(transcript_id)
+        snippet_buffers["Snippet"].append(transcript_string[start:end])
+
+
+def extract_gpt_training_dataset_from_country_mention_index(
+    transcripts_data,
+    mention_index,
+    country_names_set,
+    alias_index,
+    context=400,
+    output_path=None,
+    merge_overlapping_snippets=False,
+    mapping_country_names_to_country=None,
+):
+    """This function extracts the same snippets as extract_gpt_training_dataset, but
+    it only searches the transcripts in the country mention index for the country
+    words.
+
+    The index is used to skip transcripts, not to find the words: a transcript can
+    only contain a country word if it contains one of the words of it that are in
+    the alias index. Country words without such a word cannot be found through the
+    index, so the other transcripts are searched for these words only (usually
+    none).
+
+    Args:
+        transcripts_data (pd.DataFrame): Dataframe with the columns Transcript_ID and
+            Preprocessed_Transcript_Step_1
+        mention_index (pd.DataFrame): Country mention index as created by
+            create_country_mention_index with the alias index
+        country_names_set (set): A set with all country names
+        alias_index (dict): Alias index the mention index was created with
+        context (int): Number of characters before and after the country word
+        output_path (str or pathlib.Path): See extract_gpt_training_dataset
+        merge_overlapping_snippets (bool): See extract_gpt_training_dataset
+        mapping_country_names_to_country (dict): See extract_gpt_training_dataset
+
+    Returns:
+        pd.DataFrame: The output of extract_gpt_training_dataset
+
+    """
+    country_names_set = frozenset(country_names_set)
+    unindexed_country_words = frozenset(
+        word
+        for word in country_names_set
+        if not any(
+            part in alias_index and WORD_REGEX.fullmatch(part)
+            for part in str(word).lower().split()
+        )
+    )
+    mentioned_transcript_ids = set(mention_index["Transcript_ID"])
+
+    return _extract_snippets_of_transcripts(
+        transcripts_data,
+        [
+            country_names_set
+            if transcript_id in mentioned_transcript_ids
+            else unindexed_country_words
+            for transcript_id in transcripts_data["Transcript_ID"]
+        ],
+        context,
+        output_path,
+        merge_overlapping_snippets,
+        mapping_country_names_to_country,
+    )
+
+
+def get_index_where_words_occur(set_of_words, text):
+    """This function returns the index of the words in the text.
+
+    Args:
+        set_of_words (set): A set of words
+        text (str): The text in which we want to find the words
+
+    Returns:
+        list: A list with the indexes of the words in the text
+
+    """
+
+    indexes = [
+        m.start()
+        for word in set_of_words
+        for m in re.finditer(r"\b" + re.escape(word) + r"\b", text)
+    ]
+
+    return indexes
+
+
+def plot_country_occurrences(data):
+    """This function plots the occurrences of each country in the 'Country' column."""
+
+    plt.rcParams["text.usetex"] = True
+    plt.rcParams["font.family"] = "serif"
+
+    sns.set_style("white")
+
+    # Capitalize the country names
+    data["Country"] = data["Country"].str.capitalize()
+
+    # Count the occurrences of each country
+    country_counts = data["Country"].value_counts()
+
+    # Calculate the percentage for each country
+    total = len(data)
+    percentages = 100 * country_counts / total
+
+    # Sort the counts in descending order
+    sorted_counts = country_counts.sort_values(ascending=False)
+
+    # Create the plot
+    fig = plt.figure(figsize=(8, 7))
+
+    bars = plt.barh(sorted_counts.index, sorted_counts.values, color="#3c5488")
+    plt.xlabel("Total Number of Occurrences")
+    plt.yticks(fontsize=8)  # Adjust font size here
+
+    # Add the percentages to the right of the bars
+    for bar, percentage in zip(bars, percentages.sort_values(ascending=False)):
+        plt.text(
+            bar.get_width() + 200,
+            bar.get_y() + bar.get_height() / 2,
+            f" ({percentage:.1f} \\%)",
+            va="center",
+        )
+
+    # Remove the top and right spines from plot
+    sns.despine()
+
+    return fig
@@ -0,0 +1,471 @@
+"""Asynchronous client that scores the GPT snippets with a large language model.
+
+The snippets of the cleaned training dataset are sent in batches to a scoring
+backend. At most max_concurrency batches are in flight at the same time, the start
+of the requests can be limited to requests_per_second, and failed batches are
+retried with exponential backoff. The results of every batch are appended to the
+output CSV as soon as they arrive, in the schema of the files in
+data/GPT_Output_Data that clean_llm_output_data reads:
+
+    Snippet_ID                id of the snippet in the cleaned training dataset
+    Excerpt                   the snippet that was scored
+    Prediction                sentiment of the snippet towards the country
+    Rationale_for_Prediction  explanation of the prediction
+    Snippet_Key               stable key of the snippet, see create_snippet_keys
+
+Snippets whose Snippet_Key is already in the output CSV are skipped, so an
+interrupted run continues where it stopped, also if the snippets were extracted
+again in between and their positional Snippet_IDs have shifted. If batches still
+fail after all retries, score_snippets raises LLMScoringError after the other
+results are written, so that the task fails and the next run sends them again.
+
+Backends implement ScoringBackend. StubScoringBackend scores the snippets with a
+small word list and can simulate latency and failures, and JsonLinesStubServer
+serves it over a local socket for JsonLinesScoringBackend, so that the throughput
+and the failure handling can be tested without network access. The scoring task
+takes the backend from the LLM_SCORING_BACKEND setting, see create_scoring_backend.
+
+"""
+import abc
+import asyncio
+import json
+import os
+import time
+
+import pandas as pd
+
+from debt_crisis.gpt_sentiment_index.gpt_sentiment_index import create_snippet_keys
+
+OUTPUT_COLUMNS = [
+    "Snippet_ID",
+    "Excerpt",
+    "Prediction",
+    "Rationale_for_Prediction",
+    "Snippet_Key",
+]
+
+# Maximum length of a JSON line of the stub protocol, far above a batch of 100
+# snippets of 800 characters
+MAX_MESSAGE_BYTES = 64 * 2**20
+
+STUB_POSITIVE_WORDS = {"growth", "strong", "recovery", "improve", "improved", "stable"}
+STUB_NEGATIVE_WORDS = {"crisis", "default", "weak", "decline", "risk", "austerity"}
+
+
+class LLMScoringError(Exception):
+    """A batch could not be scored. The batch is retried."""
+
+
+class ScoringBackend(abc.ABC):
+    """Interface of the scoring backends."""
+
+    @abc.abstractmethod
+    async def score_batch(self, snippets):
+        """Score a batch of snippets.
+
+        Args:
+            snippets (list): One dict per snippet with Snippet_ID, Snippet, Country and
+                Snippet_Key
+
+        Returns:
+            list: One dict per snippet, in the same order, with Prediction and
+                Rationale_for_Prediction
+
+        Raises:
+            LLMScoringError: If the batch could not be scored
+
+        """
+
+
+class StubScoringBackend(ScoringBackend):
+    """Deterministic backend for offline tests and benchmarks.
+
+    The prediction is the sign of the number of positive minus negative words of the
+    snippet. A batch fails for its first failures_per_batch attempts (identified by
+    the first Snippet_ID of the batch), and every batch with one of the
+    failing_snippet_ids always fails.
+
+    Args:
+        delay_seconds (float): Simulated latency of every request
+        failures_per_batch (int): Number of failed attempts of every batch
+        failing_snippet_ids (iterable): Snippet_IDs whose batch always fails
+
+    Attributes:
+        number_of_requests (int): Number of requests, including the failed ones
+        max_concurrent_requests (int): Largest number of requests at the same time
+
+    """
+
+    def __init__(self, delay_seconds=0.0, failures_per_batch=0, failing_snippet_ids=()):
+        self.delay_seconds = delay_seconds
+        self.failures_per_batch = failures_per_batch
+        self.failing_snippet_ids = set(failing_snippet_ids)
+        self.number_of_requests = 0
+        self.max_concurrent_requests = 0
+        self._concurrent_requests = 0
+        self._attempts = {}
+
+    async def score_batch(self, snippets):
+        self.number_of_requests += 1
+        self._concurrent_requests += 1
+        self.max_concurrent_requests = max(
+            self.max_concurrent_requests, self._concurrent_requests
+        )
+
+        try:
+            await asyncio.sleep(self.delay_seconds)
+
+            batch_key = snippets[0]["Snippet_ID"] if snippets else None
+            self._attempts[batch_key] = self._attempts.get(batch_key, 0) + 1
+
+            if self._attempts[batch_key] <= self.failures_per_batch:
+                raise LLMScoringError(f"Simulated failure of batch {batch_key}")
+            if any(
+                snippet["Snippet_ID"] in self.failing_snippet_ids
+                for snippet in snippets
+            ):
+                raise LLMScoringError(
+                    f"Simulated permanent failure of batch {batch_key}"
+                )
+
+            return [
+                score_snippet_with_word_list(snippet["Snippet"]) for snippet in snippets
+            ]
+
+        finally:
+            self._concurrent_requests -= 1
+
+
+def score_snippet_with_word_list(snippet):
+    """Return the stub prediction and rationale of a snippet."""
+    words = snippet.lower().split()
+    positive_words = sum(word in STUB_POSITIVE_WORDS for word in words)
+    negative_words = sum(word in STUB_NEGATIVE_WORDS for word in words)
+
+    return {
+        "Prediction": (positive_words > negative_words)
+        - (positive_words < negative_words),
+        "Rationale_for_Prediction": (
+            f"{positive_words} positive and {negative_words} negative words"
+        ),
+    }
+
+
+class JsonLinesStubServer:
+    """Local server that scores batches with a StubScoringBackend.
+
+    A request is one JSON line {"snippets": [...]}, the answer is one JSON line
+    {"results": [...]} or {"error": "..."}. Malformed requests and requests longer
+    than max_message_bytes are answered with an error. Use it as an async context
+    manager; the port is chosen by the operating system.
+
+    Args:
+        backend (StubScoringBackend): Backend that scores the batches
+        host (str): Host to listen on
+        max_message_bytes (int): Maximum length of a request line
+
+    """
+
+    def __init__(
+        self, backend=None, host="127.0.0.1", max_message_bytes=MAX_MESSAGE_BYTES
+    ):
+        self.backend = backend or StubScoringBackend()
+        self.host = host
+        self.max_message_bytes = max_message_bytes
+        self.port = None
+        self._server = None
+
+    async def __aenter__(self):
+        self._server = await asyncio.start_server(
+            self._handle, self.host, 0, limit=self.max_message_bytes
+        )
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        try:
+            try:
+                request = json.loads(await _read_line(reader, self.max_message_bytes))
+                snippets = request["snippets"]
+            except (ValueError, KeyError, TypeError) as error:
+                answer = {"error": f"Malformed or oversize request: {error}"}
+            else:
+                try:
+                    answer = {"results": await self.backend.score_batch(snippets)}
+                except LLMScoringError as error:
+                    answer = {"error": str(error)}
+
+            writer.write(json.dumps(answer).encode("utf-8") + b"\n")
+            await writer.drain()
+
+        finally:
+            writer.close()
+
+
+class JsonLinesScoringBackend(ScoringBackend):
+    """Backend that sends every batch as one JSON line to a JsonLinesStubServer (or a
+    service with the same protocol).
+
+    Args:
+        host (str): Host of the server
+        port (int): Port of the server
+        timeout_seconds (float): Timeout of one request
+        max_message_bytes (int): Maximum length of an answer line
+
+    """
+
+    def __init__(
+        self, host, port, timeout_seconds=60, max_message_bytes=MAX_MESSAGE_BYTES
+    ):
+        self.host = host
+        self.port = port
+        self.timeout_seconds = timeout_seconds
+        self.max_message_bytes = max_message_bytes
+
+    async def score_batch(self, snippets):
+        try:
+            answer = await asyncio.wait_for(
+                self._send(snippets), timeout=self.timeout_seconds
+            )
+        except (OSError, asyncio.TimeoutError, ValueError) as error:
+            raise LLMScoringError(f"Request failed: {error!r}") from error
+
+        if "error" in answer:
+            raise LLMScoringError(answer["error"])
+
+        return answer["results"]
+
+    async def _send(self, snippets):
+        reader, writer = await asyncio.open_connection(
+            self.host, self.port, limit=self.max_message_bytes
+        )
+
+        try:
+            request = {"snippets": snippets}
+            writer.write(json.dumps(request).encode("utf-8") + b"\n")
+            await writer.drain()
+
+            return json.loads(await _read_line(reader, self.max_message_bytes))
+
+        finally:
+            writer.close()
+
+
+async def _read_line(reader, limit):
+    """Read one line. A line longer than the limit of the reader is skipped up to
+    its end, so that the connection can still be answered, and raises ValueError."""
+    try:
+        return await reader.readuntil(b"\n")
+    except asyncio.IncompleteReadError as error:
+        return error.partial
+    except asyncio.LimitOverrunError:
+        while True:
+            try:
+                await reader.readuntil(b"\n")
+                break
+            except asyncio.LimitOverrunError as error:
+                await reader.readexactly(error.consumed)
+            except asyncio.IncompleteReadError:
+                break
+
+        raise ValueError(f"Line is longer than {limit} bytes")
+
+
+def create_scoring_backend(backend_address):
+    """Return the backend of the LLM_SCORING_BACKEND setting.
+
+    Args:
+        backend_address (str): "host:port" of a service with the JSON-lines protocol
+            of JsonLinesScoringBackend, or "stub" to score with the word list of
+            StubScoringBackend
+
+    Returns:
+        ScoringBackend: The backend
+
+    """
+    if backend_address is None:
+        raise ValueError(
+            "No LLM scoring backend is set. Set LLM_SCORING_BACKEND in config.py to "
+            "the host:port of the scoring service, or to 'stub' to score with the "
+            "offline word list."
+        )
+
+    if backend_address == "stub":
+        return StubScoringBackend()
+
+    host, _, port = backend_address.rpartition(":")
+    if not host or not port.isdigit():
+        raise ValueError(
+            f"LLM_SCORING_BACKEND must be 'host:port' or 'stub', got {backend_address!r}"
+        )
+
+    return JsonLinesScoringBackend(host, int(port))
+
+
+class RateLimiter:
+    """Spaces the start of the requests by at least 1 / requests_per_second seconds."""
+
+    def __init__(self, requests_per_second):
+        self.interval = 1 / requests_per_second
+        self._next_start = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self._lock:
+            now = time.monotonic()
+            if self._next_start > now:
+                await asyncio.sleep(self._next_start - now)
+            self._next_start = max(now, self._next_start) + self.interval
+
+
+async def score_snippets(
+    snippet_data,
+    backend,
+    output_path,
+    batch_size=20,
+    max_concurrency=4,
+    requests_per_second=None,
+    max_retries=3,
+    backoff_seconds=1.0,
+    raise_on_failure=True,
+):
+    """This function scores all snippets that are not yet in the output CSV and
+    appends the results batch by batch.
+
+    Args:
+        snippet_data (pd.DataFrame): Cleaned snippet dataset with the columns
+            Snippet_ID, Transcript_ID, Snippet and Country
+        backend (ScoringBackend): Backend that scores the batches
+        output_path (str or pathlib.Path): Output CSV, created if it does not exist
+        batch_size (int): Number of snippets per request
+        max_concurrency (int): Maximum number of requests at the same time
+        requests_per_second (float): Maximum rate of requests. None means no limit.
+        max_retries (int): Number of retries of a failed batch
+        backoff_seconds (float): Wait before the first retry, doubled for every
+            further retry
+        raise_on_failure (bool): Raise LLMScoringError at the end if a batch could
+            not be scored
+
+    Returns:
+        dict: Scored_Snippets, Failed_Snippets, Retries, Seconds and
+            Snippets_per_Second of this run
+
+    Raises:
+        LLMScoringError: If raise_on_failure and a batch failed after all retries.
+            The results of the other batches are written before.
+
+    """
+    scored_keys = _read_scored_snippet_keys(output_path)
+    snippets = [
+        {
+            "Snippet_ID": int(snippet_id),
+            "Snippet": snippet,
+            "Country": country,
+            "Snippet_Key": snippet_key,
+        }
+        for snippet_id, snippet, country, snippet_key in zip(
+            snippet_data["Snippet_ID"],
+            snippet_data["Snippet"],
+            snippet_data["Country"],
+            create_snippet_keys(snippet_data),
+        )
+        if snippet_key not in scored_keys
+    ]
+    batches = [
+        snippets[start : start + batch_size]
+        for start in range(0, len(snippets), batch_size)
+    ]
+
+    semaphore = asyncio.Semaphore(max_concurrency)
+    rate_limiter = RateLimiter(requests_per_second) if requests_per_second else None
+    summary = {"Scored_Snippets": 0, "Failed_Snippets": 0, "Retries": 0}
+    start_time = time.perf_counter()
+
+    async def score_and_write_batch(batch):
+        last_error = None
+        for attempt in range(max_retries + 1):
+            async with semaphore:
+                if rate_limiter is not None:
+                    await rate_limiter.wait()
+                try:
+                    results = await backend.score_batch(batch)
+                    _append_results(output_path, batch, results)
+                except LLMScoringError as error:
+                    last_error = error
+                else:
+                    summary["Scored_Snippets"] += len(batch)
+                    return
+
+            if attempt < max_retries:
+                summary["Retries"] += 1
+                await asyncio.sleep(backoff_seconds * 2**attempt)
+
+        summary["Failed_Snippets"] += len(batch)
+        print(
+            f"Batch of Snippet_ID {batch[0]['Snippet_ID']} failed after "
+            f"{max_retries} retries: {last_error}"
+        )
+
+    await asyncio.gather(*(score_and_write_batch(batch) for batch in batches))
+
+    summary["Seconds"] = time.perf_counter() - start_time
+    summary["Snippets_per_Second"] = summary["Scored_Snippets"] / max(
+        summary["Seconds"], 1e-9
+    )
+    print(
+        f"Scored {summary['Scored_Snippets']} snippets "
+        f"({summary['Snippets_per_Second']:.1f} per second), "
+        f"{summary['Failed_Snippets']} failed, {summary['Retries']} retries, "
+        f"{len(scored_keys)} were already scored"
+    )
+
+    if raise_on_failure and summary["Failed_Snippets"] > 0:
+        raise LLMScoringError(
+            f"{summary['Failed_Snippets']} snippets could not be scored. The "
+            f"{summary['Scored_Snippets']} scored snippets are kept in {output_path}, "
+            "run the scoring again to send the failed ones."
+        )
+
+    return summary
+
+
+def run_snippet_scoring(snippet_data, backend, output_path, **kwargs):
+    """Run score_snippets in a new event loop, see score_snippets."""
+    return asyncio.run(score_snippets(snippet_data, backend, output_path, **kwargs))
+
+
+def _read_scored_snippet_keys(output_path):
+    """Return the Snippet_Keys in the output CSV, an empty set if it does not exist."""
+    if not os.path.exists(output_path):
+        return set()
+
+    return set(pd.read_csv(output_path, usecols=["Snippet_Key"])["Snippet_Key"])
+
+
+def _append_results(output_path, batch, results):
+    """Append the results of a batch to the output CSV, with the header if the file
+    is new. Raises LLMScoringError if the number of results is wrong."""
+    if len(results) != len(batch):
+        raise LLMScoringError(
+            f"{len(results)} results for a batch of {len(batch)} snippets"
+        )
+
+    batch_output = pd.DataFrame(
+        {
+            "Snippet_ID": [snippet["Snippet_ID"] for snippet in batch],
+            "Excerpt": [snippet["Snippet"] for snippet in batch],
+            "Prediction": [result["Prediction"] for result in results],
+            "Rationale_for_Prediction": [
+                result["Rationale_for_Prediction"] for result in results
+            ],
+            "Snippet_Key": [snippet["Snippet_Key"] for snippet in batch],
+        },
+        columns=OUTPUT_COLUMNS,
+    )
+    batch_output.to_csv(
+        output_path, mode="a", header=not os.path.exists(output_path), index=False
+    )
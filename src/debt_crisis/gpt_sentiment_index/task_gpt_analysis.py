@@ -1,16 +1,47 @@
 from debt_crisis.gpt_sentiment_index.gpt_index_analysis import (
     clean_llm_output_data,
     calculate_gpt_sentiment_index,
+    calculate_gpt_sentiment_index_for_multiple_windows,
+    update_gpt_sentiment_index,
+    get_gpt_sentiment_index_from_state,
     plot_sentiment_indices_and_bond_yields,
     create_correlation_matrix_between_sentiment_indices_and_yields,
 )
 
 
-from debt_crisis.config import SRC, BLD
+from debt_crisis.gpt_sentiment_index.llm_scoring_client import (
+    create_scoring_backend,
+    run_snippet_scoring,
+)
+from debt_crisis.sentiment_index.incremental_sentiment_index import (
+    get_sentiment_index_end_date,
+)
+from debt_crisis.sentiment_index.transcript_storage import read_transcript_dataset
+
+
+from debt_crisis.config import (
+    SRC,
+    BLD,
+    SENTIMENT_INDEX_DAY_WINDOWS,
+    SENTIMENT_INDEX_HALF_LIVES,
+    UPDATE_SENTIMENT_INDICES_INCREMENTALLY,
+    SENTIMENT_INDEX_START_DATE,
+    SENTIMENT_INDEX_END_DATE,
+    SCORE_SNIPPETS_WITH_LLM,
+    LLM_SCORING_BACKEND,
+    LLM_SCORING_BATCH_SIZE,
+    LLM_SCORING_MAX_CONCURRENCY,
+    LLM_SCORING_REQUESTS_PER_SECOND,
+    LLM_SCORING_MAX_RETRIES,
+    STREAM_TRANSCRIPT_PREPROCESSING,
+    TRANSCRIPTS_RAW_PATH,
+    TRANSCRIPTS_CLEAN_STEP_1_PATH,
+)
 
 import pandas as pd
+import pickle
 
-from pytask import task
+from pytask import PythonNode, task
 
 
 country_list = [
@@ -28,6 +59,46 @@ country_list = [
     {"name": "sweden", "file_name": "sentiment_data_sweden_output_v001.csv"},
 ]
 
+# In streaming mode df_transcripts_raw is not built, the step 1 dataset has the same
+# metadata of the transcripts
+if STREAM_TRANSCRIPT_PREPROCESSING:
+    transcript_metadata_path = TRANSCRIPTS_CLEAN_STEP_1_PATH
+else:
+    transcript_metadata_path = TRANSCRIPTS_RAW_PATH
+
+
+if SCORE_SNIPPETS_WITH_LLM:
+    for country_dictionary in country_list:
+        country_name = country_dictionary["name"]
+
+        @task
+        def task_score_snippets_with_llm(
+            depends_on=BLD
+            / "data"
+            / "gpt_sentiment_data"
+            / "df_gpt_sentiment_training_dataset_cleaned.pkl",
+            country=country_name,
+            backend_address=LLM_SCORING_BACKEND,
+            produces=BLD
+            / "data"
+            / "GPT_Output_Data"
+            / f"sentiment_data_{country_name}_output_scored.csv",
+        ):
+            snippet_data = pd.read_pickle(depends_on)
+            snippet_data = snippet_data[snippet_data["Country"] == country]
+
+            # Raises if a batch failed after all retries, so that pytask runs the
+            # task again and only the missing snippets are sent
+            run_snippet_scoring(
+                snippet_data,
+                create_scoring_backend(backend_address),
+                produces,
+                batch_size=LLM_SCORING_BATCH_SIZE,
+                max_concurrency=LLM_SCORING_MAX_CONCURRENCY,
+                requests_per_second=LLM_SCORING_REQUESTS_PER_SECOND,
+                max_retries=LLM_SCORING_MAX_RETRIES,
+            )
+
 
 for country_dictionary in country_list:
     country_name = country_dictionary["name"]
@@ -37,7 +108,7 @@ for country_dictionary in country_list:
     def task_clean_llm_output_data(
         depends_on={
             "llm_output": SRC / "data" / "GPT_Output_Data" / file_name,
-            "raw_transcript_data": BLD / "data" / "df_transcripts_raw.pkl",
+            "raw_transcript_data": transcript_metadata_path,
             "training_data": BLD
             / "data"
             / "gpt_sentiment_data"
@@ -49,7 +120,11 @@ for country_dictionary in country_list:
         / f"sentiment_data_clean_{country_name}.pkl",
     ):
         llm_output_data = pd.read_csv(depends_on["llm_output"])
-        transcript_data = pd.read_pickle(depends_on["raw_transcript_data"])
+        # Only the metadata of the transcripts is needed, not the texts
+        transcript_data = read_transcript_dataset(
+            depends_on["raw_transcript_data"].parent,
+            columns=["Transcript_ID", "Date", "Company"],
+        )
         training_data = pd.read_pickle(depends_on["training_data"])
 
         llm_output_data_clean = clean_llm_output_data(
@@ -97,6 +172,58 @@ def task_create_full_clean_sentiment_output(
     sentiment_data_full.to_pickle(produces)
 
 
+def task_calculate_gpt_sentiment_index_for_multiple_windows(
+    depends_on=BLD / "data" / "GPT_Output_Data" / "sentiment_data_clean_full.pkl",
+    day_windows=SENTIMENT_INDEX_DAY_WINDOWS,
+    half_lives=SENTIMENT_INDEX_HALF_LIVES,
+    produces=BLD
+    / "data"
+    / "GPT_Output_Data"
+    / "gpt_sentiment_index_multiple_windows.pkl",
+):
+    sentiment_data_full = pd.read_pickle(depends_on)
+
+    sentiment_index = calculate_gpt_sentiment_index_for_multiple_windows(
+        sentiment_data_full, day_windows=day_windows, half_lives=half_lives
+    )
+
+    sentiment_index.to_pickle(produces)
+
+
+if UPDATE_SENTIMENT_INDICES_INCREMENTALLY:
+
+    def task_update_gpt_sentiment_index(
+        depends_on=BLD / "data" / "GPT_Output_Data" / "sentiment_data_clean_full.pkl",
+        start_date=PythonNode(value=SENTIMENT_INDEX_START_DATE, hash=True),
+        end_date=PythonNode(
+            value=get_sentiment_index_end_date(SENTIMENT_INDEX_END_DATE).strftime(
+                "%Y-%m-%d"
+            ),
+            hash=True,
+        ),
+        produces={
+            "index": BLD / "data" / "GPT_Output_Data" / "gpt_sentiment_index.pkl",
+            "state": BLD / "data" / "GPT_Output_Data" / "gpt_sentiment_index_state.pkl",
+        },
+    ):
+        # Re-use the state of the last run so that only new predictions are added
+        if produces["state"].exists():
+            with open(produces["state"], "rb") as state_file:
+                state = pickle.load(state_file)
+        else:
+            state = None
+
+        sentiment_data_full = pd.read_pickle(depends_on)
+
+        state = update_gpt_sentiment_index(
+            sentiment_data_full, state=state, start_date=start_date, end_date=end_date
+        )
+
+        with open(produces["state"], "wb") as state_file:
+            pickle.dump(state, state_file)
+        get_gpt_sentiment_index_from_state(state).to_pickle(produces["index"])
+
+
 for country_name in country_list:
 
     @task
@@ -1,7 +1,8 @@
 # from debt_crisis.gpt_sentiment_index.gpt_sentiment_index import (
 #     create_set_with_all_country_words,
 #     get_a_text_snippet_if_there_is_country_mentioned,
-#     extract_gpt_training_dataset_from_preprocessed_transcripts,
+#     extract_gpt_training_dataset,
+#     extract_gpt_training_dataset_from_country_mention_index,
 #     plot_country_occurrences,
 # )
 
@@ -11,7 +12,12 @@
 #     COUNTRIES_UNDER_STUDY,
 #     MAPPING_COUNTRY_NAMES_TO_COUNTRY,
 #     TOP_LEVEL_DIR,
+#     USE_COUNTRY_MENTION_INDEX,
+#     MERGE_OVERLAPPING_SNIPPETS,
+#     TRANSCRIPTS_CLEAN_STEP_1_PATH,
 # )
+# from debt_crisis.sentiment_index.clean_sentiment_data import create_country_alias_index
+# from debt_crisis.sentiment_index.transcript_storage import read_transcript_dataset
 
 # from debt_crisis.utilities import _check_for_missing_values_in_dataframe_column
 
@@ -36,31 +42,53 @@
 #     random_sample.to_excel(produces, index=False)
 
 
+# # task_create_gpt_sentiment_index_dataset_dependencies = {
+# #     "df_transcripts_step_1": TRANSCRIPTS_CLEAN_STEP_1_PATH,
+# #     "country_names_file": SRC / "data" / "country_names" / "country_names.xlsx",
+# # }
+# # if USE_COUNTRY_MENTION_INDEX:
+# #     task_create_gpt_sentiment_index_dataset_dependencies["country_mention_index"] = (
+# #         BLD / "data" / "country_mention_index.pkl"
+# #     )
+
+
 # # def task_create_gpt_sentiment_index_dataset(
-# #     depends_on=BLD / "data" / "df_transcripts_clean_step_1.pkl",
-# #     country_names_file_path=SRC / "data" / "country_names" / "country_names.xlsx",
-# #     mapping_country_names_to_country=MAPPING_COUNTRY_NAMES_TO_COUNTRY,
+# #     depends_on=task_create_gpt_sentiment_index_dataset_dependencies,
 # #     produces=BLD
 # #     / "data"
 # #     / "gpt_sentiment_data"
 # #     / "df_gpt_sentiment_training_dataset.pkl",
 # # ):
-# #     country_names_file = pd.read_excel(country_names_file_path)
-# #     country_names_set = create_set_with_all_country_words(country_names_file)
-# #     transcripts_data = pd.read_pickle(depends_on)
+# #     transcripts_data = read_transcript_dataset(
+# #         depends_on["df_transcripts_step_1"].parent,
+# #         columns=["Transcript_ID", "Preprocessed_Transcript_Step_1"],
+# #     )
 
-# #     gpt_file = pd.DataFrame()
-
-# #     for index, row in transcripts_data.iterrows():
-# #         transcript_snippets = (
-# #             extract_gpt_training_dataset_from_preprocessed_transcripts(
-# #                 row, country_names_set
-# #             )
+# #     country_names_file = pd.read_excel(depends_on["country_names_file"])
+# #     country_names_set = create_set_with_all_country_words(country_names_file)
+# #     snippet_options = {
+# #         "merge_overlapping_snippets": MERGE_OVERLAPPING_SNIPPETS,
+# #         "mapping_country_names_to_country": MAPPING_COUNTRY_NAMES_TO_COUNTRY,
+# #     }
+
+# #     if "country_mention_index" in depends_on:
+# #         # Only the transcripts that mention a country are searched, the snippets
+# #         # are the same as the ones of the full search
+# #         mention_index = pd.read_pickle(depends_on["country_mention_index"])
+# #         alias_index = create_country_alias_index(
+# #             country_names_file, MAPPING_COUNTRY_NAMES_TO_COUNTRY
+# #         )
+# #         gpt_file = extract_gpt_training_dataset_from_country_mention_index(
+# #             transcripts_data,
+# #             mention_index,
+# #             country_names_set,
+# #             alias_index,
+# #             **snippet_options,
+# #         )
+# #     else:
+# #         gpt_file = extract_gpt_training_dataset(
+# #             transcripts_data, country_names_set, **snippet_options
 # #         )
-
-# #         gpt_file = pd.concat([gpt_file, transcript_snippets])
-
-# #         print(index)
 
 # #     gpt_file.to_pickle(produces)
 
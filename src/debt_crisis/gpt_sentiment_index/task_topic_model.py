@@ -2,6 +2,7 @@ from debt_crisis.config import SRC, BLD
 from debt_crisis.gpt_sentiment_index.topic_model import (
     get_embeddings_for_text_snippets,
     prepare_rationalizes_for_creating_embeddings,
+    warm_up_finbert_model,
 )
 
 import pandas as pd
@@ -46,6 +47,10 @@ def task_get_embedings_from_lemmatized_rationales(
         reader = csv.reader(file)
         lemmatized_rationales = next(reader)
 
-    embeddings = get_embeddings_for_text_snippets(lemmatized_rationales)
+    tokenizer, model = warm_up_finbert_model()
+
+    embeddings = get_embeddings_for_text_snippets(
+        lemmatized_rationales, tokenizer=tokenizer, model=model
+    )
 
     np.save(produces, embeddings)
@@ -1,25 +1,20 @@
-import pandas as pd
+import functools
 import logging
+import re
+import time
+from typing import TYPE_CHECKING, List, Optional, Set
+
 import numpy as np
-from bertopic import BERTopic
 import pandas as pd
-import matplotlib.pyplot as plt
-import re
-from sklearn.feature_extraction.text import CountVectorizer
-from bertopic.representation import KeyBERTInspired
-from IPython.display import display
-import random
-from transformers import BertTokenizer, BertModel
-import torch
-from typing import List, Set
-from concurrent.futures import ThreadPoolExecutor
-from umap import UMAP
-from nltk.stem import PorterStemmer
-import spacy
 from tqdm import tqdm
 
-# Load the spaCy model
-nlp = spacy.load("en_core_web_sm")
+from debt_crisis.config import get_nlp_model
+
+if TYPE_CHECKING:
+    from transformers import BertModel, BertTokenizer
+
+FINBERT_MODEL_NAME = "yiyanghkust/finbert-pretrain"
+
 # Set up loggings
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -120,18 +115,65 @@ def lemmatize_text(text: str) -> str:
 
     """
     # Process the text using spaCy
-    doc = nlp(text)
+    doc = get_nlp_model()(text)
     # Extract the lemma for each token and filter out non-alphabetic tokens
     lemmatized_text = " ".join(token.lemma_ for token in doc if token.is_alpha)
     return lemmatized_text
 
 
+@functools.lru_cache(maxsize=None)
+def get_finbert_tokenizer_and_model(model_name: str = FINBERT_MODEL_NAME):
+    """Load the FinBERT tokenizer and model on first use.
+
+    transformers is only imported here, so importing this module does not load the
+    weights. Later calls with the same model name return the same objects.
+
+    Parameters:
+    model_name (str, optional): Name of the pre-trained model on the Hugging Face hub.
+
+    Returns:
+    tuple: (BertTokenizer, BertModel) with the model in evaluation mode.
+
+    """
+    from transformers import BertModel, BertTokenizer
+
+    start_time = time.perf_counter()
+
+    tokenizer = BertTokenizer.from_pretrained(model_name)
+    model = BertModel.from_pretrained(model_name)
+    model.eval()
+
+    logger.info(
+        "Loaded %s in %.1f seconds", model_name, time.perf_counter() - start_time
+    )
+
+    return tokenizer, model
+
+
+def warm_up_finbert_model(model_name: str = FINBERT_MODEL_NAME):
+    """Load the FinBERT tokenizer and model and run one forward pass.
+
+    Call this before embedding texts to keep the one-off load time out of the
+    embedding loop.
+
+    Parameters:
+    model_name (str, optional): Name of the pre-trained model on the Hugging Face hub.
+
+    Returns:
+    tuple: (BertTokenizer, BertModel) as returned by get_finbert_tokenizer_and_model.
+
+    """
+    tokenizer, model = get_finbert_tokenizer_and_model(model_name)
+
+    get_embeddings_for_text_snippets(["warm up"], tokenizer=tokenizer, model=model)
+
+    return tokenizer, model
+
+
 def get_embeddings_for_text_snippets(
     texts: List[str],
-    tokenizer: BertTokenizer = BertTokenizer.from_pretrained(
-        "yiyanghkust/finbert-pretrain"
-    ),
-    model: BertModel = BertModel.from_pretrained("yiyanghkust/finbert-pretrain"),
+    tokenizer: Optional["BertTokenizer"] = None,
+    model: Optional["BertModel"] = None,
     max_length: int = 128,
     batch_size: int = 32,
     use_gpu: bool = False,
@@ -141,7 +183,9 @@ def get_embeddings_for_text_snippets(
     Parameters:
     texts (List[str]): A list of text snippets to be encoded into embeddings.
     tokenizer (BertTokenizer, optional): The tokenizer to process the input texts.
+        Defaults to the cached FinBERT tokenizer.
     model (BertModel, optional): The BERT-based model to generate embeddings.
+        Defaults to the cached FinBERT model.
     max_length (int, optional): The maximum length for tokenization. Defaults to 128.
     batch_size (int, optional): The number of texts to process in a batch. Defaults to 32.
     use_gpu (bool, optional): Whether to use GPU acceleration. Defaults to False.
@@ -150,6 +194,13 @@ def get_embeddings_for_text_snippets(
     np.ndarray: A 2D numpy array where each row corresponds to the embedding of a text snippet.
 
     """
+    import torch
+
+    if tokenizer is None or model is None:
+        default_tokenizer, default_model = get_finbert_tokenizer_and_model()
+        tokenizer = tokenizer if tokenizer is not None else default_tokenizer
+        model = model if model is not None else default_model
+
     if use_gpu and torch.cuda.is_available():
         model = model.to("cuda")
 
@@ -4,7 +4,7 @@ import statsmodels.formula.api as smf
 import statsmodels.api as sm
 
 from debt_crisis.gpt_sentiment_index.gpt_index_analysis import (
-    calculate_gpt_sentiment_index,
+    calculate_gpt_sentiment_index_for_all_countries,
 )
 
 
@@ -222,6 +222,12 @@ def create_df_with_correlation_values_between_bond_yield_and_sentiment(
     result_df = pd.DataFrame()
 
     countries = sorted(countries)
+
+    # The GPT index of all countries is calculated in one pass
+    llm_sentiment_index = calculate_gpt_sentiment_index_for_all_countries(
+        llm_output_data_clean, countries=countries
+    )
+
     for country in countries:
         # Import Data
 
@@ -233,12 +239,10 @@ def create_df_with_correlation_values_between_bond_yield_and_sentiment(
         )
         quarterly_dates = bond_yield_spread_filter["Date"]
 
-        llm_data_country = llm_output_data_clean[
-            llm_output_data_clean["Country"] == country
-        ]
-
-        llm_sentiment_index_data = calculate_gpt_sentiment_index(
-            preprocessed_data=llm_data_country, country_under_study=country
+        llm_sentiment_index_data = (
+            llm_sentiment_index[llm_sentiment_index["Country"] == country]
+            .drop(columns="Country")
+            .rename(columns={"Sentiment_GPT": f"Sentiment_GPT_{country}"})
         )
         llm_quarter_data = llm_sentiment_index_data[
             llm_sentiment_index_data["Date"].isin(quarterly_dates)
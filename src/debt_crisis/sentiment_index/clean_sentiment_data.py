@@ -1,22 +1,77 @@
-import os
+import time
 import pandas as pd
 import regex as re
 import numpy as np
 from datetime import timedelta
-
-from debt_crisis.config import NLP_MODEL
+import contextlib
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+
+from debt_crisis.config import get_nlp_model
+from debt_crisis.sentiment_index.country_mention_index import (
+    get_transcript_ids_mentioning_countries,
+)
+from debt_crisis.sentiment_index.incremental_sentiment_index import (
+    prepare_sentiment_index_state,
+    update_sentiment_index_state,
+)
+from debt_crisis.sentiment_index.rolling_sentiment_index import (
+    calculate_multi_window_means,
+    calculate_rolling_window_means,
+    convert_window_means_to_long_format,
+)
+
+PRESENTATION_REGEX = re.compile(r"(?m)^.*Presentation\n-*\n|PRELIMINARY TRANSCRIPT:.*")
+SPEAKER_LINE_REGEX = re.compile(r"^.*\[\d+\].*$\n?")
+DASHES_AND_ENCLOSED_NUMBERS_REGEX = re.compile(
+    r"[=-]{3,}|\[(?:[=-]{3,})*\d(?:\d|[=-]{3,})*\]"
+)
+MORE_THAN_ONE_SPACE_REGEX = re.compile(r"\s{2,}")
+
+# Increase whenever the output of normalise_transcript_text changes, so that cached
+# preprocessed transcripts (see transcript_cache) are no longer used
+PREPROCESSING_VERSION = 1
+PREPROCESSING_FINGERPRINT = hashlib.sha256(
+    "\n".join(
+        [
+            str(PREPROCESSING_VERSION),
+            PRESENTATION_REGEX.pattern,
+            SPEAKER_LINE_REGEX.pattern,
+            DASHES_AND_ENCLOSED_NUMBERS_REGEX.pattern,
+            MORE_THAN_ONE_SPACE_REGEX.pattern,
+        ]
+    ).encode("utf-8")
+).hexdigest()
 
 
-def clean_transcript_data_df(raw_dataframe):
+def clean_transcript_data_df(
+    raw_dataframe,
+    n_workers=1,
+    chunk_size=500,
+    progress_interval_seconds=30,
+    cache=None,
+):
     """This function takes in a raw dataframe and returns a cleaned version.
 
+    With more than one worker, the transcripts are preprocessed in chunks across a
+    process pool and the progress is printed at most every progress_interval_seconds
+    instead of once per transcript. The output is the same in both modes.
+
+    With a cache, only transcripts whose text (or whose preprocessing rules) is not
+    in the cache yet are preprocessed, and their results are added to the cache.
+
     Args: raw_dataframe (pd.DataFrame): Raw dataframe with transcripts as created by the task combine_all_transcripts_into_initial_dataframe
+        n_workers (int): Number of processes. 1 preprocesses the transcripts in the main process.
+        chunk_size (int): Number of transcripts sent to a worker at once
+        progress_interval_seconds (float): Minimum time between two progress messages in parallel mode
+        cache (PreprocessedTranscriptCache): Cache of preprocessed transcripts or None
 
     Returns pd.DataFrame: Cleaned dataframe
     columns: Date (pd.DateTime): Date of the earnings call extracted from the file name
             Company (str): Name of the company as ticker symbol
             Transcript (str): Text of the transcript
             Cleaned_Transcript (str): Preprocessed text of the transcript
+            Transcript_ID (int): ID of the transcript in the raw dataframe, if it has one
 
     """
 
@@ -27,88 +82,144 @@ def clean_transcript_data_df(raw_dataframe):
 
     cleaned_data["Raw_Transcript"] = raw_dataframe["Transcript"]
 
-    def preprocess_and_print(transcript_text):
-        print(f"Processing row {preprocess_and_print.row_counter}")
-        preprocess_and_print.row_counter += 1
-        return preprocess_transcript_text(transcript_text)
+    transcripts = raw_dataframe["Transcript"]
+
+    if cache is not None:
+        cached_transcripts = [cache.get(transcript) for transcript in transcripts]
+        missing_positions = [
+            position
+            for position, cached_transcript in enumerate(cached_transcripts)
+            if cached_transcript is None
+        ]
+        transcripts = transcripts.iloc[missing_positions]
+
+    if n_workers > 1:
+        preprocessed_transcripts = pd.Series(
+            [
+                preprocessed_transcript
+                for preprocessed_chunk in process_transcripts_in_chunks(
+                    _normalise_transcript_chunk,
+                    transcripts.tolist(),
+                    n_workers,
+                    chunk_size,
+                    progress_interval_seconds,
+                )
+                for preprocessed_transcript in preprocessed_chunk
+            ],
+            index=transcripts.index,
+        )
+    else:
+
+        def preprocess_and_print(transcript_text):
+            print(f"Processing row {preprocess_and_print.row_counter}")
+            preprocess_and_print.row_counter += 1
+            return normalise_transcript_text(transcript_text)
 
-    # Initialize a counter attribute for the function
-    preprocess_and_print.row_counter = 0
+        # Initialize a counter attribute for the function
+        preprocess_and_print.row_counter = 0
 
-    cleaned_data["Preprocessed_Transcript_Step_1"] = raw_dataframe["Transcript"].apply(
-        preprocess_and_print
-    )
+        preprocessed_transcripts = transcripts.apply(preprocess_and_print)
+
+    if cache is not None:
+        for position, raw_transcript, preprocessed_transcript in zip(
+            missing_positions, transcripts, preprocessed_transcripts
+        ):
+            cache.put(raw_transcript, preprocessed_transcript)
+            cached_transcripts[position] = preprocessed_transcript
+
+        cache.evict()
+        cache.report()
+
+        preprocessed_transcripts = pd.Series(
+            cached_transcripts, index=raw_dataframe.index
+        )
+
+    cleaned_data["Preprocessed_Transcript_Step_1"] = preprocessed_transcripts
+
+    # Keep the IDs of the raw dataframe, which stay the same across incremental
+    # updates, so that the steps and the GPT data can be joined on them
+    if "Transcript_ID" in raw_dataframe.columns:
+        cleaned_data["Transcript_ID"] = raw_dataframe["Transcript_ID"]
 
     return cleaned_data
 
 
-def extract_date_from_transcript(transcript):
-    """This function extracts the date information from a given raw transcript.
-    Args: Raw Transcript as string.
+def process_transcripts_in_chunks(
+    chunk_function,
+    transcripts,
+    n_workers=1,
+    chunk_size=500,
+    progress_interval_seconds=30,
+):
+    """This generator applies a function to consecutive chunks of transcripts, across
+    a process pool if there is more than one worker.
 
-    Returns: Date string
-    """
-    # Regular expression pattern to match the date information
-    pattern = r"([A-Z][a-z]+ \d{1,2}, \d{4})"
+    The results of the chunks are yielded in the order of the transcripts, and the
+    progress is printed at most every progress_interval_seconds.
 
-    # Search for the pattern in the transcript
-    match = re.search(pattern, transcript, re.IGNORECASE)
+    Args: chunk_function (callable): Picklable function that takes a list of
+            transcripts (or of tuples with the data of every transcript)
+        transcripts (list): Transcripts or tuples with the data of every transcript
+        n_workers (int): Number of processes. 1 runs the chunks in the main process.
+        chunk_size (int): Number of transcripts sent to a worker at once
+        progress_interval_seconds (float): Minimum time between two progress messages
 
-    if match:
-        return match.group(1)  # Extracted date
-    else:
-        return None
+    Yields: The result of chunk_function for every chunk
 
+    """
+    chunks = [
+        transcripts[start : start + chunk_size]
+        for start in range(0, len(transcripts), chunk_size)
+    ]
 
-# Define function to extract date of conference call and company name from file name and text from txt files
-def extract_data_from_file(file_path):
-    """This function loads all transcript data and returns a dictionary with the date,
-    quarter, year, company name and transcript."""
-    # Extract date and company name from file name
-    date_list = os.path.basename(file_path).split("-")[:3]
-    date_str = "-".join(date_list)
-    company = os.path.basename(file_path).split("-")[3]
+    number_of_processed_transcripts = 0
+    last_report_time = time.perf_counter()
 
-    # Transform date string into datetime object and remove time
-    date = pd.to_datetime(date_str, format="%Y-%b-%d").date()
+    with contextlib.ExitStack() as stack:
+        if n_workers > 1:
+            executor = stack.enter_context(ProcessPoolExecutor(max_workers=n_workers))
+            chunk_results = executor.map(chunk_function, chunks)
+        else:
+            chunk_results = map(chunk_function, chunks)
 
-    # Extract text from txt files
-    with open(file_path, encoding="utf-8") as f:
-        transcript = f.read()
+        for chunk, chunk_result in zip(chunks, chunk_results):
+            yield chunk_result
+            number_of_processed_transcripts += len(chunk)
 
-    return {"Date": date, "Company": company, "Transcript": transcript}
+            if time.perf_counter() - last_report_time >= progress_interval_seconds:
+                print(
+                    f"Processed {number_of_processed_transcripts} of "
+                    f"{len(transcripts)} transcripts"
+                )
+                last_report_time = time.perf_counter()
 
+    print(f"Processed {number_of_processed_transcripts} transcripts")
 
-def combine_all_transcripts_into_dataframe(root_transcript_directory):
-    """This function goes over all transcripts saved in the data folder under src/debt_crisis/data/transcripts/raw/Eikon 2002 - 2022
-    and combines them into one dataframe.
 
-    Args: root_transcript_directory: Path to the root directory of the transcripts: src/debt_crisis/data/transcripts/raw/Eikon 2002 - 2022
+def _normalise_transcript_chunk(transcripts):
+    """Preprocess a list of transcripts in a worker process."""
+    return [normalise_transcript_text(transcript) for transcript in transcripts]
 
-    Returns: Dataframe with all transcripts
-        Columns: Date (pd.DateTime): Date of the earnings call extracted from the file name
-                Company (str): Name of the company as ticker symbol
-                    Transcript (str): Text of the transcript
-    """
-    # Initialize list to store data
-    data_list = []
 
-    # Loop over files in directory and subdirectories and apply function to extract data from files
-    for root, _dirs, files in os.walk(root_transcript_directory):
-        for file in files:
-            if file.endswith(".txt"):
-                file_path = os.path.join(root, file)
-                data_list.append(extract_data_from_file(file_path))
+def extract_date_from_transcript(transcript):
+    """This function extracts the date information from a given raw transcript.
+    Args: Raw Transcript as string.
 
-    # Create data frame from the list
-    data = pd.DataFrame(data_list).sort_values(by="Date").reset_index(drop=True)
+    Returns: Date string
+    """
+    # Regular expression pattern to match the date information
+    pattern = r"([A-Z][a-z]+ \d{1,2}, \d{4})"
 
-    data["Transcript_ID"] = data.index
+    # Search for the pattern in the transcript
+    match = re.search(pattern, transcript, re.IGNORECASE)
 
-    return data
+    if match:
+        return match.group(1)  # Extracted date
+    else:
+        return None
 
 
-def preprocess_transcript_text(raw_transcript_text, nlp_model=NLP_MODEL):
+def preprocess_transcript_text(raw_transcript_text, nlp_model=None):
     """THis function takes in a raw transcript and makes standard preprocessing."""
     # Pre-compile regular expressions
     presentation_regex = re.compile(r".*Presentation\n-*\n|PRELIMINARY TRANSCRIPT:.*")
@@ -157,22 +268,73 @@ def preprocess_transcript_text(raw_transcript_text, nlp_model=NLP_MODEL):
     return text
 
 
+def normalise_transcript_text(raw_transcript_text):
+    """This function gives exactly the same output as preprocess_transcript_text, but
+    uses patterns compiled once at module level and needs fewer regex passes.
+
+    - The presentation pattern is anchored at line starts. Without the anchor, the
+      leading ".*" is tried from every character of the text.
+    - The speaker pattern is anchored at the start of the text, so it is matched once.
+    - Dash/equals runs and enclosed numbers are removed in one pass. The pattern
+      also matches brackets that only become an enclosed number once their dash
+      runs are removed (e.g. "[---1]"), as in the sequential version.
+    - Stars, new lines and backslashes are handled with str.replace.
+
+    """
+    # Remove content before "Presentation" and after "PRELIMINARY TRANSCRIPT:"
+    text = PRESENTATION_REGEX.sub("", raw_transcript_text)
+
+    # Remove the speaker description if the text starts with one
+    speaker_match = SPEAKER_LINE_REGEX.match(text)
+    if speaker_match:
+        text = text[speaker_match.end() :]
+
+    # Remove dash/equals runs and enclosed numbers, then stars
+    text = DASHES_AND_ENCLOSED_NUMBERS_REGEX.sub("", text)
+    text = text.replace("*", "")
+
+    # Replace new lines and consecutive spaces, then remove backslashes
+    text = MORE_THAN_ONE_SPACE_REGEX.sub(" ", text.replace("\n", " "))
+    text = text.replace("\\", "")
+
+    return text.lower()
+
+
 def tokenize_text_and_remove_non_alphabetic_characters_and_stop_words(
-    column, nlp_model=NLP_MODEL
+    column, nlp_model=None, tokenizer_only=False, batch_size=None, n_process=1
 ):
     """This function takes in a column of text and tokenizes each text using the spaCy
     model, and removes stop words and non-alphabetic characters.
 
+    The stop word and punctuation flags are lexical attributes that are set by the
+    tokenizer. With tokenizer_only=True all other pipeline components (tagger,
+    parser, NER, lemmatizer, ...) are switched off, which gives the same tokens
+    much faster. The documents are streamed and filtered one at a time.
+
     Args:
         column (pd.Series): Series of raw transcript texts
-        nlp_model (spacy model): SpaCy model to use for tokenization
+        nlp_model (spacy model): SpaCy model to use for tokenization. None uses the
+            model of the project (see config.get_nlp_model).
+        tokenizer_only (bool): Whether to run only the tokenizer of the model
+        batch_size (int): Number of texts per batch. None uses the default of the model.
+        n_process (int): Number of processes used by spaCy
 
     Returns:
         pd.Series: Series of tokenized texts
 
     """
+    if nlp_model is None:
+        nlp_model = get_nlp_model()
+
+    disabled_components = nlp_model.pipe_names if tokenizer_only else []
+
     # Use SpaCy's pipe method for batch processing
-    processed_texts = list(nlp_model.pipe(column))
+    processed_texts = nlp_model.pipe(
+        column,
+        batch_size=batch_size,
+        n_process=n_process,
+        disable=disabled_components,
+    )
 
     # Process each document in the processed_texts
     tokenized_texts = []
@@ -263,6 +425,7 @@ def create_country_sentiment_index_for_one_transcript(
     country_names_file,
     word_count_dict,
     calculation_method="negative_and_positive",
+    alias_index=None,
 ):
     """This function takes in an earnings call transcript and a lookup dictionary and
     returns a sentiment index for the transcript. The sentiment index is calculated as
@@ -274,33 +437,458 @@ def create_country_sentiment_index_for_one_transcript(
         country (str): country to consider
         country_names_file (pd.Dataframe): file with the names of the countries
         word_count_dict (dict): dictionary where we store the number of occurence of the word
+        alias_index (dict): Alias index as created by create_country_alias_index. If
+            given, it is used instead of searching the country names file.
 
     Returns: int: Sentiment index for the transcript
 
     """
+    transcript_words = re.findall(r"\b\w+\b", transcript.lower())
+
+    if alias_index is None:
+        # First, I get all name versions of the country
+        alias_index = _get_country_names(country, country_names_file)
+
+    # Now, I get the indices where these words appear in the transcript
+    country_indices = get_country_appearance_index_from_transcript_text(
+        transcript_words, alias_index, country
+    )
+
+    return _calculate_sentiment_around_country_mentions(
+        transcript_words,
+        country_indices,
+        lookup_dict,
+        words_environment,
+        word_count_dict,
+        calculation_method,
+        len(transcript),
+    )
+
+
+def create_sentiment_index_for_all_countries_in_one_transcript(
+    transcript,
+    lookup_dict,
+    words_environment,
+    countries,
+    country_names_file,
+    word_count_dict,
+    calculation_method="negative_and_positive",
+    alias_index=None,
+    scoring_engine="prefix_sums",
+):
+    """This function calculates the sentiment index of every country for one
+    transcript. It gives the same scores as calling
+    create_country_sentiment_index_for_one_transcript for each country, but the
+    transcript is tokenised once and the mentions of all countries are found in one
+    scan over the words.
+
+    Args: transcript (str): Earnings call transcript
+        lookup_dict (dict): Dictionary with words as keys and sentiment values as values
+        words_environment (int): number of words before and after the country to consider
+        countries (list): countries to consider
+        country_names_file (pd.Dataframe): file with the names of the countries
+        word_count_dict (dict): dictionary where we store the number of occurence of the word
+        calculation_method (str): "negative_and_positive" or "only_negatives"
+        alias_index (dict): Alias index as created by create_country_alias_index. If
+            None, it is built from the country names file.
+        scoring_engine (str): "prefix_sums" scores the windows with
+            calculate_window_sentiment_with_prefix_sums, "loop" word by word. Both give
+            the same result.
+
+    Returns: dict: Sentiment index for the transcript for every country
+
+    """
+    return create_sentiment_index_for_all_countries_and_window_sizes_in_one_transcript(
+        transcript,
+        lookup_dict,
+        [words_environment],
+        countries,
+        country_names_file,
+        {words_environment: word_count_dict},
+        calculation_method,
+        alias_index,
+        scoring_engine,
+    )[words_environment]
+
+
+def create_sentiment_index_for_all_countries_and_window_sizes_in_one_transcript(
+    transcript,
+    lookup_dict,
+    window_sizes,
+    countries,
+    country_names_file,
+    word_count_dicts,
+    calculation_method="negative_and_positive",
+    alias_index=None,
+    scoring_engine="prefix_sums",
+):
+    """This function calculates the sentiment index of every country for several
+    window sizes. The transcript is tokenised, scanned for country mentions and
+    looked up in the sentiment dictionary once for all window sizes.
+
+    Args: transcript (str): Earnings call transcript
+        lookup_dict (dict): Dictionary with words as keys and sentiment values as values
+        window_sizes (list): Numbers of words before and after the country to consider
+        countries (list): countries to consider
+        country_names_file (pd.Dataframe): file with the names of the countries
+        word_count_dicts (dict): Window size as key and the dictionary where we store
+            the number of occurence of the words for this window size as value
+        calculation_method (str): "negative_and_positive" or "only_negatives"
+        alias_index (dict): Alias index as created by create_country_alias_index. If
+            None, it is built from the country names file.
+        scoring_engine (str): "prefix_sums" or "loop"
+
+    Returns: dict: Window size as key and the sentiment index for every country as value
+
+    """
+    if alias_index is None:
+        alias_index = create_country_alias_index(country_names_file)
+
+    transcript_words = re.findall(r"\b\w+\b", transcript.lower())
+    country_indices = find_country_indices(transcript_words, alias_index, countries)
+
+    if scoring_engine == "prefix_sums":
+        word_scores = create_word_sentiment_scores(
+            transcript_words, lookup_dict, calculation_method
+        )
+
+        # Scores that are not integers cannot be summed exactly with prefix sums
+        if word_scores["Values"].dtype.kind in "iub":
+            return {
+                window_size: calculate_window_sentiment_with_prefix_sums(
+                    word_scores,
+                    transcript_words,
+                    country_indices,
+                    window_size,
+                    word_count_dicts[window_size],
+                    len(transcript),
+                )
+                for window_size in window_sizes
+            }
+
+    return {
+        window_size: {
+            country: _calculate_sentiment_around_country_mentions(
+                transcript_words,
+                country_indices[country],
+                lookup_dict,
+                window_size,
+                word_count_dicts[window_size],
+                calculation_method,
+                len(transcript),
+            )
+            for country in countries
+        }
+        for window_size in window_sizes
+    }
+
+
+def create_word_sentiment_scores(transcript_words, lookup_dict, calculation_method):
+    """This function looks up the sentiment value of every distinct word of a
+    transcript once and returns the arrays used by
+    calculate_window_sentiment_with_prefix_sums.
+
+    Args: transcript_words (list): Words of the transcript
+        lookup_dict (dict): Dictionary with words as keys and sentiment values as values
+        calculation_method (str): "negative_and_positive" counts every word in the
+            dictionary, "only_negatives" only words with a negative value
+
+    Returns: dict: Values (np.ndarray): sentiment value of every counted word, 0 otherwise
+            Prefix_Sums (np.ndarray): cumulative sum of Values with a leading 0
+            Unique_Words (list): distinct words of the transcript
+            Counted_Positions (np.ndarray): positions of the counted words
+            Counted_Word_Ids (np.ndarray): index in Unique_Words of the counted words
+
+    """
+    unique_words = list(dict.fromkeys(transcript_words))
+    word_ids_by_word = {word: word_id for word_id, word in enumerate(unique_words)}
+    word_ids = np.fromiter(
+        map(word_ids_by_word.__getitem__, transcript_words),
+        dtype=np.int64,
+        count=len(transcript_words),
+    )
+
+    unique_values = np.array([lookup_dict.get(word, 0) for word in unique_words])
+    if unique_values.size == 0:
+        unique_values = np.zeros(0, dtype=np.int64)
+
+    if calculation_method == "negative_and_positive":
+        unique_is_counted = np.array(
+            [word in lookup_dict for word in unique_words], dtype=bool
+        )
+    elif calculation_method == "only_negatives":
+        unique_is_counted = unique_values < 0
+    else:
+        unique_is_counted = np.zeros(len(unique_words), dtype=bool)
+
+    values = np.where(unique_is_counted, unique_values, 0)[word_ids]
+    counted_positions = np.flatnonzero(unique_is_counted[word_ids])
+
+    return {
+        "Values": values,
+        "Prefix_Sums": np.concatenate(
+            [np.zeros(1, dtype=values.dtype), np.cumsum(values)]
+        ),
+        "Unique_Words": unique_words,
+        "Counted_Positions": counted_positions,
+        "Counted_Word_Ids": word_ids[counted_positions],
+    }
+
+
+def calculate_window_sentiment_with_prefix_sums(
+    word_scores,
+    transcript_words,
+    country_indices,
+    words_environment,
+    word_count_dict,
+    transcript_length,
+    count_words_by_country=False,
+):
+    """This function sums the sentiment values of the words around the mentions of
+    each country with prefix sums, so every window costs O(1) however large it is.
+
+    It gives the same scores and word counts as the word-by-word loop of
+    create_country_sentiment_index_for_one_transcript: a word in several overlapping
+    windows is counted once per window. The words are only counted at the positions
+    of the dictionary words, not over the whole transcript.
+
+    Args: word_scores (dict): Output of create_word_sentiment_scores for the transcript
+        transcript_words (list): Words of the transcript
+        country_indices (dict): Country as key and the indices of its mentions in
+            transcript_words as value
+        words_environment (int): number of words before and after the country to consider
+        word_count_dict (dict): dictionary where we store the number of occurence of the
+            word, or with count_words_by_country one such dictionary per country
+        transcript_length (int): Number of characters of the transcript
+        count_words_by_country (bool): Count the words of every country in
+            word_count_dict[country] instead of in one dictionary
+
+    Returns: dict: Sentiment index of every country in the transcript
+
+    """
+    number_of_words = len(transcript_words)
+    prefix_sums = word_scores["Prefix_Sums"]
+
+    sentiment_indices = {}
+    all_starts = []
+    all_ends = []
+
+    for country, indices in country_indices.items():
+        if len(indices) == 0:
+            sentiment_indices[country] = 0
+            continue
+
+        indices = np.asarray(indices, dtype=np.int64)
+
+        # Same window bounds as the slice transcript_words[start:end] of the loop
+        starts = np.maximum(0, indices - words_environment)
+        ends = np.minimum(
+            np.minimum(transcript_length, indices + words_environment),
+            number_of_words,
+        )
+        ends = np.maximum(ends, starts)
+
+        sentiment_indices[country] = (
+            (prefix_sums[ends] - prefix_sums[starts]).sum().item()
+        )
+
+        if count_words_by_country:
+            _count_words_in_windows(word_scores, starts, ends, word_count_dict[country])
+        else:
+            all_starts.append(starts)
+            all_ends.append(ends)
+
+    if all_starts:
+        _count_words_in_windows(
+            word_scores,
+            np.concatenate(all_starts),
+            np.concatenate(all_ends),
+            word_count_dict,
+        )
+
+    return sentiment_indices
+
+
+def _count_words_in_windows(word_scores, starts, ends, word_count_dict):
+    """Add the number of windows that cover each counted word to word_count_dict."""
+    counted_positions = word_scores["Counted_Positions"]
+
+    # A window [start, end) covers a position if it starts at or before it and does
+    # not end at or before it
+    coverage = np.searchsorted(
+        np.sort(starts), counted_positions, side="right"
+    ) - np.searchsorted(np.sort(ends), counted_positions, side="right")
+
+    # Add up the coverage of the counted words per distinct word
+    word_counts = np.bincount(
+        word_scores["Counted_Word_Ids"],
+        weights=coverage,
+        minlength=len(word_scores["Unique_Words"]),
+    )
+    covered_word_ids = np.flatnonzero(word_counts)
+    for word_id, count in zip(
+        covered_word_ids.tolist(),
+        word_counts[covered_word_ids].astype(np.int64).tolist(),
+    ):
+        word_count_dict[word_scores["Unique_Words"][word_id]] += count
+
+
+def create_sentiment_index_columns_for_window_sizes(
+    transcripts,
+    lookup_dict,
+    window_sizes,
+    countries,
+    country_names_file,
+    word_count_dicts,
+    calculation_method="negative_and_positive",
+    alias_index=None,
+    scoring_engine="prefix_sums",
+    mention_index=None,
+    transcript_ids=None,
+):
+    """This function scores a column of transcripts for all countries and several
+    window sizes in one pass over the transcripts, e.g. for a robustness check of
+    the words_in_environment setting.
+
+    With a country mention index only the transcripts that mention one of the
+    countries are scored, all other transcripts have a sentiment index of 0.
+
+    Args: transcripts (pd.Series): Preprocessed transcripts (Preprocessed_Transcript_Step_1)
+        lookup_dict (dict): Dictionary with words as keys and sentiment values as values
+        window_sizes (list): Numbers of words before and after the country to consider
+        countries (list): countries to consider
+        country_names_file (pd.Dataframe): file with the names of the countries
+        word_count_dicts (dict): Window size as key and the dictionary where we store
+            the number of occurence of the words for this window size as value
+        calculation_method (str): "negative_and_positive" or "only_negatives"
+        alias_index (dict): Alias index as created by create_country_alias_index. If
+            None, it is built once from the country names file.
+        scoring_engine (str): "prefix_sums" or "loop"
+        mention_index (pd.DataFrame): Country mention index as created by
+            create_country_mention_index or None to score every transcript
+        transcript_ids (iterable): Transcript_ID of every transcript, needed with a
+            mention index
+
+    Returns: dict: Window size as key and a pd.DataFrame with one column
+        Sentiment_Index_McDonald_{country} per country as value
+
+    """
+    if alias_index is None:
+        alias_index = create_country_alias_index(country_names_file)
+
+    if mention_index is None:
+        is_mentioned = np.ones(len(transcripts), dtype=bool)
+    else:
+        is_mentioned = np.isin(
+            np.asarray(transcript_ids),
+            get_transcript_ids_mentioning_countries(mention_index, countries),
+        )
+    no_mentions = {country: 0 for country in countries}
+
+    scores = {window_size: [] for window_size in window_sizes}
+    for row_number, transcript in enumerate(transcripts):
+        if row_number % 1000 == 0:
+            print(f"Processing row {row_number}")
+
+        if not is_mentioned[row_number]:
+            for window_size in window_sizes:
+                scores[window_size].append(no_mentions)
+            continue
+
+        transcript_scores = (
+            create_sentiment_index_for_all_countries_and_window_sizes_in_one_transcript(
+                transcript,
+                lookup_dict,
+                window_sizes,
+                countries,
+                country_names_file,
+                word_count_dicts,
+                calculation_method,
+                alias_index,
+                scoring_engine,
+            )
+        )
+        for window_size in window_sizes:
+            scores[window_size].append(transcript_scores[window_size])
+
+    return {
+        window_size: pd.DataFrame(
+            scores[window_size], index=transcripts.index, columns=countries
+        ).rename(columns=lambda country: f"Sentiment_Index_McDonald_{country}")
+        for window_size in window_sizes
+    }
+
+
+def create_country_alias_index(country_names_file, mapping=None):
+    """This function maps every name version of a country (name, adjective,
+    demonym, capital, ...) to the countries it refers to.
+
+    The index is built once and then shared by the scorers, so finding the country
+    of a word is a dictionary lookup instead of a search in the country names file.
+
+    Args: country_names_file (pd.Dataframe): file with the names of the countries,
+            one row per country with the country in the column "name"
+        mapping (dict): Additional aliases, e.g. MAPPING_COUNTRY_NAMES_TO_COUNTRY,
+            with the alias as key and the country as value
+
+    Returns: dict: Alias as key and a tuple of countries (lower case) as value
+
+    """
+    alias_index = {}
+    seen_countries = set()
+
+    for row in country_names_file.itertuples(index=False):
+        country_row = row._asdict()
+        country = str(country_row["name"]).lower()
+
+        # As in a search of the file, only the first row of a country is used
+        if country in seen_countries:
+            continue
+        seen_countries.add(country)
 
-    # First, I get all name versions of the country
+        for alias in country_row.values():
+            if isinstance(alias, str):
+                _add_alias(alias_index, alias, country)
+
+    for alias, country in (mapping or {}).items():
+        _add_alias(alias_index, alias.lower(), country.lower())
+
+    return alias_index
+
+
+def _add_alias(alias_index, alias, country):
+    """Add a country to the countries of an alias if it is not in there yet."""
+    countries = alias_index.get(alias, ())
+    if country not in countries:
+        alias_index[alias] = countries + (country,)
+
+
+def _get_country_names(country, country_names_file):
+    """Return the set of all name versions of a country in the country names file."""
     country_row = country_names_file[
         country_names_file["name"].str.lower() == country.lower()
     ]
     if not country_row.empty:
-        country_names = set(country_row.iloc[0].values.tolist())
-    else:
-        country_names = set()
+        return set(country_row.iloc[0].values.tolist())
 
-    transcript_words = re.findall(r"\b\w+\b", transcript.lower())
+    return set()
 
-    # Now, I get the indices where these words appear in the transcript
-    country_indices = get_country_appearance_index_from_transcript_text(
-        transcript_words, country_names
-    )
 
-    # Calculate sentiment index based on the words around the country occurrences
+def _calculate_sentiment_around_country_mentions(
+    transcript_words,
+    country_indices,
+    lookup_dict,
+    words_environment,
+    word_count_dict,
+    calculation_method,
+    transcript_length,
+):
+    """Sum the sentiment values of the words around the mentions of a country."""
     sentiment_index = 0
 
     for index in country_indices:
         start = max(0, index - words_environment)
-        end = min(len(transcript), index + words_environment)
+        end = min(transcript_length, index + words_environment)
         context_words = transcript_words[start:end]
 
         if calculation_method == "negative_and_positive":
@@ -318,18 +906,53 @@ def create_country_sentiment_index_for_one_transcript(
     return sentiment_index
 
 
-def get_country_appearance_index_from_transcript_text(transcript_words, country_names):
+def find_country_indices(transcript_words, alias_index, countries):
+    """Find the mentions of all countries in one scan over the transcript words.
+
+    Args:
+        transcript_words (list): Words of the transcript
+        alias_index (dict): Alias index as created by create_country_alias_index
+        countries (list): Countries to consider
+
+    Returns:
+        dict: Country as key and the indices of its mentions in transcript_words as
+            value
+
+    """
+    countries_by_key = {country.lower(): country for country in countries}
+
+    country_indices = {country: [] for country in countries}
+    for index, word in enumerate(transcript_words):
+        for country_key in alias_index.get(word, ()):
+            if country_key in countries_by_key:
+                country_indices[countries_by_key[country_key]].append(index)
+
+    return country_indices
+
+
+def get_country_appearance_index_from_transcript_text(
+    transcript_words, country_names, country=None
+):
     """Get a list of indices where any of the country names or their alternate names are
     found in the transcript.
 
     Args:
         transcript (str): Earnings call transcript
-        country_names (set): Set of country names and alternate names
+        country_names (set or dict): Set of country names and alternate names, or an
+            alias index as created by create_country_alias_index
+        country (str): Country to look for if country_names is an alias index
 
     Returns:
         list: List of indices where country names or alternate names are found
 
     """
+    if isinstance(country_names, dict):
+        country_key = country.lower()
+        return [
+            i
+            for i, word in enumerate(transcript_words)
+            if country_key in country_names.get(word, ())
+        ]
 
     # Initialize a list to store indices
     country_indices = []
@@ -343,15 +966,23 @@ def get_country_appearance_index_from_transcript_text(transcript_words, country_
 
 
 def calculate_loughlan_mcdonald_sentiment_index(
-    preprocessed_data, countries_under_study, day_window=90
+    preprocessed_data,
+    countries_under_study,
+    day_window=90,
+    rolling_engine="cumulative_sums",
 ):
     """This function calculates the sentiment index taking as input the preprocessed
     data generated by earlier functions in this script.
 
+    The "cumulative_sums" engine calculates all days and countries at once with
+    calculate_rolling_window_means and gives the same index as the "loop" engine,
+    which slices the data once per day and country.
+
     Args:
         preprocessed_data (pd.DataFrame): Dataframe with the preprocessed data (name is df_transcripts_clean_step_2.pkl)
         countries_under_study (list): List of countries to consider
         day_window (int): Number of days to consider for the sentiment index
+        rolling_engine (str): "cumulative_sums" or "loop"
 
     Returns:
         pd.DataFrame: Dataframe with the sentiment index
@@ -363,6 +994,22 @@ def calculate_loughlan_mcdonald_sentiment_index(
     # Create date range from January 2003 to January 2023
     date_range = pd.date_range(start="1/1/2003", end="1/1/2023")
 
+    if rolling_engine == "cumulative_sums":
+        columns = [
+            f"Sentiment_Index_McDonald_{country}" for country in countries_under_study
+        ]
+        window_means = calculate_rolling_window_means(
+            preprocessed_data["Date"],
+            preprocessed_data[columns],
+            date_range,
+            day_window,
+        )
+
+        result_df = pd.DataFrame(window_means, columns=columns)
+        result_df.insert(0, "Date", date_range)
+
+        return result_df
+
     # Initialize a DataFrame with 'Date' column
     result_df = pd.DataFrame(date_range, columns=["Date"])
 
@@ -394,3 +1041,99 @@ def calculate_loughlan_mcdonald_sentiment_index(
             result_df.loc[date, f"Sentiment_Index_McDonald_{country}"] = sentiment_index
 
     return result_df.reset_index()
+
+
+def calculate_loughlan_mcdonald_sentiment_index_for_multiple_windows(
+    preprocessed_data, countries_under_study, day_windows=(90,), half_lives=()
+):
+    """This function calculates the sentiment index for several trailing windows and
+    exponential decay half-lives in one pass over the sorted transcripts, e.g. to
+    compare them for model selection.
+
+    Args:
+        preprocessed_data (pd.DataFrame): Dataframe with the preprocessed data (name is df_transcripts_clean_step_2.pkl)
+        countries_under_study (list): List of countries to consider
+        day_windows (list): Numbers of days of the trailing windows
+        half_lives (list): Half-lives in days of the exponentially decayed indices
+
+    Returns:
+        pd.DataFrame: Dataframe with the sentiment indices in long format
+        columns: Date (pd.DateTime): Date of sentiment index
+                Country (str): Country of the sentiment index
+                Weighting (str): "trailing_mean" or "exponential_decay"
+                Window_Days (int): Length of the window or half-life in days
+                Sentiment_Index_McDonald (float): Sentiment index
+
+    """
+
+    # Create date range from January 2003 to January 2023
+    date_range = pd.date_range(start="1/1/2003", end="1/1/2023")
+
+    window_means = calculate_multi_window_means(
+        preprocessed_data["Date"],
+        preprocessed_data[
+            [f"Sentiment_Index_McDonald_{country}" for country in countries_under_study]
+        ],
+        date_range,
+        day_windows,
+        half_lives,
+    )
+
+    return convert_window_means_to_long_format(
+        window_means, date_range, countries_under_study, "Sentiment_Index_McDonald"
+    )
+
+
+def update_loughlan_mcdonald_sentiment_index(
+    preprocessed_data,
+    countries_under_study,
+    state=None,
+    day_window=None,
+    start_date=None,
+    end_date=None,
+):
+    """This function adds new transcripts to the state of the sentiment index and
+    calculates the index again only for the days whose window contains a new
+    transcript and for the days after the last end date. Transcripts that are
+    already in the state (by Transcript_ID) are skipped unless their date or scores
+    have changed, then their old scores are replaced.
+
+    Args:
+        preprocessed_data (pd.DataFrame): Dataframe with the new (or all) preprocessed
+            transcripts, with the columns Transcript_ID, Date and
+            Sentiment_Index_McDonald_country
+        countries_under_study (list): List of countries to consider
+        state (dict): State of the index of the last update, see
+            incremental_sentiment_index.py. None starts a new index.
+        day_window (int): Number of days to consider for the sentiment index. None
+            uses the window of the state or 90 days for a new index.
+        start_date (str): First date of the index. None uses the start date of the
+            state or 2003-01-01 for a new index.
+        end_date (str): Last date of the index. None continues the index up to today.
+
+    Returns:
+        dict: The updated state. get_sentiment_index_from_state gives the index in
+            the format of calculate_loughlan_mcdonald_sentiment_index.
+
+    Raises:
+        ValueError: If the countries, day_window or start_date differ from the state
+
+    """
+    columns = [
+        f"Sentiment_Index_McDonald_{country}" for country in countries_under_study
+    ]
+    state = prepare_sentiment_index_state(state, columns, day_window, start_date)
+
+    return update_sentiment_index_state(
+        state,
+        preprocessed_data["Date"],
+        preprocessed_data[state["Columns"]],
+        np.ones((len(preprocessed_data), len(state["Columns"]))),
+        preprocessed_data["Transcript_ID"],
+        end_date,
+    )
+
+
+def get_sentiment_index_from_state(state):
+    """Return the index of a state with one row per date and the Date as column."""
+    return state["Index"].reset_index()
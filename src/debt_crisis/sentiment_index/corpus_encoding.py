@@ -0,0 +1,318 @@
+"""Integer encoding of the preprocessed transcripts.
+
+Every transcript is tokenised once with the same word pattern as the dictionary
+scorers (lower case, ``\\b\\w+\\b``) and stored as vocabulary IDs. The IDs of all
+transcripts are concatenated into one int32 file that is read as a memory map, and
+an offsets table gives the start of each transcript:
+
+    tokens.bin          int32 vocabulary IDs of all transcripts
+    offsets.npy         int64, tokens of transcript i are tokens[offsets[i]:offsets[i + 1]]
+    transcript_ids.npy  Transcript_ID of every transcript
+    vocabulary.txt      one word per line, the line number is the vocabulary ID
+
+The sentiment dictionary and the country aliases are turned into tables indexed by
+vocabulary ID, so the scorers work on integer arrays only.
+
+"""
+import os
+
+import numpy as np
+import pandas as pd
+import regex as re
+
+WORD_REGEX = re.compile(r"\b\w+\b")
+
+TOKENS_FILE = "tokens.bin"
+OFFSETS_FILE = "offsets.npy"
+TRANSCRIPT_IDS_FILE = "transcript_ids.npy"
+VOCABULARY_FILE = "vocabulary.txt"
+
+
+def encode_transcript_corpus(transcripts, output_directory, transcript_ids=None):
+    """This function tokenises every transcript once and writes the corpus as
+    vocabulary IDs. The tokens are written transcript by transcript, so only one
+    transcript is held in memory besides the vocabulary.
+
+    Args:
+        transcripts (iterable): Preprocessed transcripts (Preprocessed_Transcript_Step_1)
+        output_directory (str or Path): Directory of the encoded corpus
+        transcript_ids (iterable): Transcript_ID of every transcript. None numbers
+            the transcripts from 0.
+
+    Returns:
+        str: Path to the offsets file, which is written last
+
+    """
+    os.makedirs(output_directory, exist_ok=True)
+
+    word_ids = {}
+    offsets = [0]
+
+    with open(os.path.join(output_directory, TOKENS_FILE), "wb") as tokens_file:
+        for transcript in transcripts:
+            words = WORD_REGEX.findall(transcript.lower())
+            tokens = np.fromiter(
+                (word_ids.setdefault(word, len(word_ids)) for word in words),
+                dtype=np.int32,
+                count=len(words),
+            )
+            tokens_file.write(tokens.tobytes())
+            offsets.append(offsets[-1] + len(tokens))
+
+    if transcript_ids is None:
+        transcript_ids = range(len(offsets) - 1)
+    np.save(
+        os.path.join(output_directory, TRANSCRIPT_IDS_FILE),
+        np.asarray(list(transcript_ids), dtype=np.int64),
+    )
+
+    with open(
+        os.path.join(output_directory, VOCABULARY_FILE), "w", encoding="utf-8"
+    ) as vocabulary_file:
+        vocabulary_file.writelines(f"{word}\n" for word in word_ids)
+
+    offsets_path = os.path.join(output_directory, OFFSETS_FILE)
+    np.save(offsets_path, np.asarray(offsets, dtype=np.int64))
+
+    return offsets_path
+
+
+def load_encoded_corpus(corpus_directory):
+    """This function opens a corpus written by encode_transcript_corpus.
+
+    Args:
+        corpus_directory (str or Path): Directory of the encoded corpus
+
+    Returns:
+        dict: Tokens (np.memmap): int32 vocabulary IDs of all transcripts
+            Offsets (np.ndarray): start of every transcript in Tokens, plus the end
+            Transcript_IDs (np.ndarray): Transcript_ID of every transcript
+            Vocabulary (list): word of every vocabulary ID
+            Word_Ids (dict): vocabulary ID of every word
+
+    """
+    tokens_path = os.path.join(corpus_directory, TOKENS_FILE)
+
+    if os.path.getsize(tokens_path) > 0:
+        tokens = np.memmap(tokens_path, dtype=np.int32, mode="r")
+    else:
+        tokens = np.zeros(0, dtype=np.int32)
+
+    with open(
+        os.path.join(corpus_directory, VOCABULARY_FILE), encoding="utf-8"
+    ) as vocabulary_file:
+        vocabulary = vocabulary_file.read().splitlines()
+
+    return {
+        "Tokens": tokens,
+        "Offsets": np.load(os.path.join(corpus_directory, OFFSETS_FILE)),
+        "Transcript_IDs": np.load(os.path.join(corpus_directory, TRANSCRIPT_IDS_FILE)),
+        "Vocabulary": vocabulary,
+        "Word_Ids": {word: word_id for word_id, word in enumerate(vocabulary)},
+    }
+
+
+def get_transcript_tokens(corpus, position):
+    """Return the vocabulary IDs of the transcript at a position of the corpus."""
+    return corpus["Tokens"][
+        corpus["Offsets"][position] : corpus["Offsets"][position + 1]
+    ]
+
+
+def create_sentiment_value_table(vocabulary, lookup_dict, calculation_method):
+    """This function turns the sentiment dictionary into tables indexed by
+    vocabulary ID.
+
+    Args:
+        vocabulary (list): Word of every vocabulary ID
+        lookup_dict (dict): Dictionary with words as keys and sentiment values as values
+        calculation_method (str): "negative_and_positive" counts every word in the
+            dictionary, "only_negatives" only words with a negative value
+
+    Returns:
+        dict: Values (np.ndarray): sentiment value of every counted word, 0 otherwise
+            Is_Counted (np.ndarray): whether a word is counted
+
+    """
+    values = np.array([lookup_dict.get(word, 0) for word in vocabulary])
+    if values.size == 0:
+        values = np.zeros(0, dtype=np.int64)
+
+    if calculation_method == "negative_and_positive":
+        is_counted = np.array([word in lookup_dict for word in vocabulary], dtype=bool)
+    elif calculation_method == "only_negatives":
+        is_counted = values < 0
+    else:
+        is_counted = np.zeros(len(vocabulary), dtype=bool)
+
+    return {"Values": np.where(is_counted, values, 0), "Is_Counted": is_counted}
+
+
+def create_country_id_table(vocabulary, alias_index, countries):
+    """This function turns the country aliases into a table indexed by vocabulary ID.
+
+    Args:
+        vocabulary (list): Word of every vocabulary ID
+        alias_index (dict): Alias index as created by create_country_alias_index
+        countries (list): Countries to consider
+
+    Returns:
+        np.ndarray: Boolean array with one row per vocabulary ID and one column per
+            country, True if the word is an alias of the country
+
+    """
+    country_columns = {
+        country.lower(): column for column, country in enumerate(countries)
+    }
+    country_table = np.zeros((len(vocabulary), len(countries)), dtype=bool)
+
+    for word_id, word in enumerate(vocabulary):
+        for country_key in alias_index.get(word, ()):
+            if country_key in country_columns:
+                country_table[word_id, country_columns[country_key]] = True
+
+    return country_table
+
+
+def create_sentiment_index_columns_from_encoded_corpus(
+    corpus,
+    lookup_dict,
+    window_sizes,
+    countries,
+    alias_index,
+    word_count_dicts,
+    calculation_method="negative_and_positive",
+):
+    """This function calculates the same scores and word counts as
+    create_sentiment_index_columns_for_window_sizes, but on the encoded corpus.
+    Mentions, window sums and word counts are computed with NumPy on the vocabulary
+    IDs, and the word counts are collected in one array per window size over the
+    whole corpus.
+
+    Args:
+        corpus (dict): Encoded corpus as returned by load_encoded_corpus
+        lookup_dict (dict): Dictionary with words as keys and integer sentiment values
+        window_sizes (list): Numbers of words before and after the country to consider
+        countries (list): Countries to consider
+        alias_index (dict): Alias index as created by create_country_alias_index
+        word_count_dicts (dict): Window size as key and the dictionary where we store
+            the number of occurence of the words for this window size as value
+        calculation_method (str): "negative_and_positive" or "only_negatives"
+
+    Returns:
+        dict: Window size as key and a pd.DataFrame with one column
+            Sentiment_Index_McDonald_{country} per country as value, indexed by the
+            Transcript_ID of the transcript
+
+    """
+    vocabulary = corpus["Vocabulary"]
+    sentiment_table = create_sentiment_value_table(
+        vocabulary, lookup_dict, calculation_method
+    )
+    country_table = create_country_id_table(vocabulary, alias_index, countries)
+
+    if sentiment_table["Values"].dtype.kind not in "iub":
+        raise ValueError(
+            "The encoded corpus can only be scored with integer sentiment values."
+        )
+
+    number_of_transcripts = len(corpus["Offsets"]) - 1
+    scores = {
+        window_size: np.zeros(
+            (number_of_transcripts, len(countries)),
+            dtype=sentiment_table["Values"].dtype,
+        )
+        for window_size in window_sizes
+    }
+    word_counts = {
+        window_size: np.zeros(len(vocabulary), dtype=np.int64)
+        for window_size in window_sizes
+    }
+
+    for position in range(number_of_transcripts):
+        if position % 1000 == 0:
+            print(f"Processing row {position}")
+
+        tokens = np.asarray(get_transcript_tokens(corpus, position))
+        number_of_words = len(tokens)
+
+        values = sentiment_table["Values"][tokens]
+        prefix_sums = np.concatenate(
+            [np.zeros(1, dtype=values.dtype), np.cumsum(values)]
+        )
+        counted_positions = np.flatnonzero(sentiment_table["Is_Counted"][tokens])
+        mention_positions, mention_countries = np.nonzero(country_table[tokens])
+
+        for window_size in window_sizes:
+            # Same window bounds as the slice transcript_words[start:end] of the loop
+            starts = np.maximum(0, mention_positions - window_size)
+            ends = np.maximum(
+                np.minimum(mention_positions + window_size, number_of_words), starts
+            )
+
+            np.add.at(
+                scores[window_size][position],
+                mention_countries,
+                prefix_sums[ends] - prefix_sums[starts],
+            )
+
+            # Count how many windows cover each word with a difference array
+            coverage = np.cumsum(
+                np.bincount(starts, minlength=number_of_words + 1)
+                - np.bincount(ends, minlength=number_of_words + 1)
+            )
+            covered_positions = counted_positions[coverage[counted_positions] > 0]
+            np.add.at(
+                word_counts[window_size],
+                tokens[covered_positions],
+                coverage[covered_positions],
+            )
+
+    for window_size in window_sizes:
+        for word_id in np.flatnonzero(word_counts[window_size]).tolist():
+            word_count_dicts[window_size][vocabulary[word_id]] += int(
+                word_counts[window_size][word_id]
+            )
+
+    transcript_ids = pd.Index(corpus["Transcript_IDs"], name="Transcript_ID")
+
+    return {
+        window_size: pd.DataFrame(
+            scores[window_size],
+            index=transcript_ids,
+            columns=[f"Sentiment_Index_McDonald_{country}" for country in countries],
+        )
+        for window_size in window_sizes
+    }
+
+
+def align_encoded_corpus_scores(sentiment_index_columns, transcript_ids):
+    """This function takes the scores of the encoded corpus for the given
+    transcripts, so they can be concatenated to the dataframe the transcript IDs come
+    from.
+
+    Args:
+        sentiment_index_columns (dict): Window size as key and the scores as returned
+            by create_sentiment_index_columns_from_encoded_corpus as value
+        transcript_ids (pd.Series): Transcript_ID column of the transcript dataframe
+
+    Returns:
+        dict: Window size as key and the scores of the transcripts as value, with the
+            index of transcript_ids
+
+    """
+    for columns in sentiment_index_columns.values():
+        is_missing = ~transcript_ids.isin(columns.index)
+        if is_missing.any():
+            raise ValueError(
+                f"{is_missing.sum()} transcripts are not in the encoded corpus, e.g. "
+                f"Transcript_ID {transcript_ids[is_missing].iloc[0]}. Encode the "
+                "corpus again."
+            )
+
+    return {
+        window_size: columns.loc[transcript_ids.to_numpy()].set_axis(
+            transcript_ids.index
+        )
+        for window_size, columns in sentiment_index_columns.items()
+    }
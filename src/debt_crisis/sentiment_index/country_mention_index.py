@@ -0,0 +1,183 @@
+"""Inverted index of the country mentions in the preprocessed transcripts.
+
+The index has one row per mention of a country alias:
+
+    Country        country of the alias (lower case, as in the alias index)
+    Alias          the word that was found
+    Transcript_ID  transcript of the mention
+    Token_Offset   position of the word in re.findall(r"\\b\\w+\\b", transcript)
+    Char_Offset    position of the first character of the word in the transcript
+
+It is built once and updated incrementally, so that country level scoring and the
+snippet extraction only visit the transcripts that mention a country. The manifest
+of the index keeps a fingerprint of the alias index in its attrs, and the index is
+rebuilt from scratch when the aliases change.
+
+"""
+import hashlib
+import json
+
+import numpy as np
+import pandas as pd
+
+from debt_crisis.sentiment_index.corpus_encoding import WORD_REGEX
+
+MENTION_INDEX_COLUMNS = [
+    "Country",
+    "Alias",
+    "Transcript_ID",
+    "Token_Offset",
+    "Char_Offset",
+]
+
+
+def create_alias_index_fingerprint(alias_index):
+    """Return a hash of an alias index (or of an alias to country mapping)."""
+    return hashlib.sha256(
+        json.dumps(alias_index, sort_keys=True).encode("utf-8")
+    ).hexdigest()
+
+
+def find_country_mentions(transcript, alias_index):
+    """This function finds the mentions of all countries in a transcript.
+
+    Args:
+        transcript (str): Preprocessed transcript (lower case)
+        alias_index (dict): Alias index as created by create_country_alias_index
+
+    Returns:
+        list: (Country, Alias, Token_Offset, Char_Offset) of every mention
+
+    """
+    mentions = []
+
+    for token_offset, match in enumerate(WORD_REGEX.finditer(transcript.lower())):
+        for country in alias_index.get(match.group(), ()):
+            mentions.append((country, match.group(), token_offset, match.start()))
+
+    return mentions
+
+
+def create_country_mention_index(transcripts, transcript_ids, alias_index):
+    """This function creates the inverted index of the country mentions.
+
+    Args:
+        transcripts (iterable): Preprocessed transcripts (Preprocessed_Transcript_Step_1)
+        transcript_ids (iterable): Transcript_ID of every transcript
+        alias_index (dict): Alias index as created by create_country_alias_index
+
+    Returns:
+        pd.DataFrame: Columns Country, Alias, Transcript_ID, Token_Offset and
+            Char_Offset, sorted by Country, Transcript_ID and Token_Offset
+
+    """
+    records = [
+        (country, alias, transcript_id, token_offset, char_offset)
+        for transcript, transcript_id in zip(transcripts, transcript_ids)
+        for country, alias, token_offset, char_offset in find_country_mentions(
+            transcript, alias_index
+        )
+    ]
+
+    mention_index = pd.DataFrame.from_records(records, columns=MENTION_INDEX_COLUMNS)
+    mention_index = mention_index.astype(
+        {
+            "Country": str,
+            "Alias": str,
+            "Transcript_ID": "int64",
+            "Token_Offset": "int64",
+            "Char_Offset": "int64",
+        }
+    )
+
+    return mention_index.sort_values(
+        by=["Country", "Transcript_ID", "Token_Offset"], kind="stable"
+    ).reset_index(drop=True)
+
+
+def update_country_mention_index(
+    transcripts_data, alias_index, mention_index=None, manifest=None
+):
+    """This function brings the country mention index up to date with the transcript
+    dataframe and only scans transcripts that are new or have changed.
+
+    The manifest stores the Transcript_ID and a hash of the preprocessed text of every
+    indexed transcript, also of the transcripts without any mention, and the
+    fingerprint of the alias index in manifest.attrs["Alias_Fingerprint"].
+    Transcripts that are no longer in the dataframe are dropped from the index. If the
+    alias index has changed since the last run, all transcripts are scanned again.
+
+    Args:
+        transcripts_data (pd.DataFrame): Dataframe with the columns Transcript_ID and
+            Preprocessed_Transcript_Step_1
+        alias_index (dict): Alias index as created by create_country_alias_index
+        mention_index (pd.DataFrame): Index from an earlier run or None
+        manifest (pd.DataFrame): Manifest from an earlier run or None
+
+    Returns:
+        tuple: (pd.DataFrame, pd.DataFrame) The updated mention index and manifest
+
+    """
+    current_manifest = pd.DataFrame(
+        {
+            "Transcript_ID": transcripts_data["Transcript_ID"].astype("int64").values,
+            "Content_Hash": [
+                hashlib.sha256(transcript.encode("utf-8")).hexdigest()
+                for transcript in transcripts_data["Preprocessed_Transcript_Step_1"]
+            ],
+        }
+    )
+    alias_fingerprint = create_alias_index_fingerprint(alias_index)
+    current_manifest.attrs["Alias_Fingerprint"] = alias_fingerprint
+
+    if (
+        manifest is not None
+        and manifest.attrs.get("Alias_Fingerprint") != alias_fingerprint
+    ):
+        print("The country aliases have changed, rebuilding the country mention index")
+        mention_index, manifest = None, None
+
+    if mention_index is None or manifest is None:
+        mention_index = create_country_mention_index([], [], alias_index)
+        manifest = current_manifest.iloc[0:0]
+
+    known_hashes = dict(zip(manifest["Transcript_ID"], manifest["Content_Hash"]))
+    is_up_to_date = np.array(
+        [
+            known_hashes.get(transcript_id) == content_hash
+            for transcript_id, content_hash in zip(
+                current_manifest["Transcript_ID"], current_manifest["Content_Hash"]
+            )
+        ],
+        dtype=bool,
+    )
+
+    kept_mentions = mention_index[
+        mention_index["Transcript_ID"].isin(
+            current_manifest.loc[is_up_to_date, "Transcript_ID"]
+        )
+    ]
+    transcripts_to_index = transcripts_data[~is_up_to_date]
+    new_mentions = create_country_mention_index(
+        transcripts_to_index["Preprocessed_Transcript_Step_1"],
+        transcripts_to_index["Transcript_ID"],
+        alias_index,
+    )
+
+    print(f"Indexed {len(transcripts_to_index)} of {len(transcripts_data)} transcripts")
+
+    updated_mention_index = (
+        pd.concat([kept_mentions, new_mentions])
+        .sort_values(by=["Country", "Transcript_ID", "Token_Offset"], kind="stable")
+        .reset_index(drop=True)
+    )
+
+    return updated_mention_index, current_manifest
+
+
+def get_transcript_ids_mentioning_countries(mention_index, countries):
+    """Return the sorted Transcript_IDs that mention at least one of the countries."""
+    country_keys = [country.lower() for country in countries]
+    return np.unique(
+        mention_index.loc[mention_index["Country"].isin(country_keys), "Transcript_ID"]
+    )
@@ -0,0 +1,281 @@
+"""Incremental updates of the daily trailing-window sentiment indices.
+
+The state of an index keeps the sums and numbers of observations of every day, the
+date, scores and counts of every observation that was added and the index itself.
+When new transcripts (or GPT snippets) arrive, their scores are added to the daily
+sums and only the index days whose window contains one of the new dates are
+calculated again, plus the days between the last and the new end date. An
+observation whose date, scores or counts have changed since it was added replaces
+its old contribution.
+
+The state is a plain dictionary, so it can be stored with pickle between runs:
+
+    Columns             names of the index columns
+    Day_Window          number of days before the index date in the window
+    Start_Date          first date of the index
+    End_Date            last date of the index
+    Observation_Dates   pd.Series, date of every added observation by its ID
+    Observation_Values  pd.DataFrame, scores of every added observation and column
+    Observation_Counts  pd.DataFrame, counts of every added observation and column
+    Daily_Sums          pd.DataFrame, sum of the scores per day and column
+    Daily_Counts        pd.DataFrame, number of observations per day and column
+    Index               pd.DataFrame, index per date (index of the dataframe) and column
+    Recomputed_Days     number of index days calculated in the last update
+    Revised_Observations  number of observations replaced in the last update
+
+"""
+import numpy as np
+import pandas as pd
+
+DEFAULT_DAY_WINDOW = 90
+DEFAULT_START_DATE = "2003-01-01"
+
+
+def create_sentiment_index_state(
+    columns, day_window=DEFAULT_DAY_WINDOW, start_date=DEFAULT_START_DATE
+):
+    """Return the state of an index without observations."""
+    empty_daily_data = pd.DataFrame(
+        columns=columns, index=pd.DatetimeIndex([], name="Date"), dtype=np.float64
+    )
+    empty_observation_data = pd.DataFrame(
+        columns=columns, index=pd.Index([], name="Observation_ID"), dtype=np.float64
+    )
+
+    return {
+        "Columns": list(columns),
+        "Day_Window": day_window,
+        "Start_Date": pd.Timestamp(start_date),
+        "End_Date": None,
+        "Observation_Dates": pd.Series(
+            index=empty_observation_data.index, dtype="datetime64[ns]"
+        ),
+        "Observation_Values": empty_observation_data,
+        "Observation_Counts": empty_observation_data.copy(),
+        "Daily_Sums": empty_daily_data,
+        "Daily_Counts": empty_daily_data.copy(),
+        "Index": empty_daily_data.copy(),
+        "Recomputed_Days": 0,
+        "Revised_Observations": 0,
+    }
+
+
+def prepare_sentiment_index_state(state, columns, day_window=None, start_date=None):
+    """This function returns a new state if state is None and otherwise checks that
+    the settings of an update match the state of the last update.
+
+    Args:
+        state (dict): State of the last update or None
+        columns (list): Index columns. None uses the columns of the state.
+        day_window (int): Number of days in the window. None uses the window of the
+            state or 90 for a new index.
+        start_date (str): First date of the index. None uses the start date of the
+            state or 2003-01-01 for a new index.
+
+    Returns:
+        dict: The state
+
+    Raises:
+        ValueError: If a setting differs from the state. The index has to be
+            calculated again from scratch to change it.
+
+    """
+    if state is None:
+        return create_sentiment_index_state(
+            columns,
+            DEFAULT_DAY_WINDOW if day_window is None else day_window,
+            DEFAULT_START_DATE if start_date is None else start_date,
+        )
+
+    settings = {
+        "Columns": None if columns is None else list(columns),
+        "Day_Window": day_window,
+        "Start_Date": None if start_date is None else pd.Timestamp(start_date),
+    }
+    for key, value in settings.items():
+        if value is not None and value != state[key]:
+            raise ValueError(
+                f"{key} is {value!r}, but the index state was created with "
+                f"{state[key]!r}. Delete the state to calculate the index again."
+            )
+
+    return state
+
+
+def get_sentiment_index_end_date(end_date=None):
+    """Return the end date of an index, today if end_date is None."""
+    if end_date is None:
+        return pd.Timestamp.today().normalize()
+
+    return pd.Timestamp(end_date)
+
+
+def update_sentiment_index_state(
+    state, dates, values, counts, observation_ids, end_date=None
+):
+    """This function adds new observations to the state of an index and calculates
+    the index again for the affected dates only.
+
+    A new observation on day d changes the index of the days d to d + Day_Window.
+    Observations whose ID is already in the state with the same date, scores and
+    counts are skipped, so the same data can be passed again without counting it
+    twice. If the date, the scores or the counts of a known ID have changed, its old
+    contribution is removed and the new one is added.
+
+    Args:
+        state (dict): State as created by create_sentiment_index_state
+        dates (pd.Series): Date of every observation
+        values (pd.DataFrame): Score of every observation, one column per index
+            column. Missing values count as 0 in the sum.
+        counts (pd.DataFrame): Number of observations (0 or 1) of every observation
+            and column
+        observation_ids (pd.Series): Unique and stable ID of every observation, e.g.
+            the Transcript_ID
+        end_date (str or pd.Timestamp): Last date of the index. None continues the
+            index up to today.
+
+    Returns:
+        dict: The updated state
+
+    """
+    end_date = get_sentiment_index_end_date(end_date)
+    day_window = pd.Timedelta(days=state["Day_Window"])
+
+    observation_ids = pd.Index(observation_ids, name="Observation_ID")
+    if observation_ids.has_duplicates:
+        raise ValueError(
+            "The observation IDs are not unique, e.g. "
+            f"{observation_ids[observation_ids.duplicated()][0]!r}"
+        )
+
+    new_dates = pd.Series(
+        pd.to_datetime(pd.Series(dates)).dt.normalize().to_numpy(),
+        index=observation_ids,
+    )
+    new_values = pd.DataFrame(
+        np.asarray(values, dtype=np.float64),
+        index=observation_ids,
+        columns=state["Columns"],
+    ).fillna(0)
+    new_counts = pd.DataFrame(
+        np.asarray(counts, dtype=np.float64),
+        index=observation_ids,
+        columns=state["Columns"],
+    )
+
+    # Known observations whose date, scores or counts have changed
+    known_ids = observation_ids[observation_ids.isin(state["Observation_Dates"].index)]
+    is_revised = (
+        (state["Observation_Dates"].loc[known_ids] != new_dates.loc[known_ids])
+        | (state["Observation_Values"].loc[known_ids] != new_values.loc[known_ids]).any(
+            axis=1
+        )
+        | (state["Observation_Counts"].loc[known_ids] != new_counts.loc[known_ids]).any(
+            axis=1
+        )
+    )
+    revised_ids = known_ids[is_revised.to_numpy()]
+    is_added = ~observation_ids.isin(known_ids) | observation_ids.isin(revised_ids)
+
+    # The old contribution of the revised observations is subtracted
+    changed_dates = pd.concat(
+        [state["Observation_Dates"].loc[revised_ids], new_dates[is_added]]
+    ).to_numpy()
+    daily_sums = (
+        pd.concat([-state["Observation_Values"].loc[revised_ids], new_values[is_added]])
+        .groupby(changed_dates)
+        .sum()
+    )
+    daily_counts = (
+        pd.concat([-state["Observation_Counts"].loc[revised_ids], new_counts[is_added]])
+        .groupby(changed_dates)
+        .sum()
+    )
+    state["Daily_Sums"] = _add_daily_data(state["Daily_Sums"], daily_sums)
+    state["Daily_Counts"] = _add_daily_data(state["Daily_Counts"], daily_counts)
+
+    for key, new_data in [
+        ("Observation_Dates", new_dates),
+        ("Observation_Values", new_values),
+        ("Observation_Counts", new_counts),
+    ]:
+        state[key] = pd.concat([state[key].drop(index=revised_ids), new_data[is_added]])
+
+    # Dates whose window contains a new or revised observation
+    affected_dates = [
+        pd.date_range(date, date + day_window) for date in daily_sums.index
+    ]
+    # Dates that are new in the index
+    if state["End_Date"] is None:
+        affected_dates.append(pd.date_range(state["Start_Date"], end_date))
+    elif end_date > state["End_Date"]:
+        affected_dates.append(
+            pd.date_range(state["End_Date"] + pd.Timedelta(days=1), end_date)
+        )
+
+    all_dates = pd.date_range(state["Start_Date"], end_date, name="Date")
+    affected_dates = all_dates.intersection(
+        pd.DatetimeIndex(np.concatenate([dates.to_numpy() for dates in affected_dates]))
+        if affected_dates
+        else pd.DatetimeIndex([])
+    )
+
+    index = state["Index"].reindex(all_dates)
+    index.loc[affected_dates] = _calculate_daily_window_means(
+        state["Daily_Sums"], state["Daily_Counts"], affected_dates, day_window
+    )
+    state["Index"] = index
+    state["End_Date"] = end_date
+    state["Recomputed_Days"] = len(affected_dates)
+    state["Revised_Observations"] = len(revised_ids)
+
+    print(
+        f"Added {is_added.sum() - len(revised_ids)} and revised {len(revised_ids)} "
+        f"observations, calculated {len(affected_dates)} of {len(all_dates)} days of "
+        "the index"
+    )
+
+    return state
+
+
+def _add_daily_data(daily_data, new_daily_data):
+    """Add the sums of new days to the daily data, keeping the days sorted."""
+    combined_data = daily_data.add(new_daily_data, fill_value=0).sort_index()
+    combined_data.index.name = "Date"
+
+    return combined_data
+
+
+def _calculate_daily_window_means(
+    daily_sums, daily_counts, evaluation_dates, day_window
+):
+    """Return the mean of the observations in [date - day_window, date] for every
+    evaluation date from the daily sums and counts, NaN for empty windows."""
+    if len(evaluation_dates) == 0:
+        return np.empty((0, daily_sums.shape[1]))
+
+    # Only the days in the windows of the evaluation dates are needed
+    daily_sums = daily_sums.loc[
+        evaluation_dates.min() - day_window : evaluation_dates.max()
+    ]
+    daily_counts = daily_counts.loc[daily_sums.index]
+    days = daily_sums.index.to_numpy()
+
+    cumulative_sums = np.zeros((len(days) + 1, daily_sums.shape[1]))
+    cumulative_counts = np.zeros((len(days) + 1, daily_sums.shape[1]))
+    np.cumsum(daily_sums.to_numpy(), axis=0, out=cumulative_sums[1:])
+    np.cumsum(daily_counts.to_numpy(), axis=0, out=cumulative_counts[1:])
+
+    window_starts = np.searchsorted(
+        days, (evaluation_dates - day_window).to_numpy(), side="left"
+    )
+    window_ends = np.searchsorted(days, evaluation_dates.to_numpy(), side="right")
+
+    window_counts = cumulative_counts[window_ends] - cumulative_counts[window_starts]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        window_means = (
+            cumulative_sums[window_ends] - cumulative_sums[window_starts]
+        ) / window_counts
+    window_means[window_counts == 0] = np.nan
+
+    return window_means
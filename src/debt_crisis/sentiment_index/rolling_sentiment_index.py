@@ -0,0 +1,309 @@
+"""Rolling window means of transcript level sentiment scores.
+
+The sentiment indices are the mean score of all transcripts in the window
+[date - day_window, date] for every day. Instead of slicing the transcripts once per
+day and country, the transcript dates are sorted once, the window bounds of all days
+are found with np.searchsorted and the window sums are differences of cumulative
+sums, which gives all days and countries in O(number of transcripts + number of
+days).
+
+Besides the trailing means, exponentially decayed means can be calculated in the
+same pass: a transcript that is d days old has the weight 0.5 ** (d / half_life).
+
+"""
+import numpy as np
+import pandas as pd
+
+TRAILING_MEAN = "trailing_mean"
+EXPONENTIAL_DECAY = "exponential_decay"
+
+# Longest stretch of evaluation dates, in half-lives, that is decayed in one block
+MAX_DECAY_HALF_LIVES = 200
+
+
+def calculate_multi_window_means(
+    dates, values, evaluation_dates, day_windows=(), half_lives=()
+):
+    """This function calculates the trailing means of several window lengths and the
+    exponentially decayed means of several half-lives for every evaluation date. The
+    observations are sorted and summed up once for all windows.
+
+    As with pd.Series.sum, missing values count as 0 in the sums, but they are still
+    counted in the number (or weight) of transcripts of a window. Windows without
+    transcripts are NaN. The decayed means use all transcripts up to the evaluation
+    date.
+
+    Args:
+        dates (array-like): Date of every transcript, in any order
+        values (array-like): Scores of every transcript, one column per index
+        evaluation_dates (array-like): Sorted dates for which the index is calculated
+        day_windows (list): Numbers of days before the evaluation date in the window
+        half_lives (list): Half-lives in days of the exponentially decayed means
+
+    Returns:
+        dict: (TRAILING_MEAN, day_window) or (EXPONENTIAL_DECAY, half_life) as key
+            and an array with one row per evaluation date and one column per column
+            of values as value
+
+    """
+    dates = pd.to_datetime(np.asarray(dates)).to_numpy(dtype="datetime64[ns]")
+    evaluation_dates = pd.to_datetime(np.asarray(evaluation_dates)).to_numpy(
+        dtype="datetime64[ns]"
+    )
+    values = np.asarray(values, dtype=np.float64)
+    if values.ndim == 1:
+        values = values[:, np.newaxis]
+
+    order = np.argsort(dates, kind="stable")
+    sorted_dates = dates[order]
+    sorted_values = np.nan_to_num(values[order], nan=0.0)
+
+    window_means = {}
+
+    if len(day_windows) > 0:
+        cumulative_sums = np.zeros((len(sorted_dates) + 1, values.shape[1]))
+        np.cumsum(sorted_values, axis=0, out=cumulative_sums[1:])
+        window_ends = np.searchsorted(sorted_dates, evaluation_dates, side="right")
+
+        for day_window in day_windows:
+            window_starts = np.searchsorted(
+                sorted_dates,
+                evaluation_dates - np.timedelta64(day_window, "D"),
+                side="left",
+            )
+            window_means[(TRAILING_MEAN, day_window)] = _divide_window_sums(
+                cumulative_sums[window_ends] - cumulative_sums[window_starts],
+                (window_ends - window_starts)[:, np.newaxis],
+            )
+
+    if len(half_lives) > 0:
+        # Every transcript is added at the first evaluation date on or after its date
+        evaluation_positions = np.searchsorted(
+            evaluation_dates, sorted_dates, side="left"
+        )
+        is_evaluated = evaluation_positions < len(evaluation_dates)
+        evaluation_positions = evaluation_positions[is_evaluated]
+        ages_in_days = (
+            evaluation_dates[evaluation_positions] - sorted_dates[is_evaluated]
+        ) / np.timedelta64(1, "D")
+        evaluation_days = (evaluation_dates - evaluation_dates[:1]) / np.timedelta64(
+            1, "D"
+        )
+
+        for half_life in half_lives:
+            weights = 0.5 ** (ages_in_days / half_life)
+            new_sums = np.zeros((len(evaluation_dates), values.shape[1]))
+            new_weights = np.zeros(len(evaluation_dates))
+            np.add.at(
+                new_sums,
+                evaluation_positions,
+                sorted_values[is_evaluated] * weights[:, np.newaxis],
+            )
+            np.add.at(new_weights, evaluation_positions, weights)
+
+            decayed_sums, decayed_weights = _decay_cumulative_sums(
+                new_sums, new_weights[:, np.newaxis], evaluation_days, half_life
+            )
+            window_means[(EXPONENTIAL_DECAY, half_life)] = _divide_window_sums(
+                decayed_sums, decayed_weights
+            )
+
+    return window_means
+
+
+def _decay_cumulative_sums(new_sums, new_weights, evaluation_days, half_life):
+    """Return the exponentially decayed running sums of the sums and weights added
+    at every evaluation date.
+
+    Within a block of evaluation dates the decayed sums are cumulative sums of the
+    added sums scaled by 2 ** (days / half_life). The blocks are at most
+    MAX_DECAY_HALF_LIVES half-lives long, so that the scale factors stay finite, and
+    the sums at the end of a block are decayed into the next block.
+
+    """
+    decayed_sums = np.empty_like(new_sums)
+    decayed_weights = np.empty_like(new_weights)
+    carried_sums = np.zeros(new_sums.shape[1])
+    carried_weights = np.zeros(new_weights.shape[1])
+    carried_day = evaluation_days[0] if len(evaluation_days) > 0 else 0.0
+
+    block_start = 0
+    while block_start < len(evaluation_days):
+        block_end = np.searchsorted(
+            evaluation_days,
+            evaluation_days[block_start] + MAX_DECAY_HALF_LIVES * half_life,
+            side="right",
+        )
+        block_days = evaluation_days[block_start:block_end]
+        growth = (2.0 ** ((block_days - block_days[0]) / half_life))[:, np.newaxis]
+        carry_decay = (0.5 ** ((block_days - carried_day) / half_life))[:, np.newaxis]
+
+        decayed_sums[block_start:block_end] = (
+            np.cumsum(new_sums[block_start:block_end] * growth, axis=0) / growth
+            + carried_sums * carry_decay
+        )
+        decayed_weights[block_start:block_end] = (
+            np.cumsum(new_weights[block_start:block_end] * growth, axis=0) / growth
+            + carried_weights * carry_decay
+        )
+
+        carried_sums = decayed_sums[block_end - 1]
+        carried_weights = decayed_weights[block_end - 1]
+        carried_day = evaluation_days[block_end - 1]
+        block_start = block_end
+
+    return decayed_sums, decayed_weights
+
+
+def _divide_window_sums(window_sums, window_weights):
+    """Divide the window sums by the window weights, NaN for empty windows."""
+    with np.errstate(invalid="ignore", divide="ignore"):
+        window_means = window_sums / window_weights
+    window_means[np.broadcast_to(window_weights == 0, window_means.shape)] = np.nan
+
+    return window_means
+
+
+def calculate_rolling_window_means(dates, values, evaluation_dates, day_window):
+    """This function calculates the mean of the values of all transcripts with a date
+    in [evaluation date - day_window days, evaluation date] for every evaluation date.
+
+    As with pd.Series.sum, missing values count as 0 in the sum, but they are still
+    counted in the number of transcripts of a window. Windows without transcripts
+    are NaN.
+
+    Args:
+        dates (array-like): Date of every transcript, in any order
+        values (array-like): Scores of every transcript, one column per index
+        evaluation_dates (array-like): Dates for which the index is calculated
+        day_window (int): Number of days before the evaluation date in the window
+
+    Returns:
+        np.ndarray: Array with one row per evaluation date and one column per column
+            of values
+
+    """
+    return calculate_multi_window_means(
+        dates, values, evaluation_dates, day_windows=[day_window]
+    )[(TRAILING_MEAN, day_window)]
+
+
+def calculate_grouped_multi_window_means(
+    dates,
+    values,
+    groups,
+    evaluation_dates,
+    day_windows=(),
+    half_lives=(),
+    group_names=None,
+):
+    """This function calculates calculate_multi_window_means separately for every
+    group, e.g. the GPT predictions of every country. The rows are sorted by group
+    and date once and every group is a contiguous segment of the sorted rows.
+
+    Args:
+        dates (array-like): Date of every row, in any order
+        values (array-like): Value of every row
+        groups (array-like): Group of every row
+        evaluation_dates (array-like): Sorted dates for which the index is calculated
+        day_windows (list): Numbers of days before the evaluation date in the window
+        half_lives (list): Half-lives in days of the exponentially decayed means
+        group_names (list): Groups to calculate. None uses all groups in the order
+            of their first appearance. Rows of other groups are ignored, and groups
+            without rows are NaN for every date.
+
+    Returns:
+        tuple: (list, dict) The groups and the output of calculate_multi_window_means
+            with one column per group
+
+    """
+    dates = pd.to_datetime(np.asarray(dates)).to_numpy(dtype="datetime64[ns]")
+    values = np.asarray(values, dtype=np.float64)
+
+    if group_names is None:
+        group_codes, group_names = pd.factorize(np.asarray(groups), sort=False)
+    else:
+        # Rows of other groups get the code -1 and are not in any segment
+        group_codes = pd.Index(group_names).get_indexer(np.asarray(groups))
+    group_names = list(group_names)
+
+    order = np.lexsort((dates, group_codes))
+    sorted_codes = group_codes[order]
+    segment_bounds = np.searchsorted(
+        sorted_codes, np.arange(len(group_names) + 1), side="left"
+    )
+
+    window_keys = [(TRAILING_MEAN, day_window) for day_window in day_windows] + [
+        (EXPONENTIAL_DECAY, half_life) for half_life in half_lives
+    ]
+    window_means = {
+        window_key: np.empty((len(evaluation_dates), len(group_names)))
+        for window_key in window_keys
+    }
+
+    for code in range(len(group_names)):
+        segment = order[segment_bounds[code] : segment_bounds[code + 1]]
+        group_means = calculate_multi_window_means(
+            dates[segment], values[segment], evaluation_dates, day_windows, half_lives
+        )
+        for window_key in window_keys:
+            window_means[window_key][:, code] = group_means[window_key][:, 0]
+
+    return group_names, window_means
+
+
+def calculate_grouped_rolling_window_means(
+    dates, values, groups, evaluation_dates, day_window, group_names=None
+):
+    """This function calculates calculate_rolling_window_means separately for every
+    group, see calculate_grouped_multi_window_means.
+
+    Returns:
+        tuple: (list, np.ndarray) The groups and an array with one row per evaluation
+            date and one column per group
+
+    """
+    group_names, window_means = calculate_grouped_multi_window_means(
+        dates,
+        values,
+        groups,
+        evaluation_dates,
+        day_windows=[day_window],
+        group_names=group_names,
+    )
+    return group_names, window_means[(TRAILING_MEAN, day_window)]
+
+
+def convert_window_means_to_long_format(
+    window_means, evaluation_dates, countries, value_name
+):
+    """This function writes the output of calculate_multi_window_means as one tidy
+    dataframe.
+
+    Args:
+        window_means (dict): Output of calculate_multi_window_means with one column
+            per country
+        evaluation_dates (array-like): Dates of the rows of the window means
+        countries (list): Country of every column of the window means
+        value_name (str): Name of the column with the index values
+
+    Returns:
+        pd.DataFrame: columns Date, Country, Weighting (TRAILING_MEAN or
+            EXPONENTIAL_DECAY), Window_Days (window length or half-life) and
+            value_name
+
+    """
+    long_data = [
+        pd.DataFrame(
+            {
+                "Date": np.tile(evaluation_dates, len(countries)),
+                "Country": np.repeat(countries, len(evaluation_dates)),
+                "Weighting": weighting,
+                "Window_Days": window_days,
+                value_name: means.T.ravel(),
+            }
+        )
+        for (weighting, window_days), means in window_means.items()
+    ]
+
+    return pd.concat(long_data, ignore_index=True)
@@ -12,7 +12,6 @@ from debt_crisis.config import (
     CONFIGURATION_SETTINGS,
 )
 from debt_crisis.sentiment_index.clean_sentiment_data import (
-    combine_all_transcripts_into_dataframe,
     clean_transcript_data_df,
     tokenize_text_and_remove_non_alphabetic_characters_and_stop_words,
     clean_sentiment_dictionary_data,
@@ -21,6 +20,9 @@ from debt_crisis.sentiment_index.clean_sentiment_data import (
     calculate_loughlan_mcdonald_sentiment_index,
     create_word_count_dictionary,
 )
+from debt_crisis.sentiment_index.transcript_ingestion import (
+    combine_all_transcripts_into_dataframe,
+)
 
 from debt_crisis.utilities import _name_sentiment_index_output_file
 
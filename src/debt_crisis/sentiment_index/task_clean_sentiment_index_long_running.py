@@ -1,5 +1,5 @@
 import pandas as pd
-from pytask import task
+from pytask import PythonNode, task
 import pytask
 import matplotlib.pyplot as plt
 import pickle
@@ -8,33 +8,159 @@ from debt_crisis.config import (
     BLD,
     SRC,
     NO_LONG_RUNNING_TASKS,
+    N_WORKERS,
+    STREAM_TRANSCRIPT_PREPROCESSING,
+    TRANSCRIPT_CHUNK_SIZE,
+    USE_TRANSCRIPT_CACHE,
+    TRANSCRIPT_CACHE_DIRECTORY,
+    TRANSCRIPT_CACHE_MAX_BYTES,
+    TRANSCRIPTS_RAW_PATH,
+    TRANSCRIPTS_CLEAN_STEP_1_PATH,
     COUNTRIES_UNDER_STUDY,
+    MAPPING_COUNTRY_NAMES_TO_COUNTRY,
     CONFIGURATION_SETTINGS,
+    RUN_WORDS_IN_ENVIRONMENT_SWEEP,
+    WORDS_IN_ENVIRONMENT_SWEEP,
+    ENCODE_TRANSCRIPT_CORPUS,
+    SENTIMENT_INDEX_DAY_WINDOWS,
+    SENTIMENT_INDEX_HALF_LIVES,
+    USE_COUNTRY_MENTION_INDEX,
+    SENTIMENT_INDEX_START_DATE,
+    SENTIMENT_INDEX_END_DATE,
 )
 from debt_crisis.sentiment_index.clean_sentiment_data import (
-    combine_all_transcripts_into_dataframe,
     clean_transcript_data_df,
     tokenize_text_and_remove_non_alphabetic_characters_and_stop_words,
     clean_sentiment_dictionary_data,
     create_sentiment_dictionary_for_lookups,
     create_country_sentiment_index_for_one_transcript_and_print_transcript_number,
+    create_sentiment_index_columns_for_window_sizes,
+    create_country_alias_index,
     calculate_loughlan_mcdonald_sentiment_index,
+    calculate_loughlan_mcdonald_sentiment_index_for_multiple_windows,
+    update_loughlan_mcdonald_sentiment_index,
+    get_sentiment_index_from_state,
     create_word_count_dictionary,
 )
 
+from debt_crisis.sentiment_index.corpus_encoding import (
+    align_encoded_corpus_scores,
+    create_sentiment_index_columns_from_encoded_corpus,
+    encode_transcript_corpus,
+    load_encoded_corpus,
+)
+from debt_crisis.sentiment_index.country_mention_index import (
+    create_alias_index_fingerprint,
+    update_country_mention_index,
+)
+from debt_crisis.sentiment_index.incremental_sentiment_index import (
+    get_sentiment_index_end_date,
+)
+from debt_crisis.sentiment_index.transcript_cache import PreprocessedTranscriptCache
+from debt_crisis.sentiment_index.transcript_ingestion import (
+    combine_all_transcripts_into_dataframe,
+    update_transcript_dataframe_incrementally,
+    update_transcript_manifest,
+    create_transcript_file_index,
+    stream_preprocessed_transcripts,
+    write_transcripts_in_chunks,
+)
+from debt_crisis.sentiment_index.transcript_storage import (
+    read_transcript_dataset,
+    write_transcript_dataset,
+)
+from debt_crisis.sentiment_index.word_hit_counts import (
+    create_sentiment_index_columns_with_word_hit_counts,
+    word_hit_counts_to_dataframe,
+    word_hit_counts_to_word_count_dict,
+)
 from debt_crisis.utilities import _name_sentiment_index_output_file
 
 
-@pytask.mark.skipif(NO_LONG_RUNNING_TASKS, reason="Skip long-running tasks.")
-def task_combine_all_transcripts_into_initial_dataframe(
-    data_directory=str(
-        SRC / "data" / "transcripts" / "raw" / "Eikon 2002 - 2022",
-    ),
-    produces=BLD / "data" / "df_transcripts_raw.pkl",
-):
-    full_dataframe = combine_all_transcripts_into_dataframe(data_directory)
+def _create_transcript_cache():
+    """Return the cache of preprocessed transcripts or None if it is switched off."""
+    if not USE_TRANSCRIPT_CACHE:
+        return None
+
+    return PreprocessedTranscriptCache(
+        TRANSCRIPT_CACHE_DIRECTORY, max_bytes=TRANSCRIPT_CACHE_MAX_BYTES
+    )
+
+
+if not STREAM_TRANSCRIPT_PREPROCESSING:
 
-    full_dataframe.to_pickle(produces)
+    @pytask.mark.skipif(NO_LONG_RUNNING_TASKS, reason="Skip long-running tasks.")
+    def task_combine_all_transcripts_into_initial_dataframe(
+        data_directory=str(
+            SRC / "data" / "transcripts" / "raw" / "Eikon 2002 - 2022",
+        ),
+        n_workers=N_WORKERS,
+        produces=[
+            TRANSCRIPTS_RAW_PATH,
+            BLD / "data" / "df_transcripts_raw_manifest.pkl",
+        ],
+    ):
+        # Re-use the artifacts of the last run so that only new or changed files
+        # are read
+        if produces[0].exists() and produces[1].exists():
+            existing_data = read_transcript_dataset(produces[0].parent)
+            manifest = pd.read_pickle(produces[1])
+        else:
+            existing_data, manifest = None, None
+
+        full_dataframe, manifest = update_transcript_dataframe_incrementally(
+            data_directory,
+            existing_data=existing_data,
+            manifest=manifest,
+            n_workers=n_workers,
+            report_throughput=True,
+        )
+
+        write_transcript_dataset(full_dataframe, produces[0].parent)
+        manifest.to_pickle(produces[1])
+
+else:
+
+    @pytask.mark.skipif(NO_LONG_RUNNING_TASKS, reason="Skip long-running tasks.")
+    def task_update_transcript_manifest(
+        data_directory=str(
+            SRC / "data" / "transcripts" / "raw" / "Eikon 2002 - 2022",
+        ),
+        n_workers=N_WORKERS,
+        produces=BLD / "data" / "df_transcripts_raw_manifest.pkl",
+    ):
+        # Only the manifest is kept, the transcripts are streamed into step 1
+        manifest = pd.read_pickle(produces) if produces.exists() else None
+
+        update_transcript_manifest(
+            data_directory, manifest=manifest, n_workers=n_workers
+        ).to_pickle(produces)
+
+    @pytask.mark.skipif(NO_LONG_RUNNING_TASKS, reason="Skip long-running tasks.")
+    def task_stream_transcripts_into_clean_step_1_dataset(
+        data_directory=str(
+            SRC / "data" / "transcripts" / "raw" / "Eikon 2002 - 2022",
+        ),
+        chunk_size=TRANSCRIPT_CHUNK_SIZE,
+        depends_on=BLD / "data" / "df_transcripts_raw_manifest.pkl",
+        produces=TRANSCRIPTS_CLEAN_STEP_1_PATH,
+    ):
+        # The Transcript_IDs are taken from the manifest, no transcript is loaded
+        # before it is streamed
+        file_index = create_transcript_file_index(
+            data_directory, manifest=pd.read_pickle(depends_on)
+        )
+        cache = _create_transcript_cache()
+
+        write_transcripts_in_chunks(
+            stream_preprocessed_transcripts(file_index, cache=cache),
+            produces.parent,
+            chunk_size=chunk_size,
+        )
+
+        if cache is not None:
+            cache.evict()
+            cache.report()
 
 
 # @pytask.mark.skipif(NO_LONG_RUNNING_TASKS, reason="Skip long-running tasks.")
@@ -58,8 +184,81 @@ def task_combine_all_transcripts_into_initial_dataframe(
 #     sentiment_index_data.to_pickle(produces)
 
 
+# @pytask.mark.skipif(NO_LONG_RUNNING_TASKS, reason="Skip long-running tasks.")
+# def task_calculate_McDonald_sentiment_index_for_multiple_windows(
+#     depends_on=BLD
+#     / "data"
+#     / _name_sentiment_index_output_file(
+#         "df_transcripts_clean_step_2", CONFIGURATION_SETTINGS, ".pkl"
+#     ),
+#     countries=COUNTRIES_UNDER_STUDY,
+#     day_windows=SENTIMENT_INDEX_DAY_WINDOWS,
+#     half_lives=SENTIMENT_INDEX_HALF_LIVES,
+#     produces=BLD
+#     / "data"
+#     / _name_sentiment_index_output_file(
+#         "mcdonald_sentiment_index_multiple_windows", CONFIGURATION_SETTINGS, ".pkl"
+#     ),
+# ):
+#     df = pd.read_pickle(depends_on)
+
+#     sentiment_index_data = (
+#         calculate_loughlan_mcdonald_sentiment_index_for_multiple_windows(
+#             df, countries, day_windows=day_windows, half_lives=half_lives
+#         )
+#     )
+
+#     sentiment_index_data.to_pickle(produces)
+
+
+# @pytask.mark.skipif(NO_LONG_RUNNING_TASKS, reason="Skip long-running tasks.")
+# def task_update_McDonald_sentiment_index(
+#     depends_on=BLD
+#     / "data"
+#     / _name_sentiment_index_output_file(
+#         "df_transcripts_clean_step_2", CONFIGURATION_SETTINGS, ".pkl"
+#     ),
+#     countries=COUNTRIES_UNDER_STUDY,
+#     start_date=PythonNode(value=SENTIMENT_INDEX_START_DATE, hash=True),
+#     end_date=PythonNode(
+#         value=get_sentiment_index_end_date(SENTIMENT_INDEX_END_DATE).strftime(
+#             "%Y-%m-%d"
+#         ),
+#         hash=True,
+#     ),
+#     produces={
+#         "index": BLD
+#         / "data"
+#         / _name_sentiment_index_output_file(
+#             "mcdonald_sentiment_index_incremental", CONFIGURATION_SETTINGS, ".pkl"
+#         ),
+#         "state": BLD
+#         / "data"
+#         / _name_sentiment_index_output_file(
+#             "mcdonald_sentiment_index_state", CONFIGURATION_SETTINGS, ".pkl"
+#         ),
+#     },
+# ):
+#     # Re-use the state of the last run so that only new transcripts are added
+#     if produces["state"].exists():
+#         with open(produces["state"], "rb") as state_file:
+#             state = pickle.load(state_file)
+#     else:
+#         state = None
+
+#     df = pd.read_pickle(depends_on)
+
+#     state = update_loughlan_mcdonald_sentiment_index(
+#         df, countries, state=state, start_date=start_date, end_date=end_date
+#     )
+
+#     with open(produces["state"], "wb") as state_file:
+#         pickle.dump(state, state_file)
+#     get_sentiment_index_from_state(state).to_pickle(produces["index"])
+
+
 # task_clean_transcript_data_step_2_dependencies = {
-#     "df_transcripts_step_1": BLD / "data" / "df_transcripts_clean_step_1.pkl",
+#     "df_transcripts_step_1": TRANSCRIPTS_CLEAN_STEP_1_PATH,
 #     "sentiment_dictionary": BLD / "data" / "sentiment_dictionary_lookup.pkl",
 #     "country_names_file": SRC / "data" / "country_names" / "country_names.xlsx",
 #     "words_environment": 20,
@@ -81,54 +280,223 @@ def task_combine_all_transcripts_into_initial_dataframe(
 #         / _name_sentiment_index_output_file(
 #             "filled_word_count_dict", CONFIGURATION_SETTINGS, ".pkl"
 #         ),
+#         BLD
+#         / "data"
+#         / _name_sentiment_index_output_file(
+#             "word_hit_counts_by_country_and_year", CONFIGURATION_SETTINGS, ".pkl"
+#         ),
 #     ],
 # ):
 #     # Load Data
-#     cleaned_data = pd.read_pickle(depends_on["df_transcripts_step_1"])
+#     cleaned_data = read_transcript_dataset(
+#         depends_on["df_transcripts_step_1"].parent
+#     )
 #     lookup_dict = pickle.load(open(depends_on["sentiment_dictionary"], "rb"))
-#     word_count_dict = create_word_count_dictionary(lookup_dict)
 #     country_names_file = pd.read_excel(depends_on["country_names_file"])
+#     alias_index = create_country_alias_index(
+#         country_names_file, MAPPING_COUNTRY_NAMES_TO_COUNTRY
+#     )
 #     words_environment = depends_on["words_environment"]
 
-#     for country in countries_under_study:
-#         print(country)
-
-#         # Initialize Row counter
-#         create_country_sentiment_index_for_one_transcript_and_print_transcript_number.row_counter = (
-#             0
-#         )
-
-#         # Make Sentiment Index
-#         cleaned_data[f"Sentiment_Index_McDonald_{country}"] = cleaned_data[
-#             "Preprocessed_Transcript_Step_1"
-#         ].apply(
-#             lambda x: create_country_sentiment_index_for_one_transcript_and_print_transcript_number(
-#                 x,
-#                 lookup_dict,
-#                 words_environment,
-#                 country,
-#                 country_names_file,
-#                 word_count_dict,
-#             )
-#         )
+#     # Every chunk returns its own word hits, which are merged afterwards, so the
+#     # counts are the same with one or many workers
+#     (
+#         sentiment_index_columns,
+#         word_hits,
+#     ) = create_sentiment_index_columns_with_word_hit_counts(
+#         cleaned_data["Preprocessed_Transcript_Step_1"],
+#         cleaned_data["Date"].dt.year,
+#         lookup_dict,
+#         words_environment,
+#         countries_under_study,
+#         alias_index,
+#         n_workers=N_WORKERS,
+#     )
+#     cleaned_data = pd.concat([cleaned_data, sentiment_index_columns], axis=1)
 
 #     cleaned_data.to_pickle(produces[0])
 
+#     word_count_dict = word_hit_counts_to_word_count_dict(word_hits, lookup_dict)
 #     word_count_df = pd.DataFrame.from_dict(word_count_dict, orient="index")
 #     word_count_df = word_count_df.transpose().rename_axis("Keys").reset_index()
 #     word_count_df.to_pickle(produces[1])
 
+#     word_hit_counts_to_dataframe(word_hits).to_pickle(produces[2])
+
+
+if USE_COUNTRY_MENTION_INDEX:
+
+    @pytask.mark.skipif(NO_LONG_RUNNING_TASKS, reason="Skip long-running tasks.")
+    def task_update_country_mention_index(
+        depends_on={
+            "df_transcripts_step_1": TRANSCRIPTS_CLEAN_STEP_1_PATH,
+            "country_names_file": SRC / "data" / "country_names" / "country_names.xlsx",
+        },
+        country_mapping=PythonNode(
+            value=MAPPING_COUNTRY_NAMES_TO_COUNTRY, hash=create_alias_index_fingerprint
+        ),
+        produces=[
+            BLD / "data" / "country_mention_index.pkl",
+            BLD / "data" / "country_mention_index_manifest.pkl",
+        ],
+    ):
+        cleaned_data = read_transcript_dataset(
+            depends_on["df_transcripts_step_1"].parent,
+            columns=["Transcript_ID", "Preprocessed_Transcript_Step_1"],
+        )
+        country_names_file = pd.read_excel(depends_on["country_names_file"])
+        alias_index = create_country_alias_index(country_names_file, country_mapping)
+
+        # Re-use the index of the last run so that only new or changed transcripts
+        # are scanned. The index is rebuilt if the aliases have changed.
+        if produces[0].exists() and produces[1].exists():
+            mention_index = pd.read_pickle(produces[0])
+            manifest = pd.read_pickle(produces[1])
+        else:
+            mention_index, manifest = None, None
+
+        mention_index, manifest = update_country_mention_index(
+            cleaned_data, alias_index, mention_index=mention_index, manifest=manifest
+        )
+
+        mention_index.to_pickle(produces[0])
+        manifest.to_pickle(produces[1])
+
+
+if RUN_WORDS_IN_ENVIRONMENT_SWEEP:
+    sweep_configuration_settings = {
+        window_size: {**CONFIGURATION_SETTINGS, "words_in_environment": window_size}
+        for window_size in WORDS_IN_ENVIRONMENT_SWEEP
+    }
+
+    @pytask.mark.skipif(NO_LONG_RUNNING_TASKS, reason="Skip long-running tasks.")
+    def task_clean_transcript_data_step_2_for_all_window_sizes(
+        depends_on={
+            "df_transcripts_step_1": TRANSCRIPTS_CLEAN_STEP_1_PATH,
+            "sentiment_dictionary": BLD / "data" / "sentiment_dictionary_lookup.pkl",
+            "country_names_file": SRC / "data" / "country_names" / "country_names.xlsx",
+            **(
+                {"country_mention_index": BLD / "data" / "country_mention_index.pkl"}
+                if USE_COUNTRY_MENTION_INDEX and not ENCODE_TRANSCRIPT_CORPUS
+                else {}
+            ),
+            **(
+                {
+                    "encoded_corpus": BLD
+                    / "data"
+                    / "transcript_corpus_encoded"
+                    / "offsets.npy"
+                }
+                if ENCODE_TRANSCRIPT_CORPUS
+                else {}
+            ),
+        },
+        countries_under_study=COUNTRIES_UNDER_STUDY,
+        calculation_method=CONFIGURATION_SETTINGS["sentiment_index_calculation_method"],
+        produces={
+            window_size: {
+                file_name: BLD
+                / "data"
+                / _name_sentiment_index_output_file(file_name, settings, ".pkl")
+                for file_name in [
+                    "df_transcripts_clean_step_2_sweep",
+                    "filled_word_count_dict_sweep",
+                ]
+            }
+            for window_size, settings in sweep_configuration_settings.items()
+        },
+    ):
+        # Load Data
+        cleaned_data = read_transcript_dataset(
+            depends_on["df_transcripts_step_1"].parent
+        )
+        lookup_dict = pickle.load(open(depends_on["sentiment_dictionary"], "rb"))
+        country_names_file = pd.read_excel(depends_on["country_names_file"])
+        alias_index = create_country_alias_index(
+            country_names_file, MAPPING_COUNTRY_NAMES_TO_COUNTRY
+        )
+        word_count_dicts = {
+            window_size: create_word_count_dictionary(lookup_dict)
+            for window_size in WORDS_IN_ENVIRONMENT_SWEEP
+        }
+        if "country_mention_index" in depends_on:
+            mention_index = pd.read_pickle(depends_on["country_mention_index"])
+        else:
+            mention_index = None
+
+        if "encoded_corpus" in depends_on:
+            # Score the encoded corpus and match the scores by Transcript_ID
+            sentiment_index_columns = align_encoded_corpus_scores(
+                create_sentiment_index_columns_from_encoded_corpus(
+                    load_encoded_corpus(depends_on["encoded_corpus"].parent),
+                    lookup_dict,
+                    WORDS_IN_ENVIRONMENT_SWEEP,
+                    countries_under_study,
+                    alias_index,
+                    word_count_dicts,
+                    calculation_method,
+                ),
+                cleaned_data["Transcript_ID"],
+            )
+        else:
+            # Tokenise every transcript once and score all window sizes in one pass
+            sentiment_index_columns = create_sentiment_index_columns_for_window_sizes(
+                cleaned_data["Preprocessed_Transcript_Step_1"],
+                lookup_dict,
+                WORDS_IN_ENVIRONMENT_SWEEP,
+                countries_under_study,
+                country_names_file,
+                word_count_dicts,
+                calculation_method,
+                alias_index=alias_index,
+                mention_index=mention_index,
+                transcript_ids=cleaned_data["Transcript_ID"],
+            )
+
+        for window_size in WORDS_IN_ENVIRONMENT_SWEEP:
+            pd.concat(
+                [cleaned_data, sentiment_index_columns[window_size]], axis=1
+            ).to_pickle(produces[window_size]["df_transcripts_clean_step_2_sweep"])
+
+            word_count_df = pd.DataFrame.from_dict(
+                word_count_dicts[window_size], orient="index"
+            )
+            word_count_df = word_count_df.transpose().rename_axis("Keys").reset_index()
+            word_count_df.to_pickle(
+                produces[window_size]["filled_word_count_dict_sweep"]
+            )
+
+
+if ENCODE_TRANSCRIPT_CORPUS:
+
+    @pytask.mark.skipif(NO_LONG_RUNNING_TASKS, reason="Skip long-running tasks.")
+    def task_encode_transcript_corpus(
+        depends_on=TRANSCRIPTS_CLEAN_STEP_1_PATH,
+        produces=BLD / "data" / "transcript_corpus_encoded" / "offsets.npy",
+    ):
+        cleaned_data = read_transcript_dataset(
+            depends_on.parent,
+            columns=["Transcript_ID", "Preprocessed_Transcript_Step_1"],
+        )
+
+        encode_transcript_corpus(
+            cleaned_data["Preprocessed_Transcript_Step_1"],
+            produces.parent,
+            transcript_ids=cleaned_data["Transcript_ID"],
+        )
+
 
 # @pytask.mark.skipif(NO_LONG_RUNNING_TASKS, reason="Skip long-running tasks.")
 # def task_clean_transcript_data_step_1(
-#     depends_on=BLD / "data" / "df_transcripts_raw.pkl",
-#     produces=BLD / "data" / "df_transcripts_clean_step_1.pkl",
+#     depends_on=TRANSCRIPTS_RAW_PATH,
+#     produces=TRANSCRIPTS_CLEAN_STEP_1_PATH,
 # ):
-#     raw_data = pd.read_pickle(depends_on)
-#     cleaned_data = clean_transcript_data_df(raw_data)
-#     cleaned_data["Transcript_ID"] = cleaned_data.index + 1
+#     raw_data = read_transcript_dataset(depends_on.parent)
+#     cleaned_data = clean_transcript_data_df(
+#         raw_data, n_workers=N_WORKERS, cache=_create_transcript_cache()
+#     )
 
-#     cleaned_data.to_pickle(produces)
+#     write_transcript_dataset(cleaned_data, produces.parent)
 
 
 # # def task_plot_raw_data_sentiment_dictionart_barplot(
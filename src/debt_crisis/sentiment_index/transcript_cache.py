@@ -0,0 +1,124 @@
+"""On-disk cache of preprocessed transcripts.
+
+Every entry holds the output of normalise_transcript_text for one raw transcript.
+The key combines the fingerprint of the preprocessing rules with the SHA-256 hash
+of the raw text, so an entry is only re-used for the same text and the same rules.
+Entries of old rules are never hit again and are removed by the size-bounded
+eviction, which deletes the least recently used entries first.
+
+"""
+import hashlib
+import os
+import tempfile
+
+from debt_crisis.sentiment_index.clean_sentiment_data import PREPROCESSING_FINGERPRINT
+
+CACHE_FILE_SUFFIX = ".txt"
+
+
+class PreprocessedTranscriptCache:
+    """Cache of preprocessed transcripts in a directory.
+
+    Args:
+        cache_directory (str or Path): Directory of the cache files
+        max_bytes (int): Maximum total size of the cache files. None means unbounded.
+        fingerprint (str): Fingerprint of the preprocessing rules
+
+    Attributes:
+        hits (int): Number of lookups that found an entry
+        misses (int): Number of lookups that did not find an entry
+
+    """
+
+    def __init__(
+        self, cache_directory, max_bytes=None, fingerprint=PREPROCESSING_FINGERPRINT
+    ):
+        self.cache_directory = cache_directory
+        self.max_bytes = max_bytes
+        self.fingerprint = fingerprint
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(cache_directory, exist_ok=True)
+
+    def key(self, raw_transcript_text):
+        """Return the cache key of a raw transcript."""
+        content_hash = hashlib.sha256(raw_transcript_text.encode("utf-8")).hexdigest()
+
+        return f"{self.fingerprint[:16]}-{content_hash}"
+
+    def get(self, raw_transcript_text):
+        """Return the cached preprocessed text of a raw transcript or None."""
+        path = self._path(self.key(raw_transcript_text))
+
+        try:
+            with open(path, encoding="utf-8", newline="") as file:
+                preprocessed_text = file.read()
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+
+        # Mark the entry as recently used for the eviction
+        os.utime(path)
+        self.hits += 1
+
+        return preprocessed_text
+
+    def put(self, raw_transcript_text, preprocessed_text):
+        """Store the preprocessed text of a raw transcript."""
+        path = self._path(self.key(raw_transcript_text))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Write to a temporary file first so that readers never see partial entries
+        file_descriptor, temporary_path = tempfile.mkstemp(
+            dir=os.path.dirname(path), suffix=".tmp"
+        )
+        with open(file_descriptor, "w", encoding="utf-8", newline="") as file:
+            file.write(preprocessed_text)
+        os.replace(temporary_path, path)
+
+    def evict(self):
+        """Delete the least recently used entries until the cache fits into max_bytes.
+
+        Returns:
+            int: Number of deleted entries
+
+        """
+        if self.max_bytes is None:
+            return 0
+
+        entries = []
+        for directory, _, file_names in os.walk(self.cache_directory):
+            for file_name in file_names:
+                if file_name.endswith(CACHE_FILE_SUFFIX):
+                    path = os.path.join(directory, file_name)
+                    stat = os.stat(path)
+                    entries.append((stat.st_mtime, stat.st_size, path))
+
+        total_bytes = sum(size for _, size, _ in entries)
+        number_deleted = 0
+
+        for _, size, path in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            os.remove(path)
+            total_bytes -= size
+            number_deleted += 1
+
+        return number_deleted
+
+    def report(self):
+        """Print and return the hit and miss counters."""
+        lookups = self.hits + self.misses
+        hit_rate = self.hits / lookups if lookups else 0.0
+
+        print(
+            f"Transcript cache: {self.hits} hits, {self.misses} misses "
+            f"({hit_rate:.1%} hit rate)"
+        )
+
+        return {"Hits": self.hits, "Misses": self.misses, "Hit_Rate": hit_rate}
+
+    def _path(self, key):
+        """Return the file path of a key, spread over 256 subdirectories."""
+        return os.path.join(self.cache_directory, key[-2:], f"{key}{CACHE_FILE_SUFFIX}")
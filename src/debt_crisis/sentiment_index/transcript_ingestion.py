@@ -0,0 +1,608 @@
+"""Ingestion of the raw transcript files.
+
+The transcripts are .txt files below one root directory (one directory per year in
+the Eikon folder), named like 2004-Apr-06-BALN.S-139342690605-transcript.txt. This
+module finds the files, reads them into df_transcripts_raw, keeps that dataframe
+and its manifest up to date incrementally, and streams the files through the step 1
+preprocessing into a Parquet dataset without holding the corpus in memory.
+
+The manifest has one row per file with the columns of TRANSCRIPT_MANIFEST_COLUMNS.
+manifest.attrs["Next_Transcript_ID"] is the next Transcript_ID that was never given
+out, so the IDs of deleted files are not re-used.
+
+"""
+import functools
+import hashlib
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from debt_crisis.sentiment_index.clean_sentiment_data import normalise_transcript_text
+from debt_crisis.sentiment_index.transcript_storage import write_transcript_dataset
+
+TRANSCRIPT_MANIFEST_COLUMNS = [
+    "File_Path",
+    "File_Size",
+    "File_Mtime",
+    "Content_Hash",
+    "Transcript_ID",
+]
+
+
+# Define function to extract date of conference call and company name from file name and text from txt files
+def extract_data_from_file(file_path):
+    """This function loads all transcript data and returns a dictionary with the date,
+    quarter, year, company name and transcript."""
+    # Extract date and company name from file name
+    date, company = extract_date_and_company_from_file_name(file_path)
+
+    # Extract text from txt files
+    with open(file_path, encoding="utf-8") as f:
+        transcript = f.read()
+
+    return {"Date": date, "Company": company, "Transcript": transcript}
+
+
+def extract_date_and_company_from_file_name(file_path):
+    """This function extracts the date of the earnings call and the company ticker
+    from a file name like 2004-Apr-06-BALN.S-139342690605-transcript.txt.
+
+    Returns: tuple: (datetime.date, str)
+
+    """
+    date_list = os.path.basename(file_path).split("-")[:3]
+    date_str = "-".join(date_list)
+    company = os.path.basename(file_path).split("-")[3]
+
+    # Transform date string into datetime object and remove time
+    date = pd.to_datetime(date_str, format="%Y-%b-%d").date()
+
+    return date, company
+
+
+def find_all_transcript_files(root_transcript_directory, n_workers=1):
+    """This function lists all transcript files below the root directory in the order
+    in which os.walk visits them.
+
+    With more than one worker, every top-level subdirectory (one per year in the
+    Eikon folder) is scanned in its own process. The results are concatenated in the
+    os.walk order, so the file order is the same as in the serial scan.
+
+    Args: root_transcript_directory: Path to the root directory of the transcripts
+        n_workers (int): Number of processes used to scan the subdirectories
+
+    Returns: list: One dictionary per transcript file
+        keys: File_Path (str): Path to the transcript file
+            File_Size (int): Size of the file in bytes
+            File_Mtime (float): Modification time of the file
+
+    """
+    if n_workers <= 1:
+        return _scan_transcript_directory(root_transcript_directory)
+
+    root, dirs, files = next(os.walk(root_transcript_directory), ("", [], []))
+
+    # Files at the top level come first, exactly as in os.walk
+    file_records = [
+        _create_transcript_file_record(os.path.join(root, file))
+        for file in files
+        if file.endswith(".txt")
+    ]
+
+    subdirectories = [os.path.join(root, directory) for directory in dirs]
+
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        for subdirectory_records in executor.map(
+            _scan_transcript_directory, subdirectories
+        ):
+            file_records.extend(subdirectory_records)
+
+    return file_records
+
+
+def _scan_transcript_directory(directory):
+    """Walk one directory tree and return a record for every transcript file."""
+    file_records = []
+
+    for root, _dirs, files in os.walk(directory):
+        for file in files:
+            if file.endswith(".txt"):
+                file_records.append(
+                    _create_transcript_file_record(os.path.join(root, file))
+                )
+
+    return file_records
+
+
+def _create_transcript_file_record(file_path):
+    """Collect the path, size and modification time of a transcript file."""
+    file_stats = os.stat(file_path)
+
+    return {
+        "File_Path": file_path,
+        "File_Size": file_stats.st_size,
+        "File_Mtime": file_stats.st_mtime,
+    }
+
+
+def extract_data_from_files(file_paths, n_workers=1):
+    """This function applies extract_data_from_file to a list of files and returns the
+    results in the order of the input list.
+
+    Args: file_paths (list): Paths to the transcript files
+        n_workers (int): Number of processes used to read and parse the files
+
+    Returns: list: One dictionary per file as returned by extract_data_from_file
+
+    """
+    if n_workers <= 1:
+        return [extract_data_from_file(file_path) for file_path in file_paths]
+
+    # Larger chunks keep the inter-process overhead small for many small files
+    chunk_size = max(1, len(file_paths) // (n_workers * 4))
+
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        return list(
+            executor.map(extract_data_from_file, file_paths, chunksize=chunk_size)
+        )
+
+
+def combine_all_transcripts_into_dataframe(
+    root_transcript_directory, n_workers=1, report_throughput=False
+):
+    """This function goes over all transcripts saved in the data folder under src/debt_crisis/data/transcripts/raw/Eikon 2002 - 2022
+    and combines them into one dataframe.
+
+    Directory scanning, parsing of the dates in the file names and reading of the
+    files can be spread over a pool of processes. The files are combined in the same
+    order as in the serial run, so the Transcript_ID ordering does not depend on the
+    number of workers.
+
+    Args: root_transcript_directory: Path to the root directory of the transcripts: src/debt_crisis/data/transcripts/raw/Eikon 2002 - 2022
+        n_workers (int): Number of processes to use. 1 runs everything in the main process.
+        report_throughput (bool): Whether to print the throughput in files and MB per second
+
+    Returns: Dataframe with all transcripts
+        Columns: Date (pd.DateTime): Date of the earnings call extracted from the file name
+                Company (str): Name of the company as ticker symbol
+                    Transcript (str): Text of the transcript
+    """
+    start_time = time.perf_counter()
+
+    file_records = find_all_transcript_files(root_transcript_directory, n_workers)
+    file_paths = [file_record["File_Path"] for file_record in file_records]
+
+    data_list = extract_data_from_files(file_paths, n_workers)
+
+    # Create data frame from the list
+    data = pd.DataFrame(data_list).sort_values(by="Date").reset_index(drop=True)
+
+    data["Transcript_ID"] = data.index
+
+    if report_throughput:
+        report_ingestion_throughput(
+            number_of_files=len(file_records),
+            number_of_bytes=sum(record["File_Size"] for record in file_records),
+            elapsed_seconds=time.perf_counter() - start_time,
+        )
+
+    return data
+
+
+def report_ingestion_throughput(number_of_files, number_of_bytes, elapsed_seconds):
+    """This function prints and returns the throughput of the transcript ingestion.
+
+    Args: number_of_files (int): Number of files that were read
+        number_of_bytes (int): Total size of the files in bytes
+        elapsed_seconds (float): Wall-clock time of the ingestion
+
+    Returns: dict: Files per second and MB per second
+
+    """
+    elapsed_seconds = max(elapsed_seconds, 1e-9)
+
+    throughput = {
+        "Files_per_Second": number_of_files / elapsed_seconds,
+        "MB_per_Second": number_of_bytes / 1e6 / elapsed_seconds,
+    }
+
+    print(
+        f"Read {number_of_files} files ({number_of_bytes / 1e6:.1f} MB) in "
+        f"{elapsed_seconds:.1f} s: {throughput['Files_per_Second']:.1f} files/s, "
+        f"{throughput['MB_per_Second']:.2f} MB/s"
+    )
+
+    return throughput
+
+
+def update_transcript_dataframe_incrementally(
+    root_transcript_directory,
+    existing_data=None,
+    manifest=None,
+    n_workers=1,
+    report_throughput=False,
+):
+    """This function brings the raw transcript dataframe up to date with the files in
+    the transcript directory and only reads files that are new or have changed.
+
+    The manifest stores the path (relative to the root directory), size,
+    modification time, content hash and Transcript_ID of every file, and
+    manifest.attrs["Next_Transcript_ID"] the next ID that was never given out. A
+    file is read again only if its size or modification time changed, and its row is
+    only replaced if the content hash changed. Untouched transcripts keep their
+    Transcript_ID, new transcripts get the next IDs (in date order), and transcripts
+    whose file was deleted are dropped. The IDs of deleted files are not re-used.
+
+    Without an existing dataframe and manifest all files are new, and the output is
+    the same as the one of combine_all_transcripts_into_dataframe.
+
+    Args: root_transcript_directory: Path to the root directory of the transcripts
+        existing_data (pd.DataFrame): Dataframe from an earlier run or None
+        manifest (pd.DataFrame): Manifest from an earlier run or None
+        n_workers (int): Number of processes used to scan and read the files
+        report_throughput (bool): Whether to print the throughput of reading the files
+
+    Returns: tuple: (pd.DataFrame, pd.DataFrame)
+        The updated transcript dataframe (same columns as
+        combine_all_transcripts_into_dataframe) and the updated manifest.
+
+    """
+    start_time = time.perf_counter()
+
+    if existing_data is None or manifest is None:
+        existing_data = pd.DataFrame(
+            columns=["Date", "Company", "Transcript", "Transcript_ID"]
+        )
+        manifest = None
+
+    compared_files, files_to_read = _compare_transcript_files_with_manifest(
+        root_transcript_directory, manifest, n_workers
+    )
+    read_data = pd.DataFrame(
+        extract_data_and_content_hash_from_files(
+            [
+                os.path.join(root_transcript_directory, file_path)
+                for file_path in files_to_read["File_Path"]
+            ],
+            n_workers,
+        ),
+        columns=["Date", "Company", "Transcript", "Content_Hash"],
+    )
+    read_data, updated_manifest = _assign_transcript_ids(
+        compared_files, files_to_read, read_data, manifest
+    )
+
+    # Replace the text of changed transcripts and drop transcripts of deleted files
+    new_data = read_data[read_data["Is_New"]]
+    modified_data = read_data[read_data["Is_Modified"]].set_index("Transcript_ID")
+    kept_transcript_ids = compared_files["Transcript_ID"].dropna()
+
+    data = existing_data[existing_data["Transcript_ID"].isin(kept_transcript_ids)]
+    data = data.set_index("Transcript_ID")
+    data.update(modified_data[["Date", "Company", "Transcript"]])
+
+    transcript_columns = ["Date", "Company", "Transcript", "Transcript_ID"]
+    data_parts = [data.reset_index()[transcript_columns], new_data[transcript_columns]]
+    data = pd.concat(
+        [data_part for data_part in data_parts if len(data_part) > 0] or data_parts[:1],
+        ignore_index=True,
+    )
+    data["Transcript_ID"] = data["Transcript_ID"].astype(int)
+    data = data.sort_values(by=["Date", "Transcript_ID"]).reset_index(drop=True)
+
+    if report_throughput:
+        report_ingestion_throughput(
+            number_of_files=len(files_to_read),
+            number_of_bytes=files_to_read["File_Size"].sum(),
+            elapsed_seconds=time.perf_counter() - start_time,
+        )
+
+    return data, updated_manifest
+
+
+def update_transcript_manifest(root_transcript_directory, manifest=None, n_workers=1):
+    """This function brings the manifest of df_transcripts_raw up to date with the
+    files in the transcript directory without building the transcript dataframe.
+
+    New and changed files are read one at a time only to hash their text, so no
+    transcript text is kept in memory. The Transcript_IDs are given out in the same
+    way as in update_transcript_dataframe_incrementally, so the streaming
+    preprocessing can number the transcripts without df_transcripts_raw.
+
+    Args: root_transcript_directory: Path to the root directory of the transcripts
+        manifest (pd.DataFrame): Manifest from an earlier run or None
+        n_workers (int): Number of processes used to scan and hash the files
+
+    Returns: pd.DataFrame: The updated manifest
+
+    """
+    compared_files, files_to_read = _compare_transcript_files_with_manifest(
+        root_transcript_directory, manifest, n_workers
+    )
+    read_data = pd.DataFrame(
+        extract_data_and_content_hash_from_files(
+            [
+                os.path.join(root_transcript_directory, file_path)
+                for file_path in files_to_read["File_Path"]
+            ],
+            n_workers,
+            keep_transcript=False,
+        ),
+        columns=["Date", "Company", "Content_Hash"],
+    )
+    _, updated_manifest = _assign_transcript_ids(
+        compared_files, files_to_read, read_data, manifest
+    )
+
+    return updated_manifest
+
+
+def _compare_transcript_files_with_manifest(
+    root_transcript_directory, manifest, n_workers
+):
+    """Return the files in the directory merged with their manifest entries, and the
+    files whose size or modification time differs from the manifest."""
+    if manifest is None:
+        manifest = pd.DataFrame(columns=TRANSCRIPT_MANIFEST_COLUMNS)
+
+    file_records = pd.DataFrame(
+        find_all_transcript_files(root_transcript_directory, n_workers),
+        columns=["File_Path", "File_Size", "File_Mtime"],
+    )
+    file_records["File_Path"] = [
+        os.path.relpath(file_path, root_transcript_directory)
+        for file_path in file_records["File_Path"]
+    ]
+
+    compared_files = file_records.merge(
+        manifest,
+        on="File_Path",
+        how="left",
+        suffixes=("", "_Manifest"),
+        validate="one_to_one",
+    )
+    is_unchanged = (
+        compared_files["File_Size"] == compared_files["File_Size_Manifest"]
+    ) & (compared_files["File_Mtime"] == compared_files["File_Mtime_Manifest"])
+
+    return compared_files, compared_files[~is_unchanged]
+
+
+def _assign_transcript_ids(compared_files, files_to_read, read_data, manifest):
+    """Give the read files their Transcript_IDs and update the manifest.
+
+    Known files keep their ID, new files get the next free IDs in the order of their
+    dates. The columns Is_New and Is_Modified are added to the read data.
+
+    """
+    read_data["File_Path"] = files_to_read["File_Path"].to_numpy()
+    read_data["Transcript_ID"] = files_to_read["Transcript_ID"].to_numpy()
+
+    is_known = read_data["Transcript_ID"].notna()
+    read_data["Is_New"] = ~is_known
+    read_data["Is_Modified"] = is_known & (
+        read_data["Content_Hash"] != files_to_read["Content_Hash"].to_numpy()
+    )
+
+    print(
+        f"Read {len(read_data)} of {len(compared_files)} files: "
+        f"{(~is_known).sum()} new, {read_data['Is_Modified'].sum()} changed."
+    )
+
+    # Assign the next free IDs to new transcripts in the order of their dates
+    next_transcript_id = _get_next_transcript_id(
+        manifest if manifest is not None else compared_files.iloc[0:0]
+    )
+    new_data = read_data[~is_known].sort_values(by="Date")
+    read_data.loc[new_data.index, "Transcript_ID"] = next_transcript_id + np.arange(
+        len(new_data)
+    )
+    read_data = read_data.loc[
+        list(read_data.index[is_known]) + list(new_data.index)
+    ].reset_index(drop=True)
+
+    # The manifest keeps the stored hash unless the file was read again
+    updated_manifest = compared_files[
+        ["File_Path", "File_Size", "File_Mtime", "Content_Hash", "Transcript_ID"]
+    ].set_index("File_Path")
+    read_manifest = read_data.set_index("File_Path")
+    updated_manifest.loc[read_manifest.index, "Content_Hash"] = read_manifest[
+        "Content_Hash"
+    ]
+    updated_manifest.loc[read_manifest.index, "Transcript_ID"] = read_manifest[
+        "Transcript_ID"
+    ]
+    updated_manifest = updated_manifest.reset_index()[TRANSCRIPT_MANIFEST_COLUMNS]
+    updated_manifest["Transcript_ID"] = updated_manifest["Transcript_ID"].astype(int)
+    updated_manifest.attrs["Next_Transcript_ID"] = next_transcript_id + len(new_data)
+
+    return read_data, updated_manifest
+
+
+def _get_next_transcript_id(manifest):
+    """Return the first Transcript_ID that was never given out. Manifests of older
+    runs without the high-water mark continue after their largest ID."""
+    largest_transcript_id = (
+        int(manifest["Transcript_ID"].max()) if len(manifest) > 0 else -1
+    )
+
+    return max(manifest.attrs.get("Next_Transcript_ID", 0), largest_transcript_id + 1)
+
+
+def extract_data_and_content_hash_from_files(
+    file_paths, n_workers=1, keep_transcript=True
+):
+    """This function reads the transcript files like extract_data_from_files and adds
+    the SHA-256 hash of each transcript text under the key Content_Hash. Without
+    keep_transcript, the text is dropped as soon as it is hashed."""
+    extract_function = functools.partial(
+        _extract_data_and_content_hash_from_file, keep_transcript=keep_transcript
+    )
+
+    if n_workers <= 1:
+        return [extract_function(path) for path in file_paths]
+
+    chunk_size = max(1, len(file_paths) // (n_workers * 4))
+
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        return list(executor.map(extract_function, file_paths, chunksize=chunk_size))
+
+
+def _extract_data_and_content_hash_from_file(file_path, keep_transcript=True):
+    """Read one transcript file and hash its text."""
+    data = extract_data_from_file(file_path)
+    data["Content_Hash"] = hashlib.sha256(
+        data["Transcript"].encode("utf-8")
+    ).hexdigest()
+
+    if not keep_transcript:
+        del data["Transcript"]
+
+    return data
+
+
+def create_transcript_file_index(root_transcript_directory, n_workers=1, manifest=None):
+    """This function creates an index of all transcript files without reading them.
+
+    The date and company are parsed from the file names. With the manifest of
+    update_transcript_dataframe_incrementally, every file gets its Transcript_ID
+    from the manifest and the files are sorted by date and Transcript_ID like
+    df_transcripts_raw. Without a manifest, the files are sorted by date and
+    numbered in the same way as in combine_all_transcripts_into_dataframe, which
+    only gives the IDs of df_transcripts_raw if it was built in one run.
+
+    Args: root_transcript_directory: Path to the root directory of the transcripts
+        n_workers (int): Number of processes used to scan the directories
+        manifest (pd.DataFrame): Manifest of df_transcripts_raw or None
+
+    Returns: pd.DataFrame
+        columns: File_Path (str): Path to the transcript file
+                Date (datetime.date): Date of the earnings call
+                Company (str): Name of the company as ticker symbol
+                Transcript_ID (int): ID of the transcript
+
+    Raises: ValueError: If a file is not in the manifest
+
+    """
+    file_paths = [
+        file_record["File_Path"]
+        for file_record in find_all_transcript_files(
+            root_transcript_directory, n_workers
+        )
+    ]
+
+    file_index = pd.DataFrame(
+        [
+            extract_date_and_company_from_file_name(file_path)
+            for file_path in file_paths
+        ],
+        columns=["Date", "Company"],
+    )
+    file_index.insert(0, "File_Path", file_paths)
+
+    if manifest is None:
+        file_index = file_index.sort_values(by="Date").reset_index(drop=True)
+        file_index["Transcript_ID"] = file_index.index
+
+        return file_index
+
+    transcript_ids = dict(zip(manifest["File_Path"], manifest["Transcript_ID"]))
+    relative_paths = [
+        os.path.relpath(file_path, root_transcript_directory)
+        for file_path in file_paths
+    ]
+    missing_paths = [path for path in relative_paths if path not in transcript_ids]
+    if missing_paths:
+        raise ValueError(
+            f"{len(missing_paths)} transcript files are not in the manifest, e.g. "
+            f"{missing_paths[0]}. Update df_transcripts_raw first."
+        )
+
+    file_index["Transcript_ID"] = [int(transcript_ids[path]) for path in relative_paths]
+
+    return file_index.sort_values(by=["Date", "Transcript_ID"]).reset_index(drop=True)
+
+
+def stream_preprocessed_transcripts(file_index, keep_raw_transcript=False, cache=None):
+    """This generator reads and preprocesses one transcript file at a time.
+
+    Args: file_index (pd.DataFrame): File index as created by create_transcript_file_index
+        keep_raw_transcript (bool): Whether to also yield the raw text
+        cache (PreprocessedTranscriptCache): Cache of preprocessed transcripts or None
+
+    Yields: dict: One transcript with the columns of df_transcripts_clean_step_1
+        keys: Date, Company, (Raw_Transcript), Preprocessed_Transcript_Step_1, Transcript_ID
+
+    """
+    for file_path, transcript_id in zip(
+        file_index["File_Path"], file_index["Transcript_ID"]
+    ):
+        data = extract_data_from_file(file_path)
+
+        record = {"Date": pd.Timestamp(data["Date"]), "Company": data["Company"]}
+        if keep_raw_transcript:
+            record["Raw_Transcript"] = data["Transcript"]
+        preprocessed_transcript = None
+        if cache is not None:
+            preprocessed_transcript = cache.get(data["Transcript"])
+        if preprocessed_transcript is None:
+            preprocessed_transcript = normalise_transcript_text(data["Transcript"])
+            if cache is not None:
+                cache.put(data["Transcript"], preprocessed_transcript)
+        record["Preprocessed_Transcript_Step_1"] = preprocessed_transcript
+        record["Transcript_ID"] = transcript_id
+
+        yield record
+
+
+def write_transcripts_in_chunks(transcript_records, dataset_directory, chunk_size=1000):
+    """This function consumes a stream of transcript records and writes them to a
+    Parquet dataset in chunks, so at most chunk_size transcripts are held in memory.
+
+    Every chunk is written as its own file into the year directories of the dataset
+    (see transcript_storage.write_transcript_dataset). An existing dataset in the
+    directory is replaced.
+
+    Args: transcript_records (iterable): Dictionaries with a Date key, e.g. from stream_preprocessed_transcripts
+        dataset_directory (str or Path): Root directory of the dataset
+        chunk_size (int): Number of transcripts per chunk
+
+    Returns: int: Number of transcripts written
+
+    """
+    if os.path.exists(dataset_directory):
+        shutil.rmtree(dataset_directory)
+
+    number_of_transcripts = 0
+    chunk_number = 0
+    chunk = []
+
+    for record in transcript_records:
+        chunk.append(record)
+
+        if len(chunk) == chunk_size:
+            _write_transcript_chunk(chunk, dataset_directory, chunk_number)
+            number_of_transcripts += len(chunk)
+            chunk_number += 1
+            chunk = []
+
+    if chunk or chunk_number == 0:
+        _write_transcript_chunk(chunk, dataset_directory, chunk_number)
+        number_of_transcripts += len(chunk)
+
+    return number_of_transcripts
+
+
+def _write_transcript_chunk(chunk, dataset_directory, chunk_number):
+    """Append one chunk of transcript records to the dataset."""
+    write_transcript_dataset(
+        pd.DataFrame(chunk, columns=list(chunk[0]) if chunk else ["Date"]),
+        dataset_directory,
+        part_name=f"part-{chunk_number:06d}",
+        mode="append",
+    )
+    print(f"Wrote chunk {chunk_number} with {len(chunk)} transcripts")
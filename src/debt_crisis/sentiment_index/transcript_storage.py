@@ -0,0 +1,167 @@
+"""Columnar storage of the transcript tables.
+
+The transcript tables are stored as Parquet datasets with one directory per year
+(``Year=2004/part-0.parquet``). Readers can load a subset of the columns and skip
+all years outside of a date range without touching the transcript texts.
+
+"""
+import os
+import shutil
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+PARTITION_COLUMN = "Year"
+
+DATASET_METADATA_FILE = "_common_metadata"
+
+
+def write_transcript_dataset(
+    data, dataset_directory, part_name="part-0", mode="overwrite"
+):
+    """This function writes a transcript dataframe to a Parquet dataset partitioned
+    by the year of the Date column.
+
+    Args:
+        data (pd.DataFrame): Transcript dataframe with a Date column, e.g. df_transcripts_raw
+        dataset_directory (str or Path): Root directory of the dataset
+        part_name (str): Name of the file written into each year directory
+        mode (str): "overwrite" removes an existing dataset first, "append" adds the
+            files to the existing year directories
+
+    Returns:
+        pathlib.Path or str: Path to the metadata file of the dataset. The file holds
+            the schema and is used as the product of the tasks writing the dataset.
+
+    """
+    if mode not in ("overwrite", "append"):
+        raise ValueError(f"Unknown mode {mode}. Use 'overwrite' or 'append'.")
+
+    if mode == "overwrite" and os.path.exists(dataset_directory):
+        shutil.rmtree(dataset_directory)
+
+    os.makedirs(dataset_directory, exist_ok=True)
+
+    years = pd.to_datetime(data["Date"]).dt.year
+
+    schema = None
+    for year, year_data in data.groupby(years, sort=True):
+        year_directory = os.path.join(dataset_directory, f"{PARTITION_COLUMN}={year}")
+        os.makedirs(year_directory, exist_ok=True)
+
+        table = pa.Table.from_pandas(year_data, preserve_index=False)
+        pq.write_table(table, os.path.join(year_directory, f"{part_name}.parquet"))
+        schema = table.schema
+
+    if schema is None:
+        schema = pa.Schema.from_pandas(data, preserve_index=False)
+
+    metadata_path = os.path.join(dataset_directory, DATASET_METADATA_FILE)
+    pq.write_metadata(schema, metadata_path)
+
+    return metadata_path
+
+
+def read_transcript_dataset(
+    dataset_directory, columns=None, start_date=None, end_date=None
+):
+    """This function reads a transcript dataset written by write_transcript_dataset.
+
+    Only the requested columns are read. Year directories outside of the date range
+    are skipped entirely and the remaining files are filtered on the Date column while
+    reading, so the transcript texts of other years are never loaded.
+
+    Args:
+        dataset_directory (str or Path): Root directory of the dataset
+        columns (list): Columns to load. None loads all columns.
+        start_date (str or pd.Timestamp): First date to keep (inclusive) or None
+        end_date (str or pd.Timestamp): Last date to keep (inclusive) or None
+
+    Returns:
+        pd.DataFrame: Transcript data in the order in which it was written
+
+    """
+    dataset = ds.dataset(
+        dataset_directory,
+        format="parquet",
+        partitioning="hive",
+        exclude_invalid_files=True,
+    )
+
+    partition_filter = None
+    row_filter = None
+    date_type = dataset.schema.field("Date").type
+
+    if start_date is not None:
+        start_date = pd.Timestamp(start_date)
+        partition_filter = _combine_filters(
+            partition_filter, ds.field(PARTITION_COLUMN) >= start_date.year
+        )
+        row_filter = _combine_filters(
+            row_filter,
+            ds.field("Date") >= _convert_to_arrow_scalar(start_date, date_type),
+        )
+
+    if end_date is not None:
+        end_date = pd.Timestamp(end_date)
+        partition_filter = _combine_filters(
+            partition_filter, ds.field(PARTITION_COLUMN) <= end_date.year
+        )
+        row_filter = _combine_filters(
+            row_filter,
+            ds.field("Date") <= _convert_to_arrow_scalar(end_date, date_type),
+        )
+
+    if columns is None:
+        columns = [name for name in dataset.schema.names if name != PARTITION_COLUMN]
+
+    # Read the year files one by one and in order to keep the row order of the input
+    fragments = sorted(
+        dataset.get_fragments(filter=partition_filter), key=lambda f: f.path
+    )
+    tables = [
+        fragment.to_table(columns=columns, filter=row_filter) for fragment in fragments
+    ]
+
+    if not tables:
+        schema = pa.schema([dataset.schema.field(name) for name in columns])
+        return schema.empty_table().to_pandas()
+
+    return pa.concat_tables(tables).to_pandas()
+
+
+def migrate_transcript_pickle_to_dataset(pickle_path, dataset_directory):
+    """This function converts one of the pickled transcript tables of older builds
+    (df_transcripts_raw.pkl or df_transcripts_clean_step_1.pkl) into a Parquet
+    dataset. It is not part of the pipeline, which writes the datasets directly, and
+    only needs to run once on a build directory from before the datasets.
+
+    Args:
+        pickle_path (str or Path): Path to the pickled dataframe
+        dataset_directory (str or Path): Root directory of the new dataset
+
+    Returns:
+        pathlib.Path or str: Path to the metadata file of the dataset
+
+    """
+    data = pd.read_pickle(pickle_path)
+
+    return write_transcript_dataset(data, dataset_directory)
+
+
+def _combine_filters(existing_filter, new_filter):
+    """Combine two dataset expressions with a logical and."""
+    if existing_filter is None:
+        return new_filter
+
+    return existing_filter & new_filter
+
+
+def _convert_to_arrow_scalar(timestamp, arrow_type):
+    """Convert a timestamp to a scalar that can be compared with the Date column."""
+    if pa.types.is_date(arrow_type):
+        return pa.scalar(timestamp.date(), type=arrow_type)
+
+    return pa.scalar(timestamp, type=arrow_type)
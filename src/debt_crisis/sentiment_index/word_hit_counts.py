@@ -0,0 +1,227 @@
+"""Word hit counts of the dictionary sentiment index, broken down by country and year.
+
+Instead of incrementing one shared word_count_dict, every scorer call returns its
+own partial counts as a collections.Counter with (Country, Year, Word) keys. Adding
+Counters is associative and commutative, so partial counts of transcripts, chunks
+or processes can be merged in any grouping and give the same totals as a serial run.
+
+"""
+import functools
+from collections import Counter
+
+import pandas as pd
+import regex as re
+
+from debt_crisis.sentiment_index.clean_sentiment_data import (
+    _calculate_sentiment_around_country_mentions,
+    calculate_window_sentiment_with_prefix_sums,
+    create_word_sentiment_scores,
+    find_country_indices,
+    process_transcripts_in_chunks,
+)
+
+
+def create_sentiment_index_and_word_hits_for_one_transcript(
+    transcript,
+    year,
+    lookup_dict,
+    words_environment,
+    countries,
+    alias_index,
+    calculation_method="negative_and_positive",
+):
+    """This function calculates the sentiment index of every country in a transcript
+    and returns the words that were counted instead of adding them to a shared
+    dictionary.
+
+    Args:
+        transcript (str): Preprocessed transcript
+        year (int): Year of the transcript, used as part of the count keys
+        lookup_dict (dict): Dictionary with words as keys and sentiment values as values
+        words_environment (int): number of words before and after the country to consider
+        countries (list): Countries to consider
+        alias_index (dict): Alias index as created by create_country_alias_index
+        calculation_method (str): "negative_and_positive" or "only_negatives"
+
+    Returns:
+        tuple: (dict, Counter) The sentiment index of every country and the word hits
+            with (Country, Year, Word) keys
+
+    """
+    transcript_words = re.findall(r"\b\w+\b", transcript.lower())
+    country_indices = find_country_indices(transcript_words, alias_index, countries)
+    word_scores = create_word_sentiment_scores(
+        transcript_words, lookup_dict, calculation_method
+    )
+
+    country_counts = {country: Counter() for country in country_indices}
+
+    # Scores that are not integers cannot be summed exactly with prefix sums. The
+    # prefix sums are calculated once for all countries of the transcript.
+    if word_scores["Values"].dtype.kind in "iub":
+        sentiment_indices = calculate_window_sentiment_with_prefix_sums(
+            word_scores,
+            transcript_words,
+            country_indices,
+            words_environment,
+            country_counts,
+            len(transcript),
+            count_words_by_country=True,
+        )
+    else:
+        sentiment_indices = {
+            country: _calculate_sentiment_around_country_mentions(
+                transcript_words,
+                indices,
+                lookup_dict,
+                words_environment,
+                country_counts[country],
+                calculation_method,
+                len(transcript),
+            )
+            for country, indices in country_indices.items()
+        }
+
+    word_hits = Counter(
+        {
+            (country, year, word): count
+            for country, counts in country_counts.items()
+            for word, count in counts.items()
+        }
+    )
+
+    return sentiment_indices, word_hits
+
+
+def merge_word_hit_counts(partial_counts):
+    """Merge partial word hit counts into one Counter.
+
+    The merge is an associative reduce, so the result does not depend on how the
+    transcripts were split into chunks or in which order the chunks finished.
+
+    Args:
+        partial_counts (iterable): Counters with (Country, Year, Word) keys
+
+    Returns:
+        Counter: Sum of all partial counts
+
+    """
+    return functools.reduce(_add_word_hit_counts, partial_counts, Counter())
+
+
+def _add_word_hit_counts(total_counts, partial_counts):
+    """Add partial counts to the running total."""
+    total_counts.update(partial_counts)
+    return total_counts
+
+
+def create_sentiment_index_columns_with_word_hit_counts(
+    transcripts,
+    years,
+    lookup_dict,
+    words_environment,
+    countries,
+    alias_index,
+    calculation_method="negative_and_positive",
+    n_workers=1,
+    chunk_size=500,
+    progress_interval_seconds=30,
+):
+    """This function scores a column of transcripts for all countries and collects
+    the word hits by country and year. The transcripts are scored in chunks with
+    process_transcripts_in_chunks, across a process pool with more than one worker,
+    and the partial counts of the chunks are merged with merge_word_hit_counts. The
+    output is the same in both modes.
+
+    Args:
+        transcripts (pd.Series): Preprocessed transcripts (Preprocessed_Transcript_Step_1)
+        years (iterable): Year of every transcript
+        lookup_dict (dict): Dictionary with words as keys and sentiment values as values
+        words_environment (int): number of words before and after the country to consider
+        countries (list): Countries to consider
+        alias_index (dict): Alias index as created by create_country_alias_index
+        calculation_method (str): "negative_and_positive" or "only_negatives"
+        n_workers (int): Number of processes. 1 scores the transcripts in the main process.
+        chunk_size (int): Number of transcripts sent to a worker at once
+        progress_interval_seconds (float): Minimum time between two progress messages
+
+    Returns:
+        tuple: (pd.DataFrame, Counter) One column Sentiment_Index_McDonald_{country}
+            per country and the word hits with (Country, Year, Word) keys
+
+    """
+    score_chunk = functools.partial(
+        _score_transcript_chunk,
+        lookup_dict=lookup_dict,
+        words_environment=words_environment,
+        countries=countries,
+        alias_index=alias_index,
+        calculation_method=calculation_method,
+    )
+
+    scores = []
+    partial_counts = []
+
+    for chunk_scores, chunk_counts in process_transcripts_in_chunks(
+        score_chunk,
+        list(zip(transcripts.tolist(), years)),
+        n_workers,
+        chunk_size,
+        progress_interval_seconds,
+    ):
+        scores.extend(chunk_scores)
+        partial_counts.append(chunk_counts)
+
+    sentiment_index_columns = pd.DataFrame(
+        scores, index=transcripts.index, columns=countries
+    ).rename(columns=lambda country: f"Sentiment_Index_McDonald_{country}")
+
+    return sentiment_index_columns, merge_word_hit_counts(partial_counts)
+
+
+def _score_transcript_chunk(
+    chunk, lookup_dict, words_environment, countries, alias_index, calculation_method
+):
+    """Score a chunk of transcripts and return its scores and partial word hits."""
+    chunk_scores = []
+    chunk_counts = Counter()
+
+    for transcript, year in chunk:
+        (
+            sentiment_indices,
+            word_hits,
+        ) = create_sentiment_index_and_word_hits_for_one_transcript(
+            transcript,
+            year,
+            lookup_dict,
+            words_environment,
+            countries,
+            alias_index,
+            calculation_method,
+        )
+        chunk_scores.append(sentiment_indices)
+        chunk_counts.update(word_hits)
+
+    return chunk_scores, chunk_counts
+
+
+def word_hit_counts_to_dataframe(word_hits):
+    """Return the word hits as a dataframe with the columns Country, Year, Word and
+    Count, sorted by Country, Year and Word."""
+    word_hit_data = pd.DataFrame(
+        [(*key, count) for key, count in word_hits.items()],
+        columns=["Country", "Year", "Word", "Count"],
+    )
+    return word_hit_data.sort_values(by=["Country", "Year", "Word"]).reset_index(
+        drop=True
+    )
+
+
+def word_hit_counts_to_word_count_dict(word_hits, lookup_dict):
+    """Sum the word hits over countries and years into a dictionary with every word of
+    the lookup dictionary, as filled by the scorers with a shared word_count_dict."""
+    word_count_dict = {word: 0 for word in lookup_dict}
+    for (_, _, word), count in word_hits.items():
+        word_count_dict[word] += count
+
+    return word_count_dict
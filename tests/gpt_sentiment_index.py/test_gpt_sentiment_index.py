@@ -1,7 +1,11 @@
 from debt_crisis.gpt_sentiment_index.gpt_index_analysis import (
     calculate_gpt_sentiment_index,
+    calculate_gpt_sentiment_index_for_all_countries,
+    calculate_gpt_sentiment_index_for_multiple_windows,
+    clean_llm_output_data,
 )
 
+from debt_crisis.gpt_sentiment_index.gpt_sentiment_index import create_snippet_keys
 from debt_crisis.sentiment_index.clean_sentiment_data import preprocess_transcript_text
 
 import pytest
@@ -629,3 +633,341 @@ Copyright 2019 Thomson Reuters. All Rights Reserved.
 #     text = "hello world, hello again"
 #     expected_output = [0, 6, 13]
 #     assert get_index_where_words_occur(set_of_words, text) == expected_output
+
+
+def test_snippets_from_country_mention_index_match_full_scan():
+    from debt_crisis.gpt_sentiment_index.gpt_sentiment_index import (
+        extract_gpt_training_dataset_from_country_mention_index,
+        extract_gpt_training_dataset_from_preprocessed_transcripts,
+    )
+    from debt_crisis.sentiment_index.country_mention_index import (
+        create_country_mention_index,
+    )
+
+    transcripts_data = pd.DataFrame(
+        {
+            "Transcript_ID": [1, 2, 3],
+            "Preprocessed_Transcript_Step_1": [
+                "our swiss business grew while belgium was weak " * 20,
+                "nothing to see here",
+                "belgium " + "and more words " * 50 + "belgium",
+            ],
+        }
+    )
+    country_names_set = {"swiss", "belgium"}
+    alias_index = {"swiss": ("switzerland",), "belgium": ("belgium",)}
+
+    expected_output = pd.concat(
+        [
+            extract_gpt_training_dataset_from_preprocessed_transcripts(
+                row, country_names_set, context=60
+            )
+            for _, row in transcripts_data.iterrows()
+        ]
+    )
+    actual_output = extract_gpt_training_dataset_from_country_mention_index(
+        transcripts_data,
+        create_country_mention_index(
+            transcripts_data["Preprocessed_Transcript_Step_1"],
+            transcripts_data["Transcript_ID"],
+            alias_index,
+        ),
+        country_names_set,
+        alias_index,
+        context=60,
+    )
+
+    def _sorted(data):
+        return data.sort_values(by=["Transcript_ID", "Keyword", "Snippet"]).reset_index(
+            drop=True
+        )
+
+    assert len(actual_output) == 42
+    pd.testing.assert_frame_equal(
+        _sorted(actual_output), _sorted(expected_output), check_dtype=False
+    )
+
+
+def test_gpt_sentiment_index_for_all_countries_matches_loop():
+    rng = np.random.default_rng(1)
+    number_of_snippets = 300
+    gpt_data = pd.DataFrame(
+        {
+            "Date": pd.to_datetime("2002-09-01")
+            + pd.to_timedelta(rng.integers(0, 7600, number_of_snippets), unit="D"),
+            "Country": rng.choice(["greece", "italy", "spain"], number_of_snippets),
+            "Prediction": rng.integers(-2, 3, number_of_snippets),
+        }
+    )
+    gpt_data_copy = gpt_data.copy()
+
+    actual_output = calculate_gpt_sentiment_index_for_all_countries(
+        gpt_data, countries=["spain", "greece", "portugal"]
+    )
+    pd.testing.assert_frame_equal(gpt_data, gpt_data_copy)
+
+    expected_output = pd.concat(
+        [
+            calculate_gpt_sentiment_index(
+                gpt_data[gpt_data["Country"] == country].copy(),
+                country,
+                rolling_engine="loop",
+            )
+            for country in ["spain", "greece", "portugal"]
+        ],
+        ignore_index=True,
+    )
+
+    pd.testing.assert_frame_equal(actual_output, expected_output, check_dtype=False)
+    pd.testing.assert_frame_equal(
+        calculate_gpt_sentiment_index(
+            gpt_data[gpt_data["Country"] == "italy"], "italy"
+        ),
+        calculate_gpt_sentiment_index(
+            gpt_data[gpt_data["Country"] == "italy"].copy(),
+            "italy",
+            rolling_engine="loop",
+        ),
+        check_dtype=False,
+    )
+    assert (
+        actual_output.loc[actual_output["Country"] == "portugal", "Sentiment_GPT"]
+        .isna()
+        .all()
+    )
+
+
+def test_gpt_sentiment_index_for_multiple_windows_matches_single_window():
+    rng = np.random.default_rng(2)
+    gpt_data = pd.DataFrame(
+        {
+            "Date": pd.to_datetime("2008-01-01")
+            + pd.to_timedelta(rng.integers(0, 2000, 150), unit="D"),
+            "Country": rng.choice(["greece", "italy"], 150),
+            "Prediction": rng.integers(-2, 3, 150),
+        }
+    )
+
+    long_data = calculate_gpt_sentiment_index_for_multiple_windows(
+        gpt_data, day_windows=[30, 90], half_lives=[45]
+    )
+    trailing_90 = long_data[
+        (long_data["Weighting"] == "trailing_mean") & (long_data["Window_Days"] == 90)
+    ]
+
+    assert set(long_data["Weighting"]) == {"trailing_mean", "exponential_decay"}
+    pd.testing.assert_frame_equal(
+        trailing_90[["Date", "Country", "Sentiment_GPT"]].reset_index(drop=True),
+        calculate_gpt_sentiment_index_for_all_countries(gpt_data),
+    )
+
+
+def test_extract_gpt_training_dataset_matches_row_by_row_extraction(tmp_path):
+    from debt_crisis.gpt_sentiment_index.gpt_sentiment_index import (
+        extract_gpt_training_dataset,
+        extract_gpt_training_dataset_from_preprocessed_transcripts,
+    )
+
+    transcripts_data = pd.DataFrame(
+        {
+            "Transcript_ID": [1, 2, 3],
+            "Preprocessed_Transcript_Step_1": [
+                "our swiss business grew while belgium was weak " * 20,
+                "nothing to see here",
+                "belgium " + "and more words " * 50 + "belgium",
+            ],
+        }
+    )
+    country_names_set = {"swiss", "belgium"}
+
+    expected_output = pd.concat(
+        [
+            extract_gpt_training_dataset_from_preprocessed_transcripts(
+                row, country_names_set, context=60
+            )
+            for _, row in transcripts_data.iterrows()
+        ],
+        ignore_index=True,
+    )
+    actual_output = extract_gpt_training_dataset(
+        transcripts_data,
+        country_names_set,
+        context=60,
+        output_path=tmp_path / "snippets.parquet",
+    )
+
+    assert len(actual_output) == 42
+    assert actual_output["Keyword"].iloc[:2].tolist() == ["swiss", "belgium"]
+    pd.testing.assert_frame_equal(actual_output, expected_output, check_dtype=False)
+    pd.testing.assert_frame_equal(
+        pd.read_parquet(tmp_path / "snippets.parquet"),
+        actual_output,
+        check_dtype=False,
+    )
+
+
+def test_find_keyword_offsets_prefers_longest_keyword():
+    from debt_crisis.gpt_sentiment_index.gpt_sentiment_index import (
+        find_keyword_offsets,
+    )
+
+    text = "the czech republic and the czech crown, slovak\nrepublic and czechia"
+    keywords = {"czech", "czech republic", "slovak republic", "czechia", "republic"}
+
+    assert find_keyword_offsets(text, keywords) == [
+        ("czech republic", 4),
+        ("czech", 27),
+        ("slovak republic", 40),
+        ("czechia", 60),
+    ]
+    assert find_keyword_offsets(text, set()) == []
+
+
+def test_random_text_snippet_uses_first_mention_of_keyword():
+    from debt_crisis.gpt_sentiment_index.gpt_sentiment_index import (
+        get_a_text_snippet_if_there_is_country_mentioned,
+    )
+
+    full_data = pd.DataFrame(
+        {
+            "Transcript_ID": [7],
+            "Preprocessed_Transcript_Step_1": [
+                "one two (czech republic) three four czech republic five"
+            ],
+        }
+    )
+
+    result = get_a_text_snippet_if_there_is_country_mentioned(
+        full_data, {"czech republic"}, context=1
+    )
+
+    assert result["Keyword"].iloc[0] == "czech republic"
+    assert result["Snippet"].iloc[0] == ["two", "(czech"]
+    assert (
+        get_a_text_snippet_if_there_is_country_mentioned(full_data, {"spain"}) is None
+    )
+
+
+def test_extract_gpt_training_dataset_merges_overlapping_snippets(capsys):
+    from debt_crisis.gpt_sentiment_index.gpt_sentiment_index import (
+        extract_gpt_training_dataset,
+    )
+
+    filler = "x" * 100
+    transcripts_data = pd.DataFrame(
+        {
+            "Transcript_ID": [1, 2],
+            "Preprocessed_Transcript_Step_1": [
+                f"greece and greek debt {filler} italy {filler} greece",
+                "nothing to see here",
+            ],
+        }
+    )
+
+    output = extract_gpt_training_dataset(
+        transcripts_data,
+        {"greece", "greek", "italy"},
+        context=20,
+        merge_overlapping_snippets=True,
+        mapping_country_names_to_country={"greek": "greece"},
+    )
+
+    assert output["Country"].tolist() == ["greece", "italy", "greece"]
+    assert output["Keyword"].tolist() == ["greece", "italy", "greece"]
+    assert output["Source_Offsets"].tolist() == [[0, 11], [123], [230]]
+    assert output["Snippet"].iloc[0] == transcripts_data.iloc[0, 1][:31]
+    assert "Merged 4 keyword hits into 3 snippets: 1 fewer LLM calls" in (
+        capsys.readouterr().out
+    )
+
+
+def test_clean_llm_output_data_matches_scored_snippets_by_snippet_key():
+    training_data = pd.DataFrame(
+        {
+            "Keyword": ["greece", "greek", "italy"],
+            "Transcript_ID": [1, 2, 2],
+            "Snippet": ["new snippet", "greek growth", "italy"],
+            "Country": ["greece", "greece", "italy"],
+            "Snippet_ID": [1, 2, 3],
+        }
+    )
+    # Scored before the new snippet shifted the Snippet_IDs
+    llm_output_data = pd.DataFrame(
+        {
+            "Snippet_ID": [1, 2],
+            "Excerpt": ["greek growth", "italy"],
+            "Prediction": [1, 0],
+            "Rationale_for_Prediction": ["", ""],
+            "Snippet_Key": create_snippet_keys(training_data.iloc[1:]).tolist(),
+        }
+    )
+    raw_transcript_data = pd.DataFrame(
+        {"Transcript_ID": [1, 2], "Date": pd.to_datetime(["2020-01-01", "2020-01-02"])}
+    )
+
+    full_data = clean_llm_output_data(
+        llm_output_data, raw_transcript_data, training_data
+    )
+
+    assert full_data["Snippet_ID"].tolist() == [2, 3]
+    assert full_data["Transcript_ID"].tolist() == [2, 2]
+
+
+@pytest.mark.parametrize("merge_overlapping_snippets", [False, True])
+def test_gpt_training_dataset_from_country_mention_index_equals_full_scan(
+    merge_overlapping_snippets,
+):
+    from debt_crisis.gpt_sentiment_index.gpt_sentiment_index import (
+        extract_gpt_training_dataset,
+        extract_gpt_training_dataset_from_country_mention_index,
+    )
+    from debt_crisis.sentiment_index.country_mention_index import (
+        create_country_mention_index,
+    )
+
+    transcripts_data = pd.DataFrame(
+        {
+            "Transcript_ID": [4, 1, 7, 2],
+            "Preprocessed_Transcript_Step_1": [
+                "greek banks and greece were weak while the greek state " * 5,
+                "nothing to see here",
+                "the czech republic grew, unlike the italian economy",
+                "exports to the faroe islands rose",
+            ],
+        }
+    )
+    # "faroe islands" has no word in the alias index, so it is not in the mention
+    # index and has to be found by a search
+    country_names_set = {"greece", "greek", "czech republic", "faroe islands"}
+    mapping = {"greek": "greece"}
+    alias_index = {
+        "greece": ("greece",),
+        "greek": ("greece",),
+        "czech": ("czechia",),
+        "italian": ("italy",),
+    }
+    mention_index = create_country_mention_index(
+        transcripts_data["Preprocessed_Transcript_Step_1"],
+        transcripts_data["Transcript_ID"],
+        alias_index,
+    )
+
+    expected_output = extract_gpt_training_dataset(
+        transcripts_data,
+        country_names_set,
+        context=40,
+        merge_overlapping_snippets=merge_overlapping_snippets,
+        mapping_country_names_to_country=mapping,
+    )
+    actual_output = extract_gpt_training_dataset_from_country_mention_index(
+        transcripts_data,
+        mention_index,
+        country_names_set,
+        alias_index,
+        context=40,
+        merge_overlapping_snippets=merge_overlapping_snippets,
+        mapping_country_names_to_country=mapping,
+    )
+
+    assert set(actual_output["Transcript_ID"]) == {4, 7, 2}
+    pd.testing.assert_frame_equal(actual_output, expected_output)
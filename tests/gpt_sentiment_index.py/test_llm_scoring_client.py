@@ -0,0 +1,194 @@
+import asyncio
+import time
+
+import pandas as pd
+import pytest
+
+from debt_crisis.gpt_sentiment_index.llm_scoring_client import (
+    OUTPUT_COLUMNS,
+    JsonLinesScoringBackend,
+    JsonLinesStubServer,
+    LLMScoringError,
+    StubScoringBackend,
+    create_scoring_backend,
+    run_snippet_scoring,
+    score_snippet_with_word_list,
+    score_snippets,
+)
+
+
+@pytest.fixture
+def snippet_data():
+    excerpts = [
+        "strong growth and recovery in greece",
+        "the crisis and the default risk",
+        "nothing to report",
+    ]
+    return pd.DataFrame(
+        {
+            "Snippet_ID": range(1, 31),
+            "Transcript_ID": [number // 4 for number in range(30)],
+            "Snippet": [excerpts[number % 3] + f" {number}" for number in range(30)],
+            "Country": "greece",
+        }
+    )
+
+
+def test_stub_server_scores_all_snippets_in_output_schema(snippet_data, tmp_path):
+    output_path = tmp_path / "sentiment_data_greece_output.csv"
+
+    async def score_with_server():
+        async with JsonLinesStubServer() as server:
+            backend = JsonLinesScoringBackend(server.host, server.port)
+            return await score_snippets(
+                snippet_data, backend, output_path, batch_size=4, max_concurrency=3
+            )
+
+    summary = asyncio.run(score_with_server())
+    output = pd.read_csv(output_path).sort_values("Snippet_ID")
+
+    assert summary["Scored_Snippets"] == 30
+    assert summary["Failed_Snippets"] == 0
+    assert list(output.columns) == OUTPUT_COLUMNS
+    assert output["Snippet_ID"].tolist() == snippet_data["Snippet_ID"].tolist()
+    assert output["Excerpt"].tolist() == snippet_data["Snippet"].tolist()
+    assert output["Prediction"].tolist() == [
+        score_snippet_with_word_list(snippet)["Prediction"]
+        for snippet in snippet_data["Snippet"]
+    ]
+    assert output["Prediction"].iloc[:3].tolist() == [1, -1, 0]
+
+
+def test_failed_batches_are_retried(snippet_data, tmp_path):
+    backend = StubScoringBackend(failures_per_batch=2)
+
+    summary = run_snippet_scoring(
+        snippet_data,
+        backend,
+        tmp_path / "output.csv",
+        batch_size=10,
+        max_retries=2,
+        backoff_seconds=0,
+    )
+
+    assert summary["Scored_Snippets"] == 30
+    assert summary["Retries"] == 6
+    assert backend.number_of_requests == 9
+
+
+def test_failed_batches_are_sent_again_in_next_run(snippet_data, tmp_path):
+    output_path = tmp_path / "output.csv"
+
+    with pytest.raises(LLMScoringError, match="5 snippets could not be scored"):
+        run_snippet_scoring(
+            snippet_data,
+            StubScoringBackend(failing_snippet_ids={12}),
+            output_path,
+            batch_size=5,
+            max_retries=1,
+            backoff_seconds=0,
+        )
+    assert len(pd.read_csv(output_path)) == 25
+
+    # The snippets are extracted again with one new snippet in front, which shifts
+    # the Snippet_IDs
+    new_snippet = pd.DataFrame(
+        {"Transcript_ID": [99], "Snippet": ["a new snippet"], "Country": ["greece"]}
+    )
+    new_snippet_data = pd.concat(
+        [new_snippet, snippet_data.drop(columns="Snippet_ID")], ignore_index=True
+    )
+    new_snippet_data["Snippet_ID"] = new_snippet_data.index + 1
+
+    second_backend = StubScoringBackend()
+    second_summary = run_snippet_scoring(
+        new_snippet_data, second_backend, output_path, batch_size=10
+    )
+
+    assert second_summary["Scored_Snippets"] == 6
+    assert second_backend.number_of_requests == 1
+    output = pd.read_csv(output_path)
+    assert sorted(output["Excerpt"]) == sorted(new_snippet_data["Snippet"])
+
+
+def test_snippet_scoring_raises_if_all_batches_fail(snippet_data, tmp_path):
+    with pytest.raises(LLMScoringError, match="30 snippets could not be scored"):
+        run_snippet_scoring(
+            snippet_data,
+            StubScoringBackend(failures_per_batch=10),
+            tmp_path / "output.csv",
+            batch_size=10,
+            max_retries=1,
+            backoff_seconds=0,
+        )
+
+
+def test_concurrency_and_rate_are_limited(snippet_data, tmp_path):
+    backend = StubScoringBackend(delay_seconds=0.02)
+
+    start_time = time.perf_counter()
+    run_snippet_scoring(
+        snippet_data,
+        backend,
+        tmp_path / "output.csv",
+        batch_size=3,
+        max_concurrency=2,
+        requests_per_second=50,
+    )
+
+    # 10 requests spaced by 1 / 50 seconds
+    assert time.perf_counter() - start_time >= 0.18
+    assert backend.max_concurrent_requests == 2
+
+
+def test_stub_server_scores_large_batches(tmp_path):
+    snippet_data = pd.DataFrame(
+        {
+            "Snippet_ID": range(1, 101),
+            "Transcript_ID": 1,
+            "Snippet": ["growth " * 114 + f"{number:03d}" for number in range(100)],
+            "Country": "greece",
+        }
+    )
+    assert snippet_data["Snippet"].str.len().min() >= 800
+
+    async def score_with_server():
+        async with JsonLinesStubServer() as server:
+            backend = JsonLinesScoringBackend(server.host, server.port)
+            return await score_snippets(
+                snippet_data, backend, tmp_path / "output.csv", batch_size=100
+            )
+
+    summary = asyncio.run(score_with_server())
+
+    assert summary["Scored_Snippets"] == 100
+    assert summary["Failed_Snippets"] == 0
+
+
+def test_stub_server_answers_oversize_requests_with_error(snippet_data, tmp_path):
+    async def score_with_server():
+        async with JsonLinesStubServer(max_message_bytes=1000) as server:
+            backend = JsonLinesScoringBackend(server.host, server.port)
+            with pytest.raises(LLMScoringError, match="oversize request"):
+                await backend.score_batch(snippet_data.to_dict("records") * 10)
+
+            # The server keeps answering after an oversize request
+            return await backend.score_batch(snippet_data.to_dict("records")[:2])
+
+    results = asyncio.run(score_with_server())
+
+    assert [result["Prediction"] for result in results] == [1, -1]
+
+
+def test_create_scoring_backend_requires_a_configured_backend():
+    with pytest.raises(ValueError, match="No LLM scoring backend is set"):
+        create_scoring_backend(None)
+
+    with pytest.raises(ValueError, match="host:port"):
+        create_scoring_backend("localhost")
+
+    assert isinstance(create_scoring_backend("stub"), StubScoringBackend)
+
+    backend = create_scoring_backend("localhost:8000")
+    assert isinstance(backend, JsonLinesScoringBackend)
+    assert (backend.host, backend.port) == ("localhost", 8000)
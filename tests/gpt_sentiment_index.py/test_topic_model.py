@@ -0,0 +1,60 @@
+import subprocess
+import sys
+import types
+
+from debt_crisis.config import SRC
+from debt_crisis.gpt_sentiment_index.topic_model import (
+    get_finbert_tokenizer_and_model,
+)
+
+
+def test_importing_topic_model_does_not_load_transformers():
+    code = (
+        "import sys\n"
+        "import debt_crisis.gpt_sentiment_index.topic_model\n"
+        "assert 'transformers' not in sys.modules\n"
+        "assert 'torch' not in sys.modules\n"
+        "assert 'spacy' not in sys.modules\n"
+    )
+
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        env={"PYTHONPATH": str(SRC.parent)},
+        capture_output=True,
+        text=True,
+    )
+
+    assert result.returncode == 0, result.stderr
+
+
+def test_finbert_tokenizer_and_model_are_loaded_once(monkeypatch):
+    loaded_models = []
+
+    class FakeBertModel:
+        @classmethod
+        def from_pretrained(cls, model_name):
+            loaded_models.append(model_name)
+            return cls()
+
+        def eval(self):
+            return self
+
+    class FakeBertTokenizer:
+        @classmethod
+        def from_pretrained(cls, model_name):
+            return cls()
+
+    fake_transformers = types.ModuleType("transformers")
+    fake_transformers.BertModel = FakeBertModel
+    fake_transformers.BertTokenizer = FakeBertTokenizer
+    monkeypatch.setitem(sys.modules, "transformers", fake_transformers)
+    get_finbert_tokenizer_and_model.cache_clear()
+
+    try:
+        first = get_finbert_tokenizer_and_model("test/finbert")
+        second = get_finbert_tokenizer_and_model("test/finbert")
+    finally:
+        get_finbert_tokenizer_and_model.cache_clear()
+
+    assert first is second
+    assert loaded_models == ["test/finbert"]
@@ -0,0 +1,27 @@
+import pytest
+
+
+@pytest.fixture
+def transcript_directory(tmp_path):
+    file_names = {
+        "2004": [
+            "2004-Apr-06-BALN.S-139342690605-transcript.txt",
+            "2004-Apr-06-AAPL.OQ-139342690606-transcript.txt",
+            "2004-Jan-12-SIEGn.DE-139342690607-transcript.txt",
+        ],
+        "2003": [
+            "2003-Dec-01-BAYG.DE-139342690608-transcript.txt",
+            "2003-Feb-20-ALVG.DE-139342690609-transcript.txt",
+        ],
+        "2005": ["2005-Mar-03-BNPP.PA-139342690610-transcript.txt", "notes.csv"],
+    }
+
+    for year, files in file_names.items():
+        year_directory = tmp_path / year
+        year_directory.mkdir()
+        for file_name in files:
+            (year_directory / file_name).write_text(
+                f"Transcript of {file_name}", encoding="utf-8"
+            )
+
+    return tmp_path
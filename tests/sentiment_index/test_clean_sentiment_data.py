@@ -1,23 +1,38 @@
 import pandas as pd
 
+import os
+import random
+from collections import Counter
 import re
 
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 import pytest
+import spacy
 
 
 from src.debt_crisis.sentiment_index.clean_sentiment_data import (
     extract_date_from_transcript,
-    extract_data_from_file,
     preprocess_transcript_text,
     tokenize_text_and_remove_non_alphabetic_characters_and_stop_words,
     clean_transcript_data_df,
     create_sentiment_dictionary_for_lookups,
     create_country_sentiment_index_for_one_transcript,
+    create_sentiment_index_for_all_countries_in_one_transcript,
+    create_sentiment_index_columns_for_window_sizes,
     get_country_appearance_index_from_transcript_text,
+    create_word_count_dictionary,
+    create_country_alias_index,
+    create_word_sentiment_scores,
+    calculate_window_sentiment_with_prefix_sums,
     calculate_loughlan_mcdonald_sentiment_index,
+    normalise_transcript_text,
+)
+from src.debt_crisis.sentiment_index.transcript_ingestion import (
+    extract_data_from_file,
+    combine_all_transcripts_into_dataframe,
+    update_transcript_dataframe_incrementally,
 )
 
 from src.debt_crisis.config import SRC, NLP_MODEL
@@ -633,6 +648,25 @@ def test_tokenize_text_and_remove_stop_words_and_non_alphabetic_characters(
     assert expected_output == actual_output
 
 
+def test_tokenize_with_tokenizer_only_matches_full_pipeline():
+    nlp_model = spacy.blank("en")
+    nlp_model.add_pipe("sentencizer")
+    column = pd.Series(
+        ["The yields of Greece rose, and the euro fell!", "It was a good year."] * 3,
+        index=[5, 4, 3, 2, 1, 0],
+    )
+
+    expected_output = tokenize_text_and_remove_non_alphabetic_characters_and_stop_words(
+        column, nlp_model
+    )
+    actual_output = tokenize_text_and_remove_non_alphabetic_characters_and_stop_words(
+        column, nlp_model, tokenizer_only=True, batch_size=2, n_process=2
+    )
+
+    pd.testing.assert_series_equal(expected_output, actual_output)
+    assert actual_output.iloc[0] == "yields Greece rose euro fell"
+
+
 def test_clean_transcript_data_df(test_transcript=test_transcript):
     test_data = pd.DataFrame(
         {
@@ -801,6 +835,309 @@ def test_create_country_sentiment_index_for_one_transcript_only_negatives():
     assert expected_output == actual_output
 
 
+@pytest.fixture
+def country_scoring_inputs():
+    country_names_file = pd.DataFrame(
+        {
+            "name": ["austria", "germany", "luxembourg", "greece"],
+            "adjectival": ["austrian", "german", "luxembourgish", "greek"],
+            "demonymic": ["austrians", "germans", "luxembourgers", "greeks"],
+            "capital": ["vienna", "berlin", "luxembourg", "athens"],
+            "other": [None, "deutschland", None, "hellas"],
+        }
+    )
+    lookup_dict = {"crisis": -1, "default": -1, "growth": 1, "strong": 1}
+    vocabulary = list(lookup_dict) + ["the", "of", "bonds", "in", "yields"]
+    vocabulary += country_names_file.drop(columns="other").values.flatten().tolist()
+    vocabulary += ["deutschland", "hellas", "france"]
+
+    rng = random.Random(7)
+    transcripts = [
+        " ".join(rng.choice(vocabulary) for _ in range(rng.randint(0, 300)))
+        for _ in range(50)
+    ]
+
+    return transcripts, lookup_dict, country_names_file
+
+
+@pytest.mark.parametrize(
+    "calculation_method", ["negative_and_positive", "only_negatives"]
+)
+def test_sentiment_index_for_all_countries_matches_per_country_scorer(
+    country_scoring_inputs, calculation_method
+):
+    transcripts, lookup_dict, country_names_file = country_scoring_inputs
+    countries = ["austria", "germany", "luxembourg", "greece", "france"]
+
+    expected_word_counts = create_word_count_dictionary(lookup_dict)
+    actual_word_counts = create_word_count_dictionary(lookup_dict)
+
+    for transcript in transcripts:
+        expected_scores = {
+            country: create_country_sentiment_index_for_one_transcript(
+                transcript,
+                lookup_dict,
+                5,
+                country,
+                country_names_file,
+                expected_word_counts,
+                calculation_method,
+            )
+            for country in countries
+        }
+        actual_scores = create_sentiment_index_for_all_countries_in_one_transcript(
+            transcript,
+            lookup_dict,
+            5,
+            countries,
+            country_names_file,
+            actual_word_counts,
+            calculation_method,
+        )
+
+        assert actual_scores == expected_scores
+
+    assert actual_word_counts == expected_word_counts
+
+
+@pytest.mark.parametrize("words_environment", [0, 1, 3, 20, 500])
+@pytest.mark.parametrize(
+    "calculation_method", ["negative_and_positive", "only_negatives", "unknown"]
+)
+def test_prefix_sum_scoring_matches_loop_scoring(
+    country_scoring_inputs, words_environment, calculation_method
+):
+    transcripts, lookup_dict, country_names_file = country_scoring_inputs
+    # Integer values as created by create_sentiment_dictionary_for_lookups
+    lookup_dict = {word: np.int64(value) for word, value in lookup_dict.items()}
+    lookup_dict["neutral"] = np.int64(0)
+    transcripts = transcripts + ["", "greece", "neutral greece neutral crisis"]
+    countries = ["austria", "germany", "luxembourg", "greece"]
+
+    results = {}
+    for scoring_engine in ["loop", "prefix_sums"]:
+        word_count_dict = create_word_count_dictionary(lookup_dict)
+        scores = [
+            create_sentiment_index_for_all_countries_in_one_transcript(
+                transcript,
+                lookup_dict,
+                words_environment,
+                countries,
+                country_names_file,
+                word_count_dict,
+                calculation_method,
+                scoring_engine=scoring_engine,
+            )
+            for transcript in transcripts
+        ]
+        results[scoring_engine] = (scores, word_count_dict)
+
+    assert results["prefix_sums"] == results["loop"]
+
+
+def test_calculate_window_sentiment_with_prefix_sums_counts_overlapping_windows():
+    transcript_words = "crisis greece crisis greece growth".split()
+    word_scores = create_word_sentiment_scores(
+        transcript_words, {"crisis": -1, "growth": 1}, "negative_and_positive"
+    )
+    word_count_dict = {"crisis": 0, "growth": 0}
+
+    sentiment_indices = calculate_window_sentiment_with_prefix_sums(
+        word_scores,
+        transcript_words,
+        {"greece": [1, 3], "italy": []},
+        2,
+        word_count_dict,
+        100,
+    )
+
+    # Windows are words [0, 3) and [1, 5): the middle "crisis" is in both
+    assert sentiment_indices == {"greece": -2 + 0, "italy": 0}
+    assert word_count_dict == {"crisis": 3, "growth": 1}
+
+
+def test_calculate_window_sentiment_with_prefix_sums_counts_words_by_country():
+    transcript_words = "crisis greece crisis italy growth".split()
+    word_scores = create_word_sentiment_scores(
+        transcript_words, {"crisis": -1, "growth": 1}, "negative_and_positive"
+    )
+    country_counts = {"greece": Counter(), "italy": Counter()}
+
+    sentiment_indices = calculate_window_sentiment_with_prefix_sums(
+        word_scores,
+        transcript_words,
+        {"greece": [1], "italy": [3]},
+        1,
+        country_counts,
+        100,
+        count_words_by_country=True,
+    )
+
+    assert sentiment_indices == {"greece": -1, "italy": -1}
+    assert country_counts == {
+        "greece": Counter({"crisis": 1}),
+        "italy": Counter({"crisis": 1}),
+    }
+
+
+def test_prefix_sum_scoring_falls_back_to_loop_for_float_values(
+    country_scoring_inputs,
+):
+    transcripts, _, country_names_file = country_scoring_inputs
+    lookup_dict = {"crisis": -0.1, "default": -0.7, "growth": 0.3, "strong": 0.2}
+
+    for transcript in transcripts:
+        loop_scores, prefix_sum_scores = [
+            create_sentiment_index_for_all_countries_in_one_transcript(
+                transcript,
+                lookup_dict,
+                5,
+                ["greece", "austria"],
+                country_names_file,
+                create_word_count_dictionary(lookup_dict),
+                scoring_engine=scoring_engine,
+            )
+            for scoring_engine in ["loop", "prefix_sums"]
+        ]
+
+        assert prefix_sum_scores == loop_scores
+
+
+@pytest.mark.parametrize("scoring_engine", ["loop", "prefix_sums"])
+def test_sentiment_index_columns_for_window_sizes_match_single_window_runs(
+    country_scoring_inputs, scoring_engine
+):
+    transcripts, lookup_dict, country_names_file = country_scoring_inputs
+    transcripts = pd.Series(transcripts)
+    countries = ["austria", "germany", "greece"]
+    window_sizes = [5, 10, 20, 40, 80]
+
+    word_count_dicts = {
+        window_size: create_word_count_dictionary(lookup_dict)
+        for window_size in window_sizes
+    }
+    actual_output = create_sentiment_index_columns_for_window_sizes(
+        transcripts,
+        lookup_dict,
+        window_sizes,
+        countries,
+        country_names_file,
+        word_count_dicts,
+        scoring_engine=scoring_engine,
+    )
+
+    for window_size in window_sizes:
+        word_count_dict = create_word_count_dictionary(lookup_dict)
+        expected_output = create_sentiment_index_columns_for_window_sizes(
+            transcripts,
+            lookup_dict,
+            [window_size],
+            countries,
+            country_names_file,
+            {window_size: word_count_dict},
+            scoring_engine="loop",
+        )[window_size]
+
+        pd.testing.assert_frame_equal(actual_output[window_size], expected_output)
+        assert word_count_dicts[window_size] == word_count_dict
+
+
+def test_create_country_alias_index():
+    country_names_file = pd.DataFrame(
+        {
+            "name": ["Luxembourg", "germany", "germany"],
+            "adjectival": ["luxembourgish", "german", "ignored"],
+            "capital": ["luxembourg", "berlin", "bonn"],
+            "other": [None, np.nan, None],
+        }
+    )
+
+    alias_index = create_country_alias_index(
+        country_names_file, mapping={"Deutschland": "Germany", "german": "germany"}
+    )
+
+    assert alias_index == {
+        "Luxembourg": ("luxembourg",),
+        "luxembourgish": ("luxembourg",),
+        "luxembourg": ("luxembourg",),
+        "germany": ("germany",),
+        "german": ("germany",),
+        "berlin": ("germany",),
+        "deutschland": ("germany",),
+    }
+
+
+def test_country_scorer_with_alias_index_matches_country_names_file(
+    country_scoring_inputs,
+):
+    transcripts, lookup_dict, country_names_file = country_scoring_inputs
+    alias_index = create_country_alias_index(country_names_file)
+    word_count_dict = create_word_count_dictionary(lookup_dict)
+
+    for transcript in transcripts:
+        for country in ["Austria", "germany", "luxembourg", "france"]:
+            assert create_country_sentiment_index_for_one_transcript(
+                transcript,
+                lookup_dict,
+                5,
+                country,
+                country_names_file,
+                word_count_dict,
+            ) == create_country_sentiment_index_for_one_transcript(
+                transcript,
+                lookup_dict,
+                5,
+                country,
+                None,
+                word_count_dict,
+                alias_index=alias_index,
+            )
+
+
+def test_get_country_appearance_index_from_alias_index():
+    transcript_words = "berlin and vienna trade with germany and austria".split()
+    alias_index = {
+        "berlin": ("germany",),
+        "germany": ("germany",),
+        "vienna": ("austria",),
+        "austria": ("austria",),
+    }
+
+    assert get_country_appearance_index_from_transcript_text(
+        transcript_words, alias_index, "Germany"
+    ) == [0, 5]
+
+
+def test_sentiment_index_columns_for_window_sizes_keep_index(country_scoring_inputs):
+    transcripts, lookup_dict, country_names_file = country_scoring_inputs
+    transcripts = pd.Series(transcripts[:3], index=[10, 11, 12])
+
+    actual_output = create_sentiment_index_columns_for_window_sizes(
+        transcripts,
+        lookup_dict,
+        [5],
+        ["greece", "austria"],
+        country_names_file,
+        {5: create_word_count_dictionary(lookup_dict)},
+    )[5]
+
+    assert actual_output.columns.tolist() == [
+        "Sentiment_Index_McDonald_greece",
+        "Sentiment_Index_McDonald_austria",
+    ]
+    assert actual_output.index.tolist() == [10, 11, 12]
+    assert actual_output.loc[11, "Sentiment_Index_McDonald_greece"] == (
+        create_country_sentiment_index_for_one_transcript(
+            transcripts[11],
+            lookup_dict,
+            5,
+            "greece",
+            country_names_file,
+            create_word_count_dictionary(lookup_dict),
+        )
+    )
+
+
 def test_calculate_loughlan_mcdonald_sentiment_index():
     test_input = pd.DataFrame(
         {
@@ -856,6 +1193,39 @@ def test_calculate_loughlan_mcdonald_sentiment_index():
     pd.testing.assert_frame_equal(expected_output, actual_output, check_dtype=False)
 
 
+def test_rolling_engines_of_loughlan_mcdonald_sentiment_index_are_identical():
+    rng = np.random.default_rng(0)
+    number_of_transcripts = 400
+    test_input = pd.DataFrame(
+        {
+            "Date": pd.to_datetime("2002-06-01")
+            + pd.to_timedelta(rng.integers(0, 7700, number_of_transcripts), unit="D"),
+            "Sentiment_Index_McDonald_USA": rng.integers(
+                -20, 20, number_of_transcripts
+            ),
+            "Sentiment_Index_McDonald_Australia": rng.integers(
+                -5, 5, number_of_transcripts
+            ).astype(float),
+        }
+    )
+    test_input.loc[::7, "Sentiment_Index_McDonald_Australia"] = np.nan
+    input_copy = test_input.copy()
+
+    actual_output = calculate_loughlan_mcdonald_sentiment_index(
+        test_input, ["USA", "Australia"], day_window=30
+    )
+    pd.testing.assert_frame_equal(test_input, input_copy)
+
+    expected_output = calculate_loughlan_mcdonald_sentiment_index(
+        test_input.sort_values("Date"),
+        ["USA", "Australia"],
+        day_window=30,
+        rolling_engine="loop",
+    )
+
+    pd.testing.assert_frame_equal(actual_output, expected_output)
+
+
 def test_preprocess_transcript_text_correct_removal(test_transcript):
     actual_result = preprocess_transcript_text(test_transcript)
 
@@ -873,3 +1243,83 @@ def test_preprocess_transcript_text_correct_removal(test_transcript):
 
     # Assert no backslashes
     assert re.search(r"\\", actual_result) is None
+
+
+def test_clean_transcript_data_df_in_parallel_matches_serial(transcript_directory):
+    raw_data = combine_all_transcripts_into_dataframe(transcript_directory)
+
+    expected_output = clean_transcript_data_df(raw_data)
+    actual_output = clean_transcript_data_df(raw_data, n_workers=2, chunk_size=4)
+
+    pd.testing.assert_frame_equal(expected_output, actual_output)
+
+
+def test_clean_transcript_data_df_keeps_incremental_transcript_ids(
+    transcript_directory,
+):
+    first_build, manifest = update_transcript_dataframe_incrementally(
+        transcript_directory
+    )
+    # A new transcript dated before all others gets the next ID, not position 0
+    (
+        transcript_directory / "2003" / "2003-Jan-02-DBKGn.DE-1-transcript.txt"
+    ).write_text("An early transcript", encoding="utf-8")
+    raw_data, _ = update_transcript_dataframe_incrementally(
+        transcript_directory, existing_data=first_build, manifest=manifest
+    )
+
+    cleaned_data = clean_transcript_data_df(raw_data)
+
+    assert cleaned_data["Transcript_ID"].tolist() == raw_data["Transcript_ID"].tolist()
+    assert cleaned_data["Transcript_ID"].iloc[0] == 6
+
+
+def test_clean_transcript_data_df_in_parallel_throttles_progress(
+    transcript_directory, capsys
+):
+    raw_data = combine_all_transcripts_into_dataframe(transcript_directory)
+    capsys.readouterr()
+
+    clean_transcript_data_df(
+        raw_data, n_workers=2, chunk_size=1, progress_interval_seconds=3600
+    )
+
+    assert capsys.readouterr().out.splitlines() == ["Processed 6 transcripts"]
+
+
+def test_normalise_transcript_text_is_identical_to_preprocess_transcript_text(
+    test_transcript,
+):
+    assert normalise_transcript_text(test_transcript) == preprocess_transcript_text(
+        test_transcript
+    )
+
+
+def test_normalise_transcript_text_is_identical_on_random_edge_cases():
+    # Pieces that interact between the substitution steps, e.g. "[---1]" only
+    # becomes an enclosed number once the dashes are removed
+    pieces = ["[", "]", "1", "23", "-", "---", "=", "*", "\n", " ", "\t", "\\"]
+    pieces += ["a", "B", "Presentation", "Presentation\n---\n", "x [4]\n", "\x85"]
+    pieces += ["PRELIMINARY TRANSCRIPT:"]
+
+    rng = random.Random(42)
+
+    for _ in range(5000):
+        text = "".join(rng.choice(pieces) for _ in range(rng.randint(0, 30)))
+        assert normalise_transcript_text(text) == preprocess_transcript_text(text), text
+
+
+def test_normalise_transcript_text_is_identical_on_real_transcripts():
+    transcript_directory = SRC / "data" / "transcripts" / "raw" / "Eikon 2002 - 2022"
+    transcript_files = sorted(transcript_directory.rglob("*.txt"))
+
+    if not transcript_files:
+        pytest.skip("The raw transcripts are not available.")
+
+    for file_path in random.Random(42).sample(
+        transcript_files, min(200, len(transcript_files))
+    ):
+        transcript = extract_data_from_file(file_path)["Transcript"]
+        assert normalise_transcript_text(transcript) == preprocess_transcript_text(
+            transcript
+        ), file_path
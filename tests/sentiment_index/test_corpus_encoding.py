@@ -0,0 +1,186 @@
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+import regex as re
+
+from debt_crisis.sentiment_index.clean_sentiment_data import (
+    create_country_alias_index,
+    create_sentiment_index_columns_for_window_sizes,
+    create_word_count_dictionary,
+)
+from debt_crisis.sentiment_index.corpus_encoding import (
+    align_encoded_corpus_scores,
+    create_country_id_table,
+    create_sentiment_index_columns_from_encoded_corpus,
+    create_sentiment_value_table,
+    encode_transcript_corpus,
+    get_transcript_tokens,
+    load_encoded_corpus,
+)
+
+
+@pytest.fixture
+def country_names_file():
+    return pd.DataFrame(
+        {
+            "name": ["austria", "germany", "luxembourg", "greece"],
+            "adjectival": ["austrian", "german", "luxembourgish", "greek"],
+            "capital": ["vienna", "berlin", "luxembourg", "athens"],
+            "other": [None, "deutschland", None, None],
+        }
+    )
+
+
+@pytest.fixture
+def transcripts(country_names_file):
+    vocabulary = ["crisis", "default", "growth", "strong", "the", "of", "Bonds"]
+    vocabulary += country_names_file.drop(columns="other").values.flatten().tolist()
+    vocabulary += ["deutschland", "Greece", "france", "q4-2010", "naïve"]
+
+    rng = random.Random(11)
+    return [
+        " ".join(rng.choice(vocabulary) for _ in range(rng.randint(0, 200)))
+        for _ in range(30)
+    ] + [""]
+
+
+def test_encoded_corpus_round_trips_the_tokens(transcripts, tmp_path):
+    encode_transcript_corpus(
+        transcripts, tmp_path, transcript_ids=range(100, 100 + len(transcripts))
+    )
+    corpus = load_encoded_corpus(tmp_path)
+
+    assert isinstance(corpus["Tokens"], np.memmap)
+    assert corpus["Tokens"].dtype == np.int32
+    assert corpus["Transcript_IDs"].tolist() == list(range(100, 100 + len(transcripts)))
+    assert len(corpus["Vocabulary"]) == len(set(corpus["Vocabulary"]))
+
+    for position, transcript in enumerate(transcripts):
+        words = [
+            corpus["Vocabulary"][word_id]
+            for word_id in get_transcript_tokens(corpus, position)
+        ]
+        assert words == re.findall(r"\b\w+\b", transcript.lower())
+
+
+def test_encoded_corpus_with_only_empty_transcripts(tmp_path):
+    encode_transcript_corpus(["", ""], tmp_path)
+    corpus = load_encoded_corpus(tmp_path)
+
+    assert corpus["Offsets"].tolist() == [0, 0, 0]
+    assert corpus["Vocabulary"] == []
+    assert len(get_transcript_tokens(corpus, 1)) == 0
+
+
+def test_vocabulary_tables():
+    vocabulary = ["the", "crisis", "growth", "berlin", "vienna"]
+    alias_index = {"berlin": ("germany",), "vienna": ("austria",)}
+
+    sentiment_table = create_sentiment_value_table(
+        vocabulary, {"crisis": -1, "growth": 1, "the": 0}, "only_negatives"
+    )
+    country_table = create_country_id_table(
+        vocabulary, alias_index, ["Germany", "austria"]
+    )
+
+    assert sentiment_table["Values"].tolist() == [0, -1, 0, 0, 0]
+    assert sentiment_table["Is_Counted"].tolist() == [0, 1, 0, 0, 0]
+    assert country_table.tolist() == [
+        [False, False],
+        [False, False],
+        [False, False],
+        [True, False],
+        [False, True],
+    ]
+
+
+@pytest.mark.parametrize(
+    "calculation_method", ["negative_and_positive", "only_negatives"]
+)
+def test_encoded_corpus_scores_match_string_scorer(
+    transcripts, country_names_file, tmp_path, calculation_method
+):
+    lookup_dict = {"crisis": -1, "default": -1, "growth": 1, "strong": 1, "the": 0}
+    countries = ["austria", "germany", "luxembourg", "greece", "france"]
+    window_sizes = [0, 3, 20]
+    alias_index = create_country_alias_index(country_names_file)
+
+    expected_word_counts = {
+        window_size: create_word_count_dictionary(lookup_dict)
+        for window_size in window_sizes
+    }
+    expected_output = create_sentiment_index_columns_for_window_sizes(
+        pd.Series(transcripts),
+        lookup_dict,
+        window_sizes,
+        countries,
+        country_names_file,
+        expected_word_counts,
+        calculation_method,
+        scoring_engine="loop",
+    )
+
+    transcript_ids = pd.Series(range(100, 100 + len(transcripts)))
+    encode_transcript_corpus(transcripts, tmp_path, transcript_ids=transcript_ids)
+    actual_word_counts = {
+        window_size: create_word_count_dictionary(lookup_dict)
+        for window_size in window_sizes
+    }
+    actual_output = create_sentiment_index_columns_from_encoded_corpus(
+        load_encoded_corpus(tmp_path),
+        lookup_dict,
+        window_sizes,
+        countries,
+        alias_index,
+        actual_word_counts,
+        calculation_method,
+    )
+    actual_output = align_encoded_corpus_scores(actual_output, transcript_ids)
+
+    for window_size in window_sizes:
+        pd.testing.assert_frame_equal(
+            actual_output[window_size], expected_output[window_size]
+        )
+    assert actual_word_counts == expected_word_counts
+
+
+def test_encoded_corpus_scorer_rejects_float_values(transcripts, tmp_path):
+    encode_transcript_corpus(transcripts, tmp_path)
+
+    with pytest.raises(ValueError):
+        create_sentiment_index_columns_from_encoded_corpus(
+            load_encoded_corpus(tmp_path),
+            {"crisis": -0.5},
+            [5],
+            ["greece"],
+            {"greece": ("greece",)},
+            {5: {"crisis": 0}},
+        )
+
+
+def test_encoded_corpus_scores_are_matched_by_transcript_id(tmp_path):
+    encode_transcript_corpus(
+        ["greece crisis", "greece growth", "greece"],
+        tmp_path,
+        transcript_ids=[7, 3, 5],
+    )
+    scores = create_sentiment_index_columns_from_encoded_corpus(
+        load_encoded_corpus(tmp_path),
+        {"crisis": -1, "growth": 1},
+        [5],
+        ["greece"],
+        {"greece": ("greece",)},
+        {5: {"crisis": 0, "growth": 0}},
+    )
+    assert scores[5].index.tolist() == [7, 3, 5]
+
+    aligned_scores = align_encoded_corpus_scores(
+        scores, pd.Series([3, 7], index=[10, 11], name="Transcript_ID")
+    )
+    assert aligned_scores[5].index.tolist() == [10, 11]
+    assert aligned_scores[5]["Sentiment_Index_McDonald_greece"].tolist() == [1, -1]
+
+    with pytest.raises(ValueError, match="not in the encoded corpus"):
+        align_encoded_corpus_scores(scores, pd.Series([3, 8], name="Transcript_ID"))
@@ -0,0 +1,179 @@
+import random
+
+import pandas as pd
+import pytest
+
+from debt_crisis.sentiment_index.clean_sentiment_data import (
+    create_country_alias_index,
+    create_sentiment_index_columns_for_window_sizes,
+    create_word_count_dictionary,
+)
+from debt_crisis.sentiment_index.country_mention_index import (
+    create_alias_index_fingerprint,
+    create_country_mention_index,
+    get_transcript_ids_mentioning_countries,
+    update_country_mention_index,
+)
+
+
+@pytest.fixture
+def country_names_file():
+    return pd.DataFrame(
+        {
+            "name": ["austria", "germany", "luxembourg", "greece"],
+            "adjectival": ["austrian", "german", "luxembourgish", "greek"],
+            "capital": ["vienna", "berlin", "luxembourg", "athens"],
+        }
+    )
+
+
+@pytest.fixture
+def transcripts_data():
+    vocabulary = ["crisis", "default", "growth", "strong", "the", "of", "bonds"] * 20
+    vocabulary += ["greece", "athens", "german", "luxembourg"]
+
+    rng = random.Random(5)
+    transcripts = [
+        " ".join(rng.choice(vocabulary) for _ in range(rng.randint(0, 80)))
+        for _ in range(40)
+    ]
+    return pd.DataFrame(
+        {
+            "Transcript_ID": range(10, 10 + len(transcripts)),
+            "Preprocessed_Transcript_Step_1": transcripts,
+        }
+    )
+
+
+def test_create_country_mention_index(country_names_file):
+    alias_index = create_country_alias_index(country_names_file)
+
+    mention_index = create_country_mention_index(
+        ["growth in athens, greece.", "no mention", "luxembourg's banks"],
+        [7, 8, 9],
+        alias_index,
+    )
+
+    assert mention_index.to_dict("records") == [
+        {
+            "Country": "greece",
+            "Alias": "athens",
+            "Transcript_ID": 7,
+            "Token_Offset": 2,
+            "Char_Offset": 10,
+        },
+        {
+            "Country": "greece",
+            "Alias": "greece",
+            "Transcript_ID": 7,
+            "Token_Offset": 3,
+            "Char_Offset": 18,
+        },
+        {
+            "Country": "luxembourg",
+            "Alias": "luxembourg",
+            "Transcript_ID": 9,
+            "Token_Offset": 0,
+            "Char_Offset": 0,
+        },
+    ]
+    assert get_transcript_ids_mentioning_countries(
+        mention_index, ["Greece", "Italy"]
+    ).tolist() == [7]
+
+
+def test_update_country_mention_index_only_scans_changed_transcripts(
+    transcripts_data, country_names_file, capsys
+):
+    alias_index = create_country_alias_index(country_names_file)
+    mention_index, manifest = update_country_mention_index(
+        transcripts_data.iloc[:30], alias_index
+    )
+    capsys.readouterr()
+
+    updated_data = transcripts_data.drop(index=[3]).copy()
+    updated_data.loc[5, "Preprocessed_Transcript_Step_1"] = "athens and berlin"
+
+    mention_index, manifest = update_country_mention_index(
+        updated_data, alias_index, mention_index=mention_index, manifest=manifest
+    )
+
+    assert capsys.readouterr().out == f"Indexed 11 of {len(updated_data)} transcripts\n"
+    pd.testing.assert_frame_equal(
+        mention_index,
+        create_country_mention_index(
+            updated_data["Preprocessed_Transcript_Step_1"],
+            updated_data["Transcript_ID"],
+            alias_index,
+        ),
+    )
+    assert manifest["Transcript_ID"].tolist() == updated_data["Transcript_ID"].tolist()
+
+
+def test_scoring_with_mention_index_matches_full_scan(
+    transcripts_data, country_names_file
+):
+    lookup_dict = {"crisis": -1, "default": -1, "growth": 1, "strong": 1}
+    countries = ["austria", "germany", "greece"]
+    alias_index = create_country_alias_index(country_names_file)
+    mention_index = create_country_mention_index(
+        transcripts_data["Preprocessed_Transcript_Step_1"],
+        transcripts_data["Transcript_ID"],
+        alias_index,
+    )
+
+    outputs, word_count_dicts = [], []
+    for index in [None, mention_index]:
+        word_count_dict = {5: create_word_count_dictionary(lookup_dict)}
+        outputs.append(
+            create_sentiment_index_columns_for_window_sizes(
+                transcripts_data["Preprocessed_Transcript_Step_1"],
+                lookup_dict,
+                [5],
+                countries,
+                country_names_file,
+                word_count_dict,
+                alias_index=alias_index,
+                mention_index=index,
+                transcript_ids=transcripts_data["Transcript_ID"],
+            )[5]
+        )
+        word_count_dicts.append(word_count_dict)
+
+    pd.testing.assert_frame_equal(outputs[1], outputs[0])
+    assert word_count_dicts[1] == word_count_dicts[0]
+
+
+def test_update_country_mention_index_rebuilds_when_aliases_change(
+    transcripts_data, country_names_file, capsys
+):
+    alias_index = create_country_alias_index(country_names_file)
+    mention_index, manifest = update_country_mention_index(
+        transcripts_data, alias_index
+    )
+    assert not mention_index["Alias"].eq("bonds").any()
+
+    new_alias_index = create_country_alias_index(
+        country_names_file, mapping={"bonds": "greece"}
+    )
+    capsys.readouterr()
+    mention_index, manifest = update_country_mention_index(
+        transcripts_data,
+        new_alias_index,
+        mention_index=mention_index,
+        manifest=manifest,
+    )
+
+    assert f"Indexed {len(transcripts_data)} of" in capsys.readouterr().out
+    pd.testing.assert_frame_equal(
+        mention_index,
+        create_country_mention_index(
+            transcripts_data["Preprocessed_Transcript_Step_1"],
+            transcripts_data["Transcript_ID"],
+            new_alias_index,
+        ),
+    )
+    assert mention_index["Alias"].eq("bonds").any()
+    assert manifest.attrs["Alias_Fingerprint"] == create_alias_index_fingerprint(
+        new_alias_index
+    )
@@ -0,0 +1,176 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from debt_crisis.gpt_sentiment_index.gpt_index_analysis import (
+    calculate_gpt_sentiment_index_for_all_countries,
+    get_gpt_sentiment_index_from_state,
+    update_gpt_sentiment_index,
+)
+from debt_crisis.sentiment_index.clean_sentiment_data import (
+    calculate_loughlan_mcdonald_sentiment_index,
+    get_sentiment_index_from_state,
+    update_loughlan_mcdonald_sentiment_index,
+)
+
+
+@pytest.fixture
+def transcript_scores():
+    rng = np.random.default_rng(7)
+    number_of_transcripts = 300
+    scores = pd.DataFrame(
+        {
+            "Transcript_ID": np.arange(number_of_transcripts),
+            "Date": pd.to_datetime("2002-10-01")
+            + pd.to_timedelta(rng.integers(0, 7400, number_of_transcripts), unit="D"),
+            "Sentiment_Index_McDonald_greece": rng.integers(-10, 10, 300),
+            "Sentiment_Index_McDonald_italy": rng.integers(-10, 10, 300),
+        }
+    )
+
+    return scores.sort_values("Date").reset_index(drop=True)
+
+
+def test_incremental_mcdonald_index_matches_full_calculation(transcript_scores):
+    countries = ["greece", "italy"]
+    first_batch = transcript_scores[transcript_scores["Date"] < "2015-01-01"]
+    # A late transcript of an earlier date and a transcript that was already added
+    second_batch = pd.concat(
+        [transcript_scores.iloc[::-1][:60], first_batch.iloc[[0]]]
+    ).drop_duplicates("Transcript_ID", keep="first")
+
+    state = update_loughlan_mcdonald_sentiment_index(
+        first_batch, countries, start_date="1/1/2003", end_date="2015-06-30"
+    )
+    state = update_loughlan_mcdonald_sentiment_index(
+        second_batch, countries, state=state, end_date="1/1/2023"
+    )
+    state = update_loughlan_mcdonald_sentiment_index(
+        transcript_scores, countries, state=state, end_date="1/1/2023"
+    )
+
+    full_index = calculate_loughlan_mcdonald_sentiment_index(
+        transcript_scores.drop(columns="Transcript_ID"), countries
+    )
+    pd.testing.assert_frame_equal(
+        get_sentiment_index_from_state(state),
+        full_index,
+        check_freq=False,
+        check_dtype=False,
+    )
+
+
+def test_incremental_update_only_calculates_affected_days(transcript_scores):
+    countries = ["greece", "italy"]
+    state = update_loughlan_mcdonald_sentiment_index(
+        transcript_scores.iloc[:-1], countries, day_window=30, end_date="2023-06-30"
+    )
+
+    new_transcript = transcript_scores.iloc[[-1]].copy()
+    new_transcript["Date"] = pd.Timestamp("2023-07-01")
+    state = update_loughlan_mcdonald_sentiment_index(
+        new_transcript, countries, state=state, end_date="2023-07-02"
+    )
+
+    assert state["Recomputed_Days"] == 2
+    assert state["Index"].index[-1] == pd.Timestamp("2023-07-02")
+    np.testing.assert_array_equal(
+        state["Index"].loc["2023-07-01"].to_numpy(),
+        new_transcript[
+            ["Sentiment_Index_McDonald_greece", "Sentiment_Index_McDonald_italy"]
+        ].to_numpy()[0],
+    )
+
+
+def test_incremental_gpt_index_matches_full_calculation():
+    rng = np.random.default_rng(11)
+    number_of_snippets = 400
+    predictions = pd.DataFrame(
+        {
+            "Snippet_ID": np.arange(number_of_snippets),
+            "Transcript_ID": rng.integers(0, 100, number_of_snippets),
+            "Snippet": [f"snippet {number}" for number in range(number_of_snippets)],
+            "Date": pd.to_datetime("2003-01-01")
+            + pd.to_timedelta(rng.integers(0, 7300, number_of_snippets), unit="D"),
+            "Country": rng.choice(["Greece", "Italy", "Spain"], number_of_snippets),
+            "Prediction": rng.integers(-1, 2, number_of_snippets).astype(float),
+        }
+    )
+    countries = ["Greece", "Italy", "Spain"]
+
+    state = update_gpt_sentiment_index(
+        predictions.iloc[:250], countries=countries, end_date="2020-01-01"
+    )
+    state = update_gpt_sentiment_index(
+        predictions.iloc[250:], state=state, end_date="1/1/2023"
+    )
+
+    full_index = calculate_gpt_sentiment_index_for_all_countries(
+        predictions, countries=countries
+    )
+    pd.testing.assert_frame_equal(
+        get_gpt_sentiment_index_from_state(state), full_index, check_dtype=False
+    )
+
+
+@pytest.fixture
+def gpt_predictions():
+    return pd.DataFrame(
+        {
+            "Snippet_ID": [1, 2, 3],
+            "Transcript_ID": [10, 10, 11],
+            "Snippet": ["greece grows", "greece defaults", "italy"],
+            "Date": pd.to_datetime(["2020-01-01", "2020-01-02", "2020-01-02"]),
+            "Country": ["Greece", "Greece", "Italy"],
+            "Prediction": [1.0, -1.0, 0.0],
+        }
+    )
+
+
+def test_incremental_gpt_index_does_not_depend_on_snippet_ids(gpt_predictions):
+    state = update_gpt_sentiment_index(
+        gpt_predictions.iloc[1:].assign(Snippet_ID=[1, 2]),
+        countries=["Greece", "Italy"],
+        start_date="2020-01-01",
+        end_date="2020-01-03",
+    )
+
+    # A new snippet shifts the positional Snippet_IDs of the extraction
+    state = update_gpt_sentiment_index(
+        gpt_predictions.assign(Snippet_ID=[1, 2, 3]), state=state, end_date="2020-01-03"
+    )
+
+    assert len(state["Observation_Dates"]) == 3
+    assert state["Daily_Counts"].sum().tolist() == [2, 1]
+    np.testing.assert_array_equal(
+        state["Index"].to_numpy(), [[1.0, np.nan], [0.0, 0.0], [0.0, 0.0]]
+    )
+
+
+def test_incremental_gpt_index_replaces_revised_predictions(gpt_predictions):
+    state = update_gpt_sentiment_index(
+        gpt_predictions, start_date="2020-01-01", end_date="2020-01-03"
+    )
+
+    revised_predictions = gpt_predictions.copy()
+    revised_predictions.loc[1, "Prediction"] = 1.0
+    state = update_gpt_sentiment_index(
+        revised_predictions, state=state, end_date="2020-01-03"
+    )
+
+    assert state["Revised_Observations"] == 1
+    assert state["Index"].loc["2020-01-02", "Greece"] == 1.0
+    assert state["Daily_Counts"]["Greece"].sum() == 2
+
+
+def test_incremental_index_rejects_changed_settings(gpt_predictions):
+    state = update_gpt_sentiment_index(
+        gpt_predictions, start_date="2020-01-01", end_date="2020-01-03"
+    )
+
+    with pytest.raises(ValueError, match="Start_Date"):
+        update_gpt_sentiment_index(
+            gpt_predictions, state=state, start_date="2019-01-01"
+        )
+    with pytest.raises(ValueError, match="Day_Window"):
+        update_gpt_sentiment_index(gpt_predictions, state=state, day_window=30)
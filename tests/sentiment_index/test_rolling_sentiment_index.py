@@ -0,0 +1,145 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from debt_crisis.sentiment_index.clean_sentiment_data import (
+    calculate_loughlan_mcdonald_sentiment_index,
+    calculate_loughlan_mcdonald_sentiment_index_for_multiple_windows,
+)
+from debt_crisis.sentiment_index.rolling_sentiment_index import (
+    EXPONENTIAL_DECAY,
+    TRAILING_MEAN,
+    calculate_multi_window_means,
+    calculate_rolling_window_means,
+    convert_window_means_to_long_format,
+)
+
+
+@pytest.fixture
+def transcript_scores():
+    rng = np.random.default_rng(4)
+    number_of_transcripts = 200
+    dates = pd.to_datetime("2010-01-01") + pd.to_timedelta(
+        rng.integers(0, 1500, number_of_transcripts), unit="D"
+    )
+    values = rng.integers(-10, 10, (number_of_transcripts, 2)).astype(float)
+    values[::9, 1] = np.nan
+
+    return dates, values
+
+
+def _brute_force_decayed_means(dates, values, evaluation_dates, half_life):
+    values = np.nan_to_num(values, nan=0.0)
+    means = []
+    for evaluation_date in evaluation_dates:
+        ages = (evaluation_date - dates) / pd.Timedelta(days=1)
+        weights = np.where(ages >= 0, 0.5 ** (np.maximum(ages, 0) / half_life), 0)
+        means.append(
+            weights @ values / weights.sum()
+            if weights.sum() > 0
+            else np.full(values.shape[1], np.nan)
+        )
+
+    return np.array(means)
+
+
+def test_trailing_windows_match_single_window(transcript_scores):
+    dates, values = transcript_scores
+    evaluation_dates = pd.date_range("2009-12-01", "2014-06-01")
+
+    window_means = calculate_multi_window_means(
+        dates, values, evaluation_dates, day_windows=[30, 90, 180]
+    )
+
+    assert list(window_means) == [
+        (TRAILING_MEAN, 30),
+        (TRAILING_MEAN, 90),
+        (TRAILING_MEAN, 180),
+    ]
+    for day_window in [30, 90, 180]:
+        np.testing.assert_array_equal(
+            window_means[(TRAILING_MEAN, day_window)],
+            calculate_rolling_window_means(dates, values, evaluation_dates, day_window),
+        )
+
+
+@pytest.mark.parametrize("half_life", [0.5, 3, 90])
+def test_exponential_decay_matches_brute_force(transcript_scores, half_life):
+    dates, values = transcript_scores
+    # Irregular evaluation dates with a gap of more than a year
+    evaluation_dates = pd.DatetimeIndex(
+        sorted(
+            set(pd.date_range("2009-12-01", "2011-01-01", freq="3D"))
+            | set(pd.date_range("2012-03-01", "2014-06-01", freq="D"))
+        )
+    )
+
+    window_means = calculate_multi_window_means(
+        dates, values, evaluation_dates, half_lives=[half_life]
+    )[(EXPONENTIAL_DECAY, half_life)]
+
+    expected_means = _brute_force_decayed_means(
+        dates, values, evaluation_dates, half_life
+    )
+    np.testing.assert_allclose(window_means, expected_means, rtol=1e-9, atol=1e-12)
+    assert np.isnan(window_means[evaluation_dates < dates.min()]).all()
+
+
+def test_convert_window_means_to_long_format():
+    evaluation_dates = pd.date_range("2020-01-01", periods=3)
+    window_means = {
+        (TRAILING_MEAN, 30): np.array([[1.0, 2.0], [3.0, 4.0], [5.0, 6.0]]),
+        (EXPONENTIAL_DECAY, 10): np.zeros((3, 2)),
+    }
+
+    long_data = convert_window_means_to_long_format(
+        window_means, evaluation_dates, ["greece", "italy"], "Sentiment_GPT"
+    )
+
+    assert list(long_data.columns) == [
+        "Date",
+        "Country",
+        "Weighting",
+        "Window_Days",
+        "Sentiment_GPT",
+    ]
+    assert len(long_data) == 12
+    assert long_data.loc[:5, "Sentiment_GPT"].tolist() == [1, 3, 5, 2, 4, 6]
+    assert long_data.loc[:5, "Country"].tolist() == ["greece"] * 3 + ["italy"] * 3
+
+
+def test_mcdonald_index_for_multiple_windows_matches_single_window(
+    transcript_scores,
+):
+    dates, values = transcript_scores
+    preprocessed_data = pd.DataFrame(
+        {
+            "Date": dates,
+            "Sentiment_Index_McDonald_greece": values[:, 0],
+            "Sentiment_Index_McDonald_italy": values[:, 1],
+        }
+    )
+
+    long_data = calculate_loughlan_mcdonald_sentiment_index_for_multiple_windows(
+        preprocessed_data, ["greece", "italy"], day_windows=[30, 90], half_lives=[60]
+    )
+
+    assert long_data.groupby(["Weighting", "Window_Days"]).size().to_dict() == {
+        (EXPONENTIAL_DECAY, 60): 2 * 7306,
+        (TRAILING_MEAN, 30): 2 * 7306,
+        (TRAILING_MEAN, 90): 2 * 7306,
+    }
+
+    single_window = calculate_loughlan_mcdonald_sentiment_index(
+        preprocessed_data, ["greece", "italy"], day_window=90
+    )
+    for country in ["greece", "italy"]:
+        country_data = long_data[
+            (long_data["Country"] == country)
+            & (long_data["Weighting"] == TRAILING_MEAN)
+            & (long_data["Window_Days"] == 90)
+        ]
+        np.testing.assert_array_equal(
+            country_data["Sentiment_Index_McDonald"].to_numpy(),
+            single_window[f"Sentiment_Index_McDonald_{country}"].to_numpy(),
+        )
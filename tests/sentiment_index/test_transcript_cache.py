@@ -0,0 +1,98 @@
+import os
+
+import pandas as pd
+import pytest
+
+from debt_crisis.sentiment_index.clean_sentiment_data import (
+    clean_transcript_data_df,
+    normalise_transcript_text,
+)
+from debt_crisis.sentiment_index.transcript_cache import PreprocessedTranscriptCache
+
+
+@pytest.fixture
+def raw_transcript_data():
+    return pd.DataFrame(
+        {
+            "Date": ["2004-01-12", "2004-04-06", "2005-03-03"],
+            "Company": ["SIEGn.DE", "BALN.S", "BNPP.PA"],
+            "Transcript": [
+                "Presentation\n---\nGood  morning [1]\n",
+                "Rates in Italy ***rose*** \\ sharply",
+                "Greece\n\nand Spain",
+            ],
+        }
+    )
+
+
+def test_cache_returns_stored_text_and_counts_hits_and_misses(tmp_path):
+    cache = PreprocessedTranscriptCache(tmp_path)
+
+    assert cache.get("raw text") is None
+    cache.put("raw text", "preprocessed\r\ntext")
+
+    assert cache.get("raw text") == "preprocessed\r\ntext"
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_cache_key_depends_on_preprocessing_fingerprint(tmp_path):
+    cache = PreprocessedTranscriptCache(tmp_path, fingerprint="rules-v1")
+    cache.put("raw text", "preprocessed text")
+
+    new_rules_cache = PreprocessedTranscriptCache(tmp_path, fingerprint="rules-v2")
+    same_rules_cache = PreprocessedTranscriptCache(tmp_path, fingerprint="rules-v1")
+
+    assert new_rules_cache.get("raw text") is None
+    assert same_rules_cache.get("raw text") == "preprocessed text"
+
+
+def test_cache_evicts_least_recently_used_entries(tmp_path):
+    cache = PreprocessedTranscriptCache(tmp_path, max_bytes=25)
+
+    for number, raw_text in enumerate(["a", "b", "c"]):
+        cache.put(raw_text, "x" * 10)
+        path = cache._path(cache.key(raw_text))
+        os.utime(path, (1_000_000 + number, 1_000_000 + number))
+
+    # Using "a" makes "b" the least recently used entry
+    cache.get("a")
+
+    assert cache.evict() == 1
+    assert cache.get("b") is None
+    assert cache.get("a") == "x" * 10
+    assert cache.get("c") == "x" * 10
+
+
+def test_clean_transcript_data_df_with_cache_matches_uncached_output(
+    raw_transcript_data, tmp_path
+):
+    expected_output = clean_transcript_data_df(raw_transcript_data)
+
+    cache = PreprocessedTranscriptCache(tmp_path)
+    first_output = clean_transcript_data_df(raw_transcript_data, cache=cache)
+    second_output = clean_transcript_data_df(raw_transcript_data, cache=cache)
+
+    pd.testing.assert_frame_equal(expected_output, first_output)
+    pd.testing.assert_frame_equal(expected_output, second_output)
+    assert (cache.hits, cache.misses) == (3, 3)
+
+
+def test_clean_transcript_data_df_with_cache_only_preprocesses_new_transcripts(
+    raw_transcript_data, tmp_path, capsys
+):
+    cache = PreprocessedTranscriptCache(tmp_path)
+    clean_transcript_data_df(raw_transcript_data.iloc[:2], cache=cache)
+    capsys.readouterr()
+
+    output = clean_transcript_data_df(raw_transcript_data, cache=cache)
+
+    processed_rows = [
+        line
+        for line in capsys.readouterr().out.splitlines()
+        if line.startswith("Processing row")
+    ]
+    assert processed_rows == ["Processing row 0"]
+    assert output["Preprocessed_Transcript_Step_1"].tolist() == [
+        normalise_transcript_text(transcript)
+        for transcript in raw_transcript_data["Transcript"]
+    ]
@@ -0,0 +1,309 @@
+import os
+
+import pandas as pd
+import pytest
+
+from debt_crisis.sentiment_index.clean_sentiment_data import clean_transcript_data_df
+from debt_crisis.sentiment_index.transcript_ingestion import (
+    combine_all_transcripts_into_dataframe,
+    find_all_transcript_files,
+    update_transcript_dataframe_incrementally,
+    update_transcript_manifest,
+    create_transcript_file_index,
+    stream_preprocessed_transcripts,
+    write_transcripts_in_chunks,
+)
+from debt_crisis.sentiment_index.transcript_storage import (
+    read_transcript_dataset,
+    write_transcript_dataset,
+)
+
+
+def test_find_all_transcript_files_parallel_keeps_os_walk_order(
+    transcript_directory,
+):
+    serial_files = find_all_transcript_files(transcript_directory, n_workers=1)
+    parallel_files = find_all_transcript_files(transcript_directory, n_workers=2)
+
+    assert len(serial_files) == 6
+    assert [record["File_Path"] for record in serial_files] == [
+        record["File_Path"] for record in parallel_files
+    ]
+
+
+def test_combine_all_transcripts_into_dataframe_parallel_equals_serial(
+    transcript_directory,
+):
+    serial_output = combine_all_transcripts_into_dataframe(transcript_directory)
+    parallel_output = combine_all_transcripts_into_dataframe(
+        transcript_directory, n_workers=3
+    )
+
+    pd.testing.assert_frame_equal(serial_output, parallel_output)
+    assert serial_output["Transcript_ID"].tolist() == list(range(6))
+
+
+def test_combine_all_transcripts_into_dataframe_reports_throughput(
+    transcript_directory, capsys
+):
+    combine_all_transcripts_into_dataframe(
+        transcript_directory, n_workers=2, report_throughput=True
+    )
+
+    printed_output = capsys.readouterr().out
+
+    assert "Read 6 files" in printed_output
+    assert "files/s" in printed_output
+    assert "MB/s" in printed_output
+
+
+def test_update_transcript_dataframe_incrementally_from_scratch_equals_full_build(
+    transcript_directory,
+):
+    full_build = combine_all_transcripts_into_dataframe(transcript_directory)
+
+    incremental_build, manifest = update_transcript_dataframe_incrementally(
+        transcript_directory
+    )
+
+    pd.testing.assert_frame_equal(full_build, incremental_build)
+    assert len(manifest) == 6
+    assert set(manifest["Transcript_ID"]) == set(range(6))
+
+
+def test_update_transcript_dataframe_incrementally_reads_only_changed_files(
+    transcript_directory, capsys
+):
+    first_build, manifest = update_transcript_dataframe_incrementally(
+        transcript_directory
+    )
+    ids_before = dict(zip(first_build["Company"], first_build["Transcript_ID"]))
+
+    # One new file, one changed file, one file touched without a content change
+    (
+        transcript_directory / "2005" / "2005-Jan-03-DBKGn.DE-1-transcript.txt"
+    ).write_text("A new transcript", encoding="utf-8")
+    changed_file = (
+        transcript_directory
+        / "2004"
+        / "2004-Apr-06-AAPL.OQ-139342690606-transcript.txt"
+    )
+    changed_file.write_text("A corrected transcript", encoding="utf-8")
+    touched_file = (
+        transcript_directory
+        / "2003"
+        / "2003-Dec-01-BAYG.DE-139342690608-transcript.txt"
+    )
+    os.utime(touched_file, (1e9, 1e9))
+    capsys.readouterr()
+
+    second_build, second_manifest = update_transcript_dataframe_incrementally(
+        transcript_directory, existing_data=first_build, manifest=manifest
+    )
+
+    assert "Read 3 of 7 files: 1 new, 1 changed." in capsys.readouterr().out
+
+    ids_after = dict(zip(second_build["Company"], second_build["Transcript_ID"]))
+    assert ids_after["DBKGn.DE"] == 6
+    assert {company: ids_after[company] for company in ids_before} == ids_before
+    assert (
+        second_build.loc[second_build["Company"] == "AAPL.OQ", "Transcript"].item()
+        == "A corrected transcript"
+    )
+    assert second_build["Date"].is_monotonic_increasing
+    assert len(second_manifest) == 7
+
+
+def test_update_transcript_dataframe_incrementally_drops_deleted_files(
+    transcript_directory,
+):
+    first_build, manifest = update_transcript_dataframe_incrementally(
+        transcript_directory
+    )
+
+    os.remove(
+        transcript_directory
+        / "2004"
+        / "2004-Jan-12-SIEGn.DE-139342690607-transcript.txt"
+    )
+
+    second_build, second_manifest = update_transcript_dataframe_incrementally(
+        transcript_directory, existing_data=first_build, manifest=manifest
+    )
+
+    assert "SIEGn.DE" not in second_build["Company"].tolist()
+    assert len(second_manifest) == 5
+    pd.testing.assert_frame_equal(
+        first_build[first_build["Company"] != "SIEGn.DE"].reset_index(drop=True),
+        second_build,
+    )
+
+
+def test_update_transcript_dataframe_incrementally_never_reuses_transcript_ids(
+    transcript_directory, tmp_path
+):
+    first_build, manifest = update_transcript_dataframe_incrementally(
+        transcript_directory
+    )
+    assert (
+        first_build.loc[first_build["Company"] == "BNPP.PA", "Transcript_ID"].item()
+        == 5
+    )
+
+    # Delete the file with the largest ID and store the manifest as the task does
+    os.remove(
+        transcript_directory
+        / "2005"
+        / "2005-Mar-03-BNPP.PA-139342690610-transcript.txt"
+    )
+    second_build, second_manifest = update_transcript_dataframe_incrementally(
+        transcript_directory, existing_data=first_build, manifest=manifest
+    )
+    second_manifest.to_pickle(tmp_path / "manifest.pkl")
+
+    (
+        transcript_directory / "2005" / "2005-Jun-03-DBKGn.DE-1-transcript.txt"
+    ).write_text("A new transcript", encoding="utf-8")
+    third_build, third_manifest = update_transcript_dataframe_incrementally(
+        transcript_directory,
+        existing_data=second_build,
+        manifest=pd.read_pickle(tmp_path / "manifest.pkl"),
+    )
+
+    assert set(second_build["Transcript_ID"]) == set(range(5))
+    assert (
+        third_build.loc[third_build["Company"] == "DBKGn.DE", "Transcript_ID"].item()
+        == 6
+    )
+    assert third_manifest.attrs["Next_Transcript_ID"] == 7
+
+
+def test_update_transcript_dataframe_incrementally_from_transcript_dataset(
+    transcript_directory, tmp_path
+):
+    first_build, manifest = update_transcript_dataframe_incrementally(
+        transcript_directory
+    )
+    write_transcript_dataset(first_build, tmp_path / "df_transcripts_raw_parquet")
+    (
+        transcript_directory / "2005" / "2005-Jan-03-DBKGn.DE-1-transcript.txt"
+    ).write_text("A new transcript", encoding="utf-8")
+
+    expected_output, _ = update_transcript_dataframe_incrementally(
+        transcript_directory, existing_data=first_build, manifest=manifest
+    )
+    actual_output, _ = update_transcript_dataframe_incrementally(
+        transcript_directory,
+        existing_data=read_transcript_dataset(tmp_path / "df_transcripts_raw_parquet"),
+        manifest=manifest,
+    )
+
+    pd.testing.assert_frame_equal(expected_output, actual_output, check_dtype=False)
+
+
+def test_update_transcript_manifest_matches_incremental_dataframe_manifest(
+    transcript_directory,
+):
+    first_build, manifest = update_transcript_dataframe_incrementally(
+        transcript_directory
+    )
+    pd.testing.assert_frame_equal(
+        update_transcript_manifest(transcript_directory), manifest
+    )
+
+    (
+        transcript_directory / "2005" / "2005-Jan-03-DBKGn.DE-1-transcript.txt"
+    ).write_text("A new transcript", encoding="utf-8")
+    (
+        transcript_directory
+        / "2004"
+        / "2004-Apr-06-AAPL.OQ-139342690606-transcript.txt"
+    ).unlink()
+
+    _, second_manifest = update_transcript_dataframe_incrementally(
+        transcript_directory, existing_data=first_build, manifest=manifest
+    )
+    streamed_manifest = update_transcript_manifest(
+        transcript_directory, manifest=manifest
+    )
+
+    pd.testing.assert_frame_equal(streamed_manifest, second_manifest)
+    assert (
+        streamed_manifest.attrs["Next_Transcript_ID"]
+        == second_manifest.attrs["Next_Transcript_ID"]
+    )
+
+
+def test_create_transcript_file_index_matches_transcript_ids(transcript_directory):
+    full_build = combine_all_transcripts_into_dataframe(transcript_directory)
+
+    file_index = create_transcript_file_index(transcript_directory)
+
+    pd.testing.assert_frame_equal(
+        full_build[["Date", "Company", "Transcript_ID"]],
+        file_index[["Date", "Company", "Transcript_ID"]],
+    )
+
+
+def test_create_transcript_file_index_takes_transcript_ids_from_manifest(
+    transcript_directory,
+):
+    first_build, manifest = update_transcript_dataframe_incrementally(
+        transcript_directory
+    )
+    (
+        transcript_directory / "2003" / "2003-Jan-02-DBKGn.DE-1-transcript.txt"
+    ).write_text("An early transcript", encoding="utf-8")
+    raw_data, manifest = update_transcript_dataframe_incrementally(
+        transcript_directory, existing_data=first_build, manifest=manifest
+    )
+
+    file_index = create_transcript_file_index(transcript_directory, manifest=manifest)
+
+    pd.testing.assert_frame_equal(
+        raw_data[["Date", "Company", "Transcript_ID"]],
+        file_index[["Date", "Company", "Transcript_ID"]],
+    )
+
+    (
+        transcript_directory / "2005" / "2005-Jun-03-DBKGn.DE-2-transcript.txt"
+    ).write_text("Not in the manifest yet", encoding="utf-8")
+    with pytest.raises(ValueError, match="1 transcript files are not in the manifest"):
+        create_transcript_file_index(transcript_directory, manifest=manifest)
+
+
+def test_streamed_transcripts_match_clean_transcript_data_df(
+    transcript_directory, tmp_path
+):
+    raw_data = combine_all_transcripts_into_dataframe(transcript_directory)
+    expected_output = clean_transcript_data_df(raw_data).drop(
+        columns=["Raw_Transcript"]
+    )
+    expected_output["Transcript_ID"] = raw_data["Transcript_ID"]
+
+    file_index = create_transcript_file_index(transcript_directory)
+    number_written = write_transcripts_in_chunks(
+        stream_preprocessed_transcripts(file_index),
+        tmp_path / "clean_step_1",
+        chunk_size=4,
+    )
+
+    actual_output = read_transcript_dataset(tmp_path / "clean_step_1")
+
+    assert number_written == 6
+    assert len(list((tmp_path / "clean_step_1").rglob("part-*.parquet"))) == 4
+    pd.testing.assert_frame_equal(
+        expected_output, actual_output, check_dtype=False, check_index_type=False
+    )
+
+
+def test_write_transcripts_in_chunks_consumes_stream_lazily(tmp_path):
+    def records():
+        for day in range(1, 4):
+            yield {"Date": pd.Timestamp(2004, 1, day), "Company": "A"}
+        raise RuntimeError("stream stopped")
+
+    with pytest.raises(RuntimeError):
+        write_transcripts_in_chunks(records(), tmp_path / "dataset", chunk_size=2)
+
+    assert len(read_transcript_dataset(tmp_path / "dataset")) == 2
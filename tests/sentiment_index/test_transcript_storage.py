@@ -0,0 +1,98 @@
+import datetime
+import os
+
+import pandas as pd
+import pytest
+
+from debt_crisis.sentiment_index.transcript_storage import (
+    write_transcript_dataset,
+    read_transcript_dataset,
+    migrate_transcript_pickle_to_dataset,
+)
+
+
+@pytest.fixture
+def raw_transcript_data():
+    return pd.DataFrame(
+        {
+            "Date": [
+                datetime.date(2003, 2, 20),
+                datetime.date(2003, 12, 1),
+                datetime.date(2004, 1, 12),
+                datetime.date(2004, 4, 6),
+                datetime.date(2005, 3, 3),
+            ],
+            "Company": ["ALVG.DE", "BAYG.DE", "SIEGn.DE", "BALN.S", "BNPP.PA"],
+            "Transcript": ["text a", "text b", "text c", "text d", "text e"],
+            "Transcript_ID": [0, 1, 2, 3, 4],
+        }
+    )
+
+
+def test_write_and_read_transcript_dataset_round_trip(raw_transcript_data, tmp_path):
+    write_transcript_dataset(raw_transcript_data, tmp_path / "dataset")
+
+    assert sorted(os.listdir(tmp_path / "dataset")) == [
+        "Year=2003",
+        "Year=2004",
+        "Year=2005",
+        "_common_metadata",
+    ]
+
+    actual_output = read_transcript_dataset(tmp_path / "dataset")
+
+    pd.testing.assert_frame_equal(raw_transcript_data, actual_output, check_dtype=False)
+
+
+def test_read_transcript_dataset_with_columns_and_date_range(
+    raw_transcript_data, tmp_path
+):
+    write_transcript_dataset(raw_transcript_data, tmp_path / "dataset")
+
+    actual_output = read_transcript_dataset(
+        tmp_path / "dataset",
+        columns=["Transcript_ID", "Date"],
+        start_date="2003-06-01",
+        end_date="2004-01-31",
+    )
+
+    expected_output = raw_transcript_data.loc[[1, 2], ["Transcript_ID", "Date"]]
+
+    pd.testing.assert_frame_equal(
+        expected_output.reset_index(drop=True), actual_output, check_dtype=False
+    )
+
+
+def test_read_transcript_dataset_with_datetime_dates_and_empty_range(
+    raw_transcript_data, tmp_path
+):
+    clean_data = raw_transcript_data.assign(
+        Date=pd.to_datetime(raw_transcript_data["Date"])
+    )
+    write_transcript_dataset(clean_data, tmp_path / "dataset")
+
+    actual_output = read_transcript_dataset(
+        tmp_path / "dataset", columns=["Date", "Company"], start_date="2005-01-01"
+    )
+    assert actual_output["Company"].tolist() == ["BNPP.PA"]
+
+    empty_output = read_transcript_dataset(
+        tmp_path / "dataset", columns=["Date", "Company"], start_date="2010-01-01"
+    )
+    assert empty_output.columns.tolist() == ["Date", "Company"]
+    assert len(empty_output) == 0
+
+
+def test_migrate_transcript_pickle_to_dataset(raw_transcript_data, tmp_path):
+    raw_transcript_data.to_pickle(tmp_path / "df_transcripts_raw.pkl")
+
+    metadata_path = migrate_transcript_pickle_to_dataset(
+        tmp_path / "df_transcripts_raw.pkl", tmp_path / "df_transcripts_raw_parquet"
+    )
+
+    assert os.path.exists(metadata_path)
+    pd.testing.assert_frame_equal(
+        raw_transcript_data,
+        read_transcript_dataset(tmp_path / "df_transcripts_raw_parquet"),
+        check_dtype=False,
+    )
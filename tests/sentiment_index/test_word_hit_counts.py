@@ -0,0 +1,140 @@
+import random
+from collections import Counter
+
+import pandas as pd
+import pytest
+
+from debt_crisis.sentiment_index.clean_sentiment_data import (
+    create_country_alias_index,
+    create_sentiment_index_columns_for_window_sizes,
+    create_word_count_dictionary,
+)
+from debt_crisis.sentiment_index.word_hit_counts import (
+    create_sentiment_index_and_word_hits_for_one_transcript,
+    create_sentiment_index_columns_with_word_hit_counts,
+    merge_word_hit_counts,
+    word_hit_counts_to_dataframe,
+    word_hit_counts_to_word_count_dict,
+)
+
+
+@pytest.fixture
+def scoring_inputs():
+    country_names_file = pd.DataFrame(
+        {
+            "name": ["austria", "germany", "greece"],
+            "adjectival": ["austrian", "german", "greek"],
+            "capital": ["vienna", "berlin", "athens"],
+        }
+    )
+    lookup_dict = {"crisis": -1, "default": -1, "growth": 1, "strong": 1}
+    vocabulary = list(lookup_dict) + ["the", "of", "bonds", "in", "yields"]
+    vocabulary += country_names_file.values.flatten().tolist()
+
+    rng = random.Random(3)
+    transcripts = pd.Series(
+        [
+            " ".join(rng.choice(vocabulary) for _ in range(rng.randint(0, 150)))
+            for _ in range(25)
+        ]
+    )
+    years = [rng.choice([2010, 2011, 2012]) for _ in range(len(transcripts))]
+
+    return transcripts, years, lookup_dict, country_names_file
+
+
+def test_word_hits_for_one_transcript_are_split_by_country():
+    alias_index = {"greece": ("greece",), "italy": ("italy",)}
+
+    scores, word_hits = create_sentiment_index_and_word_hits_for_one_transcript(
+        "crisis greece crisis italy growth",
+        2011,
+        {"crisis": -1, "growth": 1},
+        1,
+        ["greece", "italy"],
+        alias_index,
+    )
+
+    assert scores == {"greece": -1, "italy": -1}
+    assert word_hits == Counter(
+        {("greece", 2011, "crisis"): 1, ("italy", 2011, "crisis"): 1}
+    )
+
+
+def test_merge_word_hit_counts_is_independent_of_grouping():
+    partial_counts = [
+        Counter({("greece", 2010, "crisis"): 2}),
+        Counter({("greece", 2010, "crisis"): 1, ("italy", 2011, "growth"): 4}),
+        Counter({("italy", 2011, "growth"): 1}),
+    ]
+
+    left = merge_word_hit_counts(
+        [merge_word_hit_counts(partial_counts[:2]), partial_counts[2]]
+    )
+    right = merge_word_hit_counts(
+        [partial_counts[0], merge_word_hit_counts(partial_counts[1:])]
+    )
+
+    assert left == right == merge_word_hit_counts(reversed(partial_counts))
+    assert left == Counter(
+        {("greece", 2010, "crisis"): 3, ("italy", 2011, "growth"): 5}
+    )
+
+
+@pytest.mark.parametrize(
+    "calculation_method", ["negative_and_positive", "only_negatives"]
+)
+def test_word_hit_counts_match_shared_word_count_dict(
+    scoring_inputs, calculation_method
+):
+    transcripts, years, lookup_dict, country_names_file = scoring_inputs
+    countries = ["austria", "germany", "greece", "france"]
+    alias_index = create_country_alias_index(country_names_file)
+
+    word_count_dict = create_word_count_dictionary(lookup_dict)
+    expected_columns = create_sentiment_index_columns_for_window_sizes(
+        transcripts,
+        lookup_dict,
+        [5],
+        countries,
+        country_names_file,
+        {5: word_count_dict},
+        calculation_method,
+        alias_index=alias_index,
+    )[5]
+
+    serial_columns, serial_hits = create_sentiment_index_columns_with_word_hit_counts(
+        transcripts,
+        years,
+        lookup_dict,
+        5,
+        countries,
+        alias_index,
+        calculation_method,
+        chunk_size=4,
+    )
+    (
+        parallel_columns,
+        parallel_hits,
+    ) = create_sentiment_index_columns_with_word_hit_counts(
+        transcripts,
+        years,
+        lookup_dict,
+        5,
+        countries,
+        alias_index,
+        calculation_method,
+        n_workers=2,
+        chunk_size=3,
+    )
+
+    pd.testing.assert_frame_equal(serial_columns, expected_columns)
+    pd.testing.assert_frame_equal(parallel_columns, expected_columns)
+    assert serial_hits == parallel_hits
+    assert word_hit_counts_to_word_count_dict(serial_hits, lookup_dict) == (
+        word_count_dict
+    )
+
+    word_hit_data = word_hit_counts_to_dataframe(serial_hits)
+    assert list(word_hit_data.columns) == ["Country", "Year", "Word", "Count"]
+    assert word_hit_data["Count"].sum() == sum(word_count_dict.values())
@@ -0,0 +1,22 @@
+import subprocess
+import sys
+
+from debt_crisis.config import SRC
+
+
+def test_importing_config_does_not_load_spacy():
+    code = (
+        "import sys\n"
+        "import debt_crisis.config\n"
+        "import debt_crisis.sentiment_index.clean_sentiment_data\n"
+        "assert 'spacy' not in sys.modules\n"
+    )
+
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        env={"PYTHONPATH": str(SRC.parent)},
+        capture_output=True,
+        text=True,
+    )
+
+    assert result.returncode == 0, result.stderr